@@ -0,0 +1,61 @@
+import argparse
+import random
+import time
+from os.path                    import getsize, join
+from tempfile                   import TemporaryDirectory
+
+from storage.codecs             import CODECS, dump, load
+
+
+
+### Command Line ###
+def benchmark(members, repeat):
+    # A guild's stored data, as written by the bot
+    rng = random.Random(0)
+    data = {"yc_members": {
+        str(rng.randrange(10 ** 17, 10 ** 18)): {
+            "nort_bucks": rng.randint(0, 10 ** 6), "yash_coins": rng.randint(0, 1000),
+            "cringe_meter": rng.random(), "prev_daily": "2024-01-01", "on_expedition": 0,
+            "nort_mon": rng.choice([None, "common-1", "rare-2"])
+        } for _ in range(members)
+    }}
+
+    results = {}
+    with TemporaryDirectory() as directory:
+        for name in sorted(CODECS):
+            path = join(directory, f"{name}.json")
+            start = time.perf_counter()
+            for _ in range(repeat):
+                dump(path, data, name)
+            saved = (time.perf_counter() - start) / repeat
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                load(path)
+            loaded = (time.perf_counter() - start) / repeat
+
+            results[name] = (saved, loaded, getsize(path))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the save time, load time and file size of every format "
+                    "of stored data files."
+    )
+    parser.add_argument("--benchmark", type=int, nargs="+", metavar="MEMBERS",
+                        default=[1000, 100000],
+                        help="the numbers of members of the guilds to compare with")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="the number of saves and loads to average")
+    args = parser.parse_args()
+
+    for members in args.benchmark:
+        for name, (saved, loaded, size) in benchmark(members, args.repeat).items():
+            print(f"{name:>8} | {members:>8} members: save {saved * 1000:8.1f} ms | "
+                  f"load {loaded * 1000:8.1f} ms | size {size / 1024:10.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import time
+from datetime                   import date, datetime, timedelta
+
+from market.engine              import MarketEngine
+from market.ticker              import Ticker
+
+
+
+### Command Line ###
+def benchmark(markets, steps=96):
+    # Markets are listed one at a time, like guilds trading for the first time
+    engine = MarketEngine({}, per_guild=True, steps=steps)
+    start = time.perf_counter()
+    for guild_id in range(markets):
+        engine.get_column(guild_id)
+    listed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine.roll_over(date.fromisoformat(engine.state["day"]) + timedelta(days=1))
+    rolled = time.perf_counter() - start
+
+    # Every tick of the day is published, the way the ticker does on each boundary
+    ticker = Ticker(engine)
+    midnight = datetime.combine(date.fromisoformat(engine.state["day"]),
+                                datetime.min.time())
+    start = time.perf_counter()
+    for index in range(steps):
+        ticker.advance(midnight + timedelta(seconds=index * 24 * 3600 // steps))
+    ticked = (time.perf_counter() - start) / steps
+
+    start = time.perf_counter()
+    for guild_id in range(markets):
+        ticker.get_price(guild_id)
+    priced = (time.perf_counter() - start) / markets
+
+    return (listed, rolled, ticked, priced)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the cost of the market engine with one market per guild."
+    )
+    parser.add_argument("--benchmark", type=int, nargs="+", metavar="MARKETS",
+                        default=[10000], help="the numbers of markets to measure")
+    parser.add_argument("--steps", type=int, default=96,
+                        help="the number of ticks per day")
+    args = parser.parse_args()
+
+    for markets in args.benchmark:
+        listed, rolled, ticked, priced = benchmark(markets, args.steps)
+        print(f"{markets} markets: listing {listed * 1000:.1f} ms, " +
+              f"new day {rolled * 1000:.1f} ms, tick {ticked * 1e6:.1f} µs, " +
+              f"price lookup {priced * 1e6:.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
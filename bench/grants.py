@@ -0,0 +1,64 @@
+import argparse
+import asyncio
+import csv
+import os
+import random
+from os.path                    import join
+from tempfile                   import TemporaryDirectory
+
+import settings
+from storage.grants             import GRANT_COLUMNS, run
+from storage.journal            import Journal
+from storage.json_backend       import JsonBackend
+from storage.ledger             import Ledger
+from storage.store              import DataStore
+
+
+
+### Command Line ###
+def benchmark(rows, chunk_size, members):
+    # Grants are applied to a throwaway store, with the same journal and ledger as
+    # the bot's, so that the measure includes every write
+    with TemporaryDirectory() as directory:
+        path = join(directory, "grants.csv")
+        rng = random.Random(0)
+        with open(path, "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(GRANT_COLUMNS)
+            writer.writerows((rng.randrange(10 ** 17, 10 ** 17 + members),
+                              rng.randint(1, 1000), rng.randint(0, 10))
+                             for _ in range(rows))
+
+        os.makedirs(join(directory, "guilds"))
+        store = DataStore(JsonBackend(join(directory, "guilds"),
+                                      join(directory, "market.json")),
+                          Journal(join(directory, "journal.ndjson")),
+                          ledger=Ledger(join(directory, "ledger")))
+        try:
+            report = asyncio.run(run(store, "0", path, chunk_size, False))
+        finally:
+            store.close()
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the throughput of granting random rows to a temporary "
+                    "store."
+    )
+    parser.add_argument("--benchmark", type=int, default=100000, metavar="ROWS",
+                        help="the number of rows to grant")
+    parser.add_argument("--chunk-size", type=int, default=settings.GRANT_CHUNK_SIZE,
+                        help="the number of rows applied at a time")
+    parser.add_argument("--members", type=int, default=100000,
+                        help="the number of distinct members of the rows")
+    args = parser.parse_args()
+
+    report = benchmark(args.benchmark, args.chunk_size, args.members)
+    print(f"{report.rows} rows in {report.elapsed:.2f} s: " +
+          f"{report.rows_per_second:.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from market.orders              import Order, OrderBooks
+
+
+
+### Command Line ###
+def benchmark(orders, markets, ticks, interval=900):
+    # Orders rest around the price of their market, which then moves by a random
+    # walk, and every filled order is replaced so that the book stays as deep
+    rng = random.Random(0)
+    keys = [f"{guild_id}:YSH" for guild_id in range(markets)]
+    columns = {key: column for column, key in enumerate(keys, start=1)}
+    prices = np.full(1 + markets, 1000, dtype=np.int64)
+    changed = set()
+    books = OrderBooks({"next_id": 1, "open": {}}, on_change=changed.update)
+
+    def place(count):
+        for _ in range(count):
+            column = rng.randrange(1, markets + 1)
+            side = rng.choice((Order.BUY, Order.SELL))
+            offset = rng.randint(1, 300)
+            price = int(prices[column]) + (-offset if side == Order.BUY else offset)
+            books.place(keys[column - 1], "0", str(rng.randrange(10000)), side,
+                        max(price, 1), rng.randint(1, 10))
+
+    place(orders)
+    steps = np.random.default_rng(0)
+    durations = []
+    filled = 0
+    for _ in range(ticks):
+        moves = steps.normal(0, 0.02, len(prices))
+        prices = np.maximum(1, (prices * np.exp(moves)).astype(np.int64))
+
+        changed.clear()
+        start = time.perf_counter()
+        fills = books.match(prices, columns)
+        books.settle([order for order, _ in fills])
+        durations.append(time.perf_counter() - start)
+
+        filled += len(fills)
+        place(len(fills))
+
+    return (max(durations), sum(durations) / ticks, filled / ticks, interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the cost of matching resting limit orders on each tick."
+    )
+    parser.add_argument("--benchmark", type=int, nargs="+", metavar="ORDERS",
+                        default=[100000], help="the numbers of resting orders to match")
+    parser.add_argument("--markets", type=int, default=1000,
+                        help="the number of markets the orders are spread over")
+    parser.add_argument("--ticks", type=int, default=96,
+                        help="the number of ticks to measure")
+    args = parser.parse_args()
+
+    for orders in args.benchmark:
+        worst, mean, filled, interval = benchmark(orders, args.markets, args.ticks)
+        print(f"{orders} resting orders over {args.markets} markets: " +
+              f"{mean * 1000:.2f} ms per tick (worst {worst * 1000:.2f} ms, " +
+              f"{filled:.0f} fills), against a tick every {interval} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import random
+import time
+import tracemalloc
+
+from storage                    import codecs
+from storage.records            import parse_guild_data
+from utils                      import dict_get_as_int
+
+
+
+### Command Line ###
+def measure(build):
+    # Return what was built along with the memory it holds
+    tracemalloc.start()
+    built = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (built, size)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the memory held by the members of a guild stored as plain "
+                    "dictionaries and as member records, along with the time to load "
+                    "them and to read every balance."
+    )
+    parser.add_argument("--benchmark", type=int, default=100000, metavar="MEMBERS",
+                        help="the number of members of the guild")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    raw = codecs.get_codec("compact").dumps({"yc_members": {
+        str(rng.randrange(10 ** 17, 10 ** 18)): {
+            "nort_bucks": rng.randint(0, 10 ** 6), "yash_coins": rng.randint(0, 1000),
+            "cringe_meter": rng.random(), "prev_daily": "2024-01-01", "on_expedition": 0,
+            "nort_mon": None
+        } for _ in range(args.benchmark)
+    }})
+
+    # Stored data decoded as dictionaries (as before member records), then as records
+    loaders = (("dicts", lambda: codecs.loads(raw)["yc_members"]),
+               ("records", lambda: parse_guild_data(codecs.loads(raw))["yc_members"]))
+    readers = {
+        "dicts"   : lambda member_data: (dict_get_as_int(member_data, "nort_bucks")
+                                         + dict_get_as_int(member_data, "yash_coins")),
+        "records" : lambda record: record.nort_bucks + record.yash_coins
+    }
+
+    for name, load in loaders:
+        start = time.perf_counter()
+        load()
+        loaded = time.perf_counter() - start
+
+        members, size = measure(load)
+        read = readers[name]
+        start = time.perf_counter()
+        for member_data in members.values():
+            read(member_data)
+        elapsed = time.perf_counter() - start
+
+        print(f"{name:>8}: {size / 1024 ** 2:8.1f} MiB ({size / args.benchmark:5.0f} B "
+              f"per member) | load {loaded * 1000:8.1f} ms | read every balance "
+              f"{elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import resource
+import struct
+import time
+import zlib
+from multiprocessing            import get_context
+
+import numpy as np
+
+from graphs.sparkline           import render_sparkline
+
+
+
+### Command Line ###
+def benchmark(renderer, values, repeat):
+    # Run inside a fresh process, so that its memory use only reflects the renderer
+    start = time.perf_counter()
+    if renderer == "matplotlib":
+        from graphs.figure import render_line_graph as render
+    else:
+        render = render_sparkline
+    imported = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        render(values, xlim=(0, len(values)), color="green")
+    rendered = (time.perf_counter() - start) / repeat
+
+    return (imported, rendered, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def check():
+    # Degenerate graphs must still render as a valid image, rather than raise
+    cases = {
+        "single value": ([5], {}),
+        "single value, empty x range": ([5], {"xlim": (0, 0)}),
+        "empty x range": ([5, 6, 7], {"xlim": (2, 2)}),
+        "flat values": ([5, 5, 5], {}),
+        "empty y range": ([5, 6], {"ylim": (5, 5)}),
+    }
+
+    failures = []
+    for name, (values, kwargs) in cases.items():
+        try:
+            png = render_sparkline(values, **kwargs)
+        except Exception as error:
+            failures.append(f"{name}: {type(error).__name__}: {error}")
+            continue
+
+        # The pixels are held by the only IDAT chunk, after the signature and IHDR
+        width, height = struct.unpack(">II", png[16:24])
+        if len(zlib.decompress(png[41:-16])) != height * (1 + width * 4):
+            failures.append(f"{name}: invalid PNG data")
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the render time and memory use of the NumPy sparkline "
+                    "renderer and of the matplotlib renderer."
+    )
+    parser.add_argument("--values", type=int, default=97,
+                        help="the number of values to plot")
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="the number of renders to average")
+    parser.add_argument("--check", action="store_true",
+                        help="only check that degenerate graphs (e.g. a single value) "
+                             "render, instead")
+    args = parser.parse_args()
+
+    if args.check:
+        failures = check()
+        if failures:
+            raise SystemExit("FAILED:\n" + "\n".join(failures))
+        print("OK: every degenerate graph rendered")
+        return
+
+    rng = np.random.default_rng(0)
+    values = (1000 * np.exp(np.cumsum(0.02 * rng.standard_normal(args.values)))).astype(int)
+
+    context = get_context("spawn")
+    for renderer in ("sparkline", "matplotlib"):
+        with context.Pool(1) as pool:
+            imported, rendered, rss = pool.apply(benchmark,
+                                                 (renderer, values.tolist(), args.repeat))
+        print(f"{renderer:>10}: import {imported * 1000:8.1f} ms | "
+              f"render {rendered * 1000:8.1f} ms | max RSS {rss / 1024:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import argparse
+import asyncio
+import os
+import random
+import time
+from datetime                   import date, timedelta
+from os.path                    import getsize, join
+from tempfile                   import TemporaryDirectory
+
+import settings
+from storage.journal            import Journal
+from storage.json_backend       import JsonBackend
+from storage.ledger             import Ledger
+from storage.records            import MemberRecord, parse_guild_data
+from storage.sqlite_backend     import SqliteBackend
+from storage.store              import DataStore
+
+
+
+### Command Line ###
+def generate_guild(rng, size):
+    return {"yc_members": {
+        str(rng.randrange(10 ** 17, 10 ** 18)): MemberRecord(
+            rng.randint(0, 10 ** 6), rng.randint(0, 1000), rng.random(),
+            str(date.today() - timedelta(days=rng.randrange(365)))
+        )
+        for _ in range(size)
+    }}
+
+
+def benchmark(backend, members, guild_size, updates):
+    # Guilds are generated and written a few at a time, so that large member counts
+    # do not have to fit in memory at once
+    rng = random.Random(0)
+    sizes = [min(guild_size, members - first) for first in range(0, members, guild_size)]
+    guild_ids = [str(10 ** 17 + index) for index in range(len(sizes))]
+
+    flushed = 0
+    for first in range(0, len(guild_ids), 100):
+        guilds = [(guild_id, generate_guild(rng, size)) for guild_id, size
+                  in zip(guild_ids[first:first + 100], sizes[first:first + 100])]
+        start = time.perf_counter()
+        backend.run(backend.write, [backend.prepare_guild(guild_id, guild_data)
+                                    for guild_id, guild_data in guilds])
+        flushed += time.perf_counter() - start
+
+    start = time.perf_counter()
+    for guild_id in guild_ids:
+        parse_guild_data(backend.load_guild(guild_id))
+    loaded = time.perf_counter() - start
+
+    # A point update is a transaction on a single member, written by its own flush
+    async def update():
+        store.start()
+        elapsed = 0
+        for _ in range(updates):
+            guild_id = rng.choice(guild_ids)
+            member_id = rng.choice(list((await store.get_guild(guild_id))["yc_members"]))
+
+            start = time.perf_counter()
+            async with store.transaction(guild_id, member_id) as member_data:
+                member_data.nort_bucks += 1
+            await store.flush()
+            elapsed += time.perf_counter() - start
+
+        return elapsed / updates
+
+    store = DataStore(backend)
+    try:
+        updated = asyncio.run(update())
+    finally:
+        store.close()
+
+    return (loaded, flushed, updated)
+
+
+def stress(directory, calls, members, price=100):
+    # Invest and divest transactions, along with a few payments, run concurrently on a
+    # few members, each awaiting in the middle of its read-modify-write like a command
+    # sending a message. Every applied change is recorded, so that a lost update shows
+    # up as a member whose balance differs from its initial balance plus its changes
+    rng = random.Random(0)
+    guild_id = "0"
+    member_ids = [str(10 ** 17 + index) for index in range(members)]
+    applied = []
+
+    async def invest(member_id, amount):
+        async with store.transaction(guild_id, member_id, reason="invest",
+                                     price=price) as member_data:
+            await asyncio.sleep(0)
+            value = amount * price
+            if amount > 0 and member_data.nort_bucks < value:
+                return
+            if amount < 0 and member_data.yash_coins < -amount:
+                return
+            member_data.nort_bucks -= value
+            member_data.yash_coins += amount
+            applied.append((member_id, -value, amount))
+
+    async def pay(sender_id, recipient_ids, share):
+        async with store.batch(guild_id, [sender_id, *recipient_ids],
+                               reason="pay") as member_list_data:
+            await asyncio.sleep(0)
+            total = share * len(recipient_ids)
+            if member_list_data[sender_id].nort_bucks < total:
+                return
+            member_list_data[sender_id].nort_bucks -= total
+            applied.append((sender_id, -total, 0))
+            for recipient_id in recipient_ids:
+                member_list_data[recipient_id].nort_bucks += share
+                applied.append((recipient_id, share, 0))
+
+    async def get_balances():
+        member_list_data = await store.get_members(guild_id, member_ids)
+        return {member_id: (record.nort_bucks, record.yash_coins)
+                for member_id, record in member_list_data.items()}
+
+    async def run():
+        store.start()
+        async with store.batch(guild_id, member_ids) as member_list_data:
+            for member_data in member_list_data.values():
+                member_data.nort_bucks, member_data.yash_coins = 100000, 1000
+        initial = await get_balances()
+
+        tasks = []
+        for _ in range(calls):
+            member_id = rng.choice(member_ids)
+            if rng.random() < 0.1:
+                recipient_ids = [recipient_id for recipient_id in rng.sample(member_ids, 5)
+                                 if recipient_id != member_id]
+                tasks.append(pay(member_id, recipient_ids, rng.randint(1, 500)))
+            else:
+                tasks.append(invest(member_id, rng.choice((-1, 1)) * rng.randint(1, 50)))
+
+        start = time.perf_counter()
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+        await store.flush()
+        return (initial, await get_balances(), elapsed)
+
+    def create_store():
+        return DataStore(JsonBackend(join(directory, "guilds"),
+                                     join(directory, "yash_coin.json")),
+                         Journal(join(directory, "journal.ndjson")),
+                         ledger=Ledger(join(directory, "ledger")))
+
+    os.makedirs(join(directory, "guilds"))
+    store = create_store()
+    try:
+        initial, final, elapsed = asyncio.run(run())
+    finally:
+        store.close()
+
+    # The balances must also survive a restart
+    store = create_store()
+    try:
+        reloaded = asyncio.run(get_balances())
+    finally:
+        store.close()
+
+    expected = dict(initial)
+    for member_id, nort_bucks, yash_coins in applied:
+        expected[member_id] = (expected[member_id][0] + nort_bucks,
+                               expected[member_id][1] + yash_coins)
+
+    def get_totals(balances):
+        nort_bucks = sum(nort_bucks for nort_bucks, _ in balances.values())
+        yash_coins = sum(yash_coins for _, yash_coins in balances.values())
+        return (nort_bucks, yash_coins, nort_bucks + yash_coins * price)
+
+    return {
+        "elapsed"   : elapsed,
+        "applied"   : len(applied),
+        "initial"   : get_totals(initial),
+        "final"     : get_totals(final),
+        "lost"      : [member_id for member_id in member_ids
+                       if final[member_id] != expected[member_id]],
+        "negative"  : [member_id for member_id, balance in final.items()
+                       if min(balance) < 0],
+        "persisted" : reloaded == final
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the JSON and SQLite storage engines on temporary data: "
+                    "the time to load and to fully write every guild, and the time of "
+                    "a single member update written by its own flush. With --stress, "
+                    "check that concurrent transactions neither create nor lose money "
+                    "instead."
+    )
+    parser.add_argument("--benchmark", type=int, nargs="+", metavar="MEMBERS",
+                        default=[1000, 100000, 1000000],
+                        help="the numbers of members to compare the engines with")
+    parser.add_argument("--guild-size", type=int, default=1000,
+                        help="the number of members of each guild")
+    parser.add_argument("--updates", type=int, default=100,
+                        help="the number of point updates to average")
+    parser.add_argument("--stress", type=int, metavar="CALLS",
+                        help="run the given number of concurrent invest, divest and pay "
+                             "calls on a temporary store, and check the totals")
+    parser.add_argument("--members", type=int, default=20,
+                        help="the number of members the stress test calls are spread on")
+    args = parser.parse_args()
+
+    if args.stress is not None:
+        with TemporaryDirectory() as directory:
+            result = stress(directory, args.stress, args.members)
+
+        print(f"{args.stress} calls ({result['applied']} balance changes) in "
+              f"{result['elapsed']:.2f} s")
+        print(f"Totals before: {result['initial'][0]} NRT, {result['initial'][1]} YSH, "
+              f"worth {result['initial'][2]} NRT")
+        print(f"Totals after:  {result['final'][0]} NRT, {result['final'][1]} YSH, "
+              f"worth {result['final'][2]} NRT")
+
+        failures = []
+        if result["initial"][2] != result["final"][2]:
+            failures.append("the total worth changed")
+        if result["lost"]:
+            failures.append(f"{len(result['lost'])} member(s) lost updates")
+        if result["negative"]:
+            failures.append(f"{len(result['negative'])} member(s) have a negative balance")
+        if not result["persisted"]:
+            failures.append("the balances read after a restart differ")
+        if failures:
+            raise SystemExit("FAILED: " + ", ".join(failures))
+
+        print("OK: no money was created or lost")
+        return
+
+    for members in args.benchmark:
+        for name in ("json", "sqlite"):
+            with TemporaryDirectory() as directory:
+                if name == "json":
+                    os.makedirs(join(directory, "guilds"))
+                    backend = JsonBackend(join(directory, "guilds"),
+                                          join(directory, "yash_coin.json"),
+                                          codec=settings.DATA_CODEC)
+                else:
+                    backend = SqliteBackend(join(directory, "data.db"))
+
+                loaded, flushed, updated = benchmark(backend, members, args.guild_size,
+                                                     args.updates)
+                size = sum(getsize(join(root, file_name))
+                           for root, _, file_names in os.walk(directory)
+                           for file_name in file_names)
+
+            print(f"{name:>6} | {members:>8} members: load {loaded:8.2f} s | "
+                  f"write {flushed:8.2f} s | update {updated * 1000:7.2f} ms | "
+                  f"size {size / 1024 ** 2:8.1f} MiB", flush=True)
+
+
+if __name__ == "__main__":
+    main()
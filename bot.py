@@ -1,3 +1,4 @@
+import asyncio
 import os
 import sys
 import traceback
@@ -8,7 +9,7 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from discord.ext                    import commands
 
 import settings
-from utils                          import get_json_data, get_json_path, set_json_data
+from state                          import BotState
 
 # Set to remember if the bot is already running, since on_ready may be called
 # more than once on reconnects
@@ -34,6 +35,9 @@ def main():
     bot = commands.Bot(intents=intents, command_prefix=settings.COMMAND_PREFIX,
                        help_command=None)
 
+    # Attach the state shared by every cog, which survives extension reloads
+    bot.state = BotState()
+
     # Load up all available cogs
     print(f"List of cogs: {COGS}")
     for cog in COGS:
@@ -44,6 +48,17 @@ def main():
     # hence the running flag
     @bot.event
     async def on_ready():
+        # Start writing pending data changes and ticking markets in the background
+        if not this.running:
+            bot.state.store.start()
+            bot.state.ticker.start(sched)
+            sched.start()
+
+        # Create or archive the guilds joined or left while the bot was offline
+        joined, left = await bot.state.store.sync_guilds(guild.id for guild in bot.guilds)
+        if joined or left:
+            print(f"Synced guilds: {len(joined)} joined, {len(left)} left", flush=True)
+
         if this.running:
             return
 
@@ -102,16 +117,24 @@ def main():
             await ctx.send("Something went wrong...")
             traceback.print_exception(type(error), error, error.__traceback__)
 
+    # Guild events are buffered for a short while, so that bursts of them (e.g. mass
+    # kicks) are persisted at once. Only the latest event of each guild is kept
+    pending_guilds = {}
+
     async def handle_guilds(guild, is_joining):
-        path = get_json_path("data")
-        json_data = get_json_data(path)
+        is_first = not pending_guilds
+        pending_guilds[guild.id] = is_joining
+        if not is_first:
+            return
 
-        if is_joining:
-            json_data[guild.id] = {}
-        else:
-            json_data.pop(guild.id, None)
+        await asyncio.sleep(settings.GUILD_EVENT_BATCH_MS / 1000)
+        events = dict(pending_guilds)
+        pending_guilds.clear()
 
-        set_json_data(path, json_data)
+        await bot.state.store.update_guilds(
+            joined=[guild_id for guild_id, joined in events.items() if joined],
+            left=[guild_id for guild_id, joined in events.items() if not joined]
+        )
 
     @bot.event
     async def on_guild_join(guild):
@@ -121,8 +144,12 @@ def main():
     async def on_guild_remove(guild):
         await handle_guilds(guild, is_joining=False)
 
-    # Finally, set the bot running
-    bot.run(settings.BOT_TOKEN)
+    # Finally, set the bot running, making sure that pending data changes are
+    # written once it stops
+    try:
+        bot.run(settings.BOT_TOKEN)
+    finally:
+        bot.state.close()
 
 #########################################################################################
 
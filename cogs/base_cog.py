@@ -1,19 +1,21 @@
 import discord
 from discord.ext                import commands
-from utils                      import get_json_data, get_json_path, set_json_data
+from storage.records            import MemberRecord
 
 class BaseCog(commands.Cog):
-    data_path = get_json_path("data")
-    data = get_json_data(data_path)
     img_404_url = "https://i.imgur.com/OMFiBp5.png"
 
     def __init__(self, bot):
         self.bot = bot
+        # Shared state lives on the bot, so that it survives extension reloads
+        self.state = bot.state
+        self.store = bot.state.store
 
-    def get_guild_data(self, guild, data=None, default=False):
+    async def get_guild_data(self, guild, data=None, default=False):
         """
             Return the guild data stored inside ``data``. If ``data`` is not given,
-            retrieve the data from the ``data.json`` file.
+            retrieve the data from the data store, which loads the guild if it is not
+            in memory.
 
             Parameters
             ----------
@@ -37,19 +39,22 @@ class BaseCog(commands.Cog):
         """
 
         if data is None:
-            data = self.data
-
-        guild_id = str(guild.id)
-        guild_data = data.setdefault(guild_id, {}) if default else data.get(guild_id, {})
+            guild_data = await self.store.get_guild(guild, default=default)
+            if guild_data is None:
+                guild_data = {}
+        else:
+            guild_id = str(guild.id)
+            guild_data = (data.setdefault(guild_id, {}) if default
+                          else data.get(guild_id, {}))
         if not isinstance(guild_data, dict):
             raise LookupError(f"Could not get guild data for '{guild.id}'")
 
         return guild_data
 
-    def get_member_list_data(self, guild, guild_data=None, default=False):
+    async def get_member_list_data(self, guild, guild_data=None, default=False):
         """
             Return a list of member data stored inside ``guild_data``. If ``guild_data``
-            is not given, retrieve the guild data from the ``data.json`` file.
+            is not given, retrieve the guild data from the data store.
 
             Parameters
             ----------
@@ -73,7 +78,7 @@ class BaseCog(commands.Cog):
         """
 
         if guild_data is None:
-            guild_data = self.get_guild_data(guild, default=default)
+            guild_data = await self.get_guild_data(guild, default=default)
 
         member_list_data = (
             guild_data.setdefault("yc_members", {}) if default
@@ -84,11 +89,13 @@ class BaseCog(commands.Cog):
 
         return member_list_data
 
-    def get_member_data(self, guild, member, member_list_data=None, default=False):
+    async def get_member_data(self, guild, member, member_list_data=None, default=False):
         """
-            Return the guild member data stored inside ``member_list_data``. If
-            ``member_list_data`` is not given, retrieve the member list data from the
-            ``data.json`` file.
+            Return the guild member record stored inside ``member_list_data``. If
+            ``member_list_data`` is not given, retrieve the record from the data store,
+            which restores it if the member was moved to the cold storage. If the
+            member is not registered and ``default`` is not set, an empty record that
+            is not stored is returned.
 
             Parameters
             ----------
@@ -104,8 +111,8 @@ class BaseCog(commands.Cog):
 
             Returns
             -------
-            member_data: :class:`dict`
-                a guild member's data.
+            member_data: :class:`storage.records.MemberRecord`
+                a guild member's record.
             
             Raises
             ------
@@ -114,22 +121,22 @@ class BaseCog(commands.Cog):
         """
 
         if member_list_data is None:
-            member_list_data = self.get_member_list_data(guild, default=default)
-
-        member_id = str(member.id)
-        member_data = (
-            member_list_data.setdefault(member_id, {}) if default
-            else member_list_data.get(member_id, {})
-        )
-        if not isinstance(member_data, dict):
+            member_data = await self.store.get_member(guild, member, default=default)
+        else:
+            member_id = str(member.id)
+            member_data = (member_list_data.setdefault(member_id, MemberRecord())
+                           if default else member_list_data.get(member_id))
+        if member_data is None:
+            member_data = MemberRecord()
+        if not isinstance(member_data, MemberRecord):
             raise LookupError(f"Could not get member data for '{guild.id}-{member.id}'")
 
         return member_data
 
-    def register_member(self, guild, member, member_list_data=None):
+    async def register_member(self, guild, member, member_list_data=None):
         """
-            Store the new guild member data into the ``data.json`` file. Return ``True``
-            if the guild member was successfully registered, and ``False`` otherwise.
+            Store a new guild member record into the data store if the member is not
+            registered yet, and return the member's record.
 
             Parameters
             ----------
@@ -142,30 +149,25 @@ class BaseCog(commands.Cog):
 
             Returns
             -------
-            is_new_member: :class:`boolean`
-                a value indicating whether the member was successfully registered.
+            member_data: :class:`storage.records.MemberRecord`
+                the guild member's record.
         """
 
         if member_list_data is None:
-            member_list_data = self.get_member_list_data(guild, default=True)
+            return await self.store.get_member(guild, member, default=True)
 
-        is_new_member = not self.member_is_registered(guild, member, member_list_data)
-        if is_new_member:
-            member_list_data[member.id] = {
-                "nort_bucks"    : 0,
-                "yash_coins"    : 0,
-                "cringe_meter"  : 0,
-                "prev_daily"    : None,
-                "on_expedition" : 0
-            }
+        member_data = member_list_data.get(str(member.id))
+        if member_data is None:
+            member_data = member_list_data[str(member.id)] = MemberRecord()
+            self.store.mark_dirty(guild, member)
 
-        return is_new_member
+        return member_data
 
-    def member_is_registered(self, guild, member, member_list_data=None):
+    async def member_is_registered(self, guild, member, member_list_data=None):
         """
             Return ``True`` if the guild member data exists in ``member_list_data``, and
-            ``False`` otherwise. If ``member_list_data`` is not given, retrieve the
-            member list data from the ``data.json`` file.
+            ``False`` otherwise. If ``member_list_data`` is not given, look the member
+            up in the data store, which restores it from the cold storage if needed.
 
             Parameters
             ----------
@@ -183,7 +185,7 @@ class BaseCog(commands.Cog):
         """
 
         if member_list_data is None:
-            member_list_data = self.get_member_list_data(guild)
+            return await self.store.get_member(guild, member) is not None
 
         return member_list_data.get(str(member.id)) is not None
 
@@ -1,24 +1,39 @@
-from datetime                   import date, datetime
-from math                       import sqrt
+import io
+from datetime                   import datetime
+from typing                     import Optional, Union
 
 import discord
+import settings
 from discord.ext                import commands
-from numpy                      import cumprod, exp, random
-from utils                      import (create_simple_graph, dict_get_as_int,
-                                        dict_get_as_list, get_emoji, get_json_data,
-                                        get_json_path, get_simple_graph_length,
-                                        set_json_data, update_simple_graph)
+from graphs.render              import render_graph
+from market.downsample          import downsample
+from market.orders              import Order
+from market.prices              import generate_days
+from utils                      import get_emoji
 
 from cogs.base_cog              import BaseCog
 
 
 class EconomyCog(BaseCog, name="Economy"):
-    yash_coin_data_path = get_json_path("yash_coin")
-    yash_coin_data = get_json_data(yash_coin_data_path)
+    # Number of days shown by each period of the stocks command (None for every day)
+    STOCK_PERIODS = {"1d": 1, "7d": 7, "30d": 30, "all": None}
+
+    # Look of the stocks graphs, which is part of their cache key
+    GRAPH_THEME = "default"
 
     def __init__(self, bot):
-        self.graph_url = None
         super().__init__(bot)
+        self.charts = self.state.charts
+        self.renderer = self.state.renderer
+        self.markets = self.state.markets
+        self.order_books = self.state.orders
+        self.ticker = self.state.ticker
+
+        # Crossed orders are filled on every tick
+        self.ticker.add_listener(self.match_orders)
+
+    def cog_unload(self):
+        self.ticker.remove_listener(self.match_orders)
 
     ### Balance command ###
     @commands.command(
@@ -32,13 +47,11 @@ class EconomyCog(BaseCog, name="Economy"):
         if member is None:
             member = ctx.author
 
-        member_data = self.get_member_data(ctx.guild, member)
-        nort_bucks = dict_get_as_int(member_data, "nort_bucks")
-        yash_coins = dict_get_as_int(member_data, "yash_coins")
+        member_data = await self.get_member_data(ctx.guild, member)
+        nort_bucks = member_data.nort_bucks
+        yash_coins = member_data.yash_coins
 
-        yash_coin_values = self.get_yash_coin_values(self.yash_coin_data)
-        current_idx = self.get_current_yash_coin_index(len(yash_coin_values))
-        current_value = yash_coin_values[current_idx]
+        current_value = self.ticker.get_price(ctx.guild)
         
         embed_reply = self.create_embed()
         embed_reply.set_author(
@@ -68,51 +81,53 @@ class EconomyCog(BaseCog, name="Economy"):
     @commands.command(
         aliases=["stonks"],
         brief="Displays YashCoin values",
-        description="Displays the current YashCoin conversion rate",
+        description="Displays the current YashCoin conversion rate, along with its " +
+                    "values over the given period (1d, 7d, 30d or all)",
         ignore_extra=False
     )
     @commands.guild_only()
-    async def stocks(self, ctx):
-        now = datetime.now()
-        today = str(date.today())
-
-        if self.yash_coin_data.get("prev_check", None) != today:
-            # Generate new graph for new day
-            try:
-                old_values = self.get_yash_coin_values(self.yash_coin_data)
-                new_values = self.create_yash_coin_values(old_values[-1])
-            except LookupError:
-                new_values = self.create_yash_coin_values()
+    async def stocks(self, ctx, period: str="1d"):
+        period = period.lower()
+        if period not in self.STOCK_PERIODS:
+            raise commands.BadArgument()
 
-            self.yash_coin_data["prev_check"] = today
-            self.yash_coin_data["values"] = new_values
-
-            set_json_data(self.yash_coin_data_path, self.yash_coin_data)
+        now = datetime.now()
+        snapshot = self.ticker.snapshot
+        key = (self.markets.get_key(ctx.guild), snapshot.day, snapshot.index, period,
+               self.GRAPH_THEME, settings.GRAPH_RENDERER)
 
-            indices = len(new_values)
-            current_values = new_values[:self.get_current_yash_coin_index(indices) + 1]
+        try:
+            values = self.get_yash_coin_values(ctx.guild).tolist()
+        except LookupError:
+            await ctx.send("The YashCoin market is unavailable right now")
+            return
 
-            buffer = self.create_yash_coin_graph(current_values, indices)
+        if period == "1d":
+            indices = len(values)
+            current_values = values[:snapshot.index + 1]
+            plotted_values = current_values
         else:
-            # Update graph values
-            try:
-                values = self.get_yash_coin_values(self.yash_coin_data)
-            except LookupError:
-                values = self.create_yash_coin_values()
+            # Long periods are downsampled, so that they plot as fast as a single day
+            current_values = self.markets.get_history(
+                ctx.guild, self.STOCK_PERIODS[period], snapshot.index
+            ).tolist()
+            plotted_values = downsample(current_values,
+                                        settings.MARKET_CHART_POINTS).tolist()
+            indices = len(plotted_values) - 1
 
-            indices = len(values)
-            current_values = values[:self.get_current_yash_coin_index(indices) + 1]
+        # The graph is only rendered once per tick, however many times it is asked for
+        async def render():
+            return await self.create_yash_coin_graph(plotted_values, indices)
 
-            if get_simple_graph_length() < len(current_values) or self.graph_url is None:
-                buffer = self.update_yash_coin_graph(current_values, indices)
-            else:
-                buffer = None
+        chart, png = await self.charts.get(key, render)
 
         difference = current_values[-1] - current_values[0]
         percentage = difference / current_values[0]
 
         embed_reply = self.create_embed()
         embed_reply.title = "Market Summary — `YCSE: YSH`"
+        if period != "1d":
+            embed_reply.title += f" ({period})"
         embed_reply.add_field(
             name="**Value**",
             value=f"`{current_values[-1]} NRT` | `{difference:+d} ({percentage:+.2%})`",
@@ -124,14 +139,14 @@ class EconomyCog(BaseCog, name="Economy"):
             inline=False
         )
 
-        if buffer is None:
-            embed_reply.set_image(url=self.graph_url)
+        if png is None:
+            embed_reply.set_image(url=chart.url)
             await ctx.send(embed=embed_reply)
         else:
-            file = discord.File(buffer, filename="plot.png")
+            file = discord.File(io.BytesIO(png), filename="plot.png")
             embed_reply.set_image(url="attachment://plot.png")
             message = await ctx.send(file=file, embed=embed_reply)
-            self.graph_url = message.embeds[0].image.url
+            self.charts.set_url(chart, message.embeds[0].image.url)
 
 
 
@@ -161,72 +176,372 @@ class EconomyCog(BaseCog, name="Economy"):
         if cost is not None:
             await ctx.send(f"You received `{-cost}` NortBucks from selling YashCoins!")
 
+    ### Pay Commands ###
+    @commands.command(
+        aliases=["give"],
+        brief="Gives NortBucks to members",
+        description="Give the given number of NortBucks to each of the given members " +
+                    "(or to every member of the given roles)",
+        ignore_extra=False
+    )
+    @commands.guild_only()
+    async def pay(self, ctx,
+                  recipients: commands.Greedy[Union[discord.Member, discord.Role]],
+                  amount: int):
+        amount = self.input_to_positive_int(amount)
+        await self.handle_payment(ctx, recipients, amount)
+
+    @commands.command(
+        aliases=["split"],
+        brief="Splits NortBucks between members",
+        description="Split the given number of NortBucks evenly between the given " +
+                    "members (or every member of the given roles). What cannot be " +
+                    "split evenly is kept",
+        ignore_extra=False
+    )
+    @commands.guild_only()
+    async def paysplit(self, ctx,
+                       recipients: commands.Greedy[Union[discord.Member, discord.Role]],
+                       amount: int):
+        amount = self.input_to_positive_int(amount)
+        await self.handle_payment(ctx, recipients, amount, split=True)
+
+
+    ### Limit Order Commands ###
+    @commands.command(
+        aliases=["limit"],
+        brief="Places a limit order",
+        description="Place an order to buy or sell the given number of YashCoins " +
+                    "once their value reaches the given price. The NortBucks or " +
+                    "YashCoins needed are held until the order is filled or cancelled",
+        ignore_extra=False
+    )
+    @commands.guild_only()
+    async def order(self, ctx, side: str, amount: int, price: int):
+        side = side.lower()
+        if side not in (Order.BUY, Order.SELL):
+            raise commands.BadArgument()
+
+        amount = self.input_to_positive_int(amount)
+        price = self.input_to_positive_int(price)
+        open_orders = self.order_books.get_member_orders(ctx.guild.id, ctx.author.id)
+        if len(open_orders) >= settings.MAX_OPEN_ORDERS:
+            await ctx.send(f"You cannot have more than `{settings.MAX_OPEN_ORDERS}` " +
+                           "open orders at a time")
+            return
+
+        # The market is listed before the funds are held, in case listing it fails
+        self.markets.get_column(ctx.guild)
+        key = self.markets.get_key(ctx.guild)
+        error = None
+
+        async with self.store.transaction(ctx.guild, ctx.author, reason="order",
+                                          price=price) as member_data:
+            if side == Order.BUY and member_data.nort_bucks < price * amount:
+                error = (f"You do not have the required `{price * amount}` " +
+                         "NortBucks to place this order")
+            elif side == Order.SELL and member_data.yash_coins < amount:
+                error = (f"You do not have the required `{amount}` " +
+                         "YashCoins to place this order")
+            elif side == Order.BUY:
+                member_data.nort_bucks -= price * amount
+            else:
+                member_data.yash_coins -= amount
+
+            if error is None:
+                order = self.order_books.place(key, ctx.guild.id, ctx.author.id, side,
+                                               price, amount)
+
+        if error is not None:
+            await ctx.send(error)
+            return
+
+        await ctx.send(f"Order `#{order.order_id}` placed: {side} `{amount}` YashCoins " +
+                       f"at `{price}` NortBucks each")
+
+    @commands.command(
+        brief="Displays open orders",
+        description="Displays the member's open limit orders",
+        ignore_extra=False
+    )
+    @commands.guild_only()
+    async def orders(self, ctx, *, member: discord.Member=None):
+        if member is None:
+            member = ctx.author
+
+        open_orders = self.order_books.get_member_orders(ctx.guild.id, member.id)
+
+        embed_reply = self.create_embed()
+        embed_reply.set_author(
+            name=f"{member.display_name}'s Orders:",
+            icon_url=member.avatar_url
+        )
+        embed_reply.description = "\n".join(
+            f"`#{order.order_id}` {order.side} `{order.amount}` YSH at " +
+            f"`{order.price}` NRT"
+            for order in open_orders
+        ) or "No open orders"
+
+        await ctx.send(embed=embed_reply)
+
+    @commands.command(
+        brief="Cancels an open order",
+        description="Cancel one of the member's open limit orders, giving back the " +
+                    "NortBucks or YashCoins it held",
+        ignore_extra=False
+    )
+    @commands.guild_only()
+    async def cancel(self, ctx, order_id: int):
+        order = None
+        async with self.store.transaction(ctx.guild, ctx.author,
+                                          reason="cancel") as member_data:
+            # The order is looked up under the member's lock, since it may be filled
+            # while waiting for it
+            found = self.order_books.orders.get(order_id)
+            if (found is not None and found.guild_id == str(ctx.guild.id)
+                    and found.member_id == str(ctx.author.id)):
+                order = self.order_books.cancel(order_id)
+                if order.side == Order.BUY:
+                    member_data.nort_bucks += order.reserved
+                else:
+                    member_data.yash_coins += order.reserved
+
+        if order is None:
+            await ctx.send(f"You do not have an open order `#{order_id}`")
+            return
+
+        await ctx.send(f"Order `#{order_id}` cancelled")
+
+    ### Leaderboard Command ###
+    @commands.command(
+        aliases=["lb", "top"],
+        brief="Displays the richest members",
+        description="Displays the members of the server ranked by net worth " +
+                    "(NortBucks plus YashCoins at their current value)",
+        ignore_extra=False
+    )
+    @commands.guild_only()
+    async def leaderboard(self, ctx, page: int=1):
+        board = await self.state.leaderboards.get(ctx.guild)
+        pages = max(1, -(-len(board) // settings.LEADERBOARD_PAGE_SIZE))
+        if not 1 <= page <= pages:
+            await ctx.send(f"Page must be between `1` and `{pages}`")
+            return
+
+        members = board.top(settings.LEADERBOARD_PAGE_SIZE,
+                            (page - 1) * settings.LEADERBOARD_PAGE_SIZE)
+
+        embed_reply = self.create_embed()
+        embed_reply.set_author(name=f"{ctx.guild.name}'s Leaderboard:",
+                               icon_url=ctx.guild.icon_url)
+        embed_reply.description = "\n".join(
+            f"`#{rank}` <@{member_id}> — `{worth}` NRT " +
+            f"({nort_bucks} NRT + {yash_coins} YSH)"
+            for rank, member_id, nort_bucks, yash_coins, worth in members
+        ) or "No registered members"
+
+        footer = f"Page {page}/{pages}"
+        author_rank = board.rank(str(ctx.author.id))
+        if author_rank is not None:
+            footer += f" | Your rank: #{author_rank[0]} ({author_rank[1]} NRT)"
+        embed_reply.set_footer(text=footer)
+
+        await ctx.send(embed=embed_reply)
+
+    ### History Command ###
+    @commands.command(
+        aliases=["txs"],
+        brief="Displays balance history",
+        description="Displays the latest changes of the member's NortBucks and " +
+                    "YashCoins, along with what they were for",
+        ignore_extra=False
+    )
+    @commands.guild_only()
+    async def history(self, ctx, member: Optional[discord.Member]=None, page: int=1):
+        if member is None:
+            member = ctx.author
+        page = self.input_to_positive_int(page)
+
+        # One more entry is read to know whether there is a next page
+        page_size = settings.LEDGER_PAGE_SIZE
+        entries = await self.store.get_history(ctx.guild, member, (page - 1) * page_size,
+                                               page_size + 1)
+
+        lines = []
+        for entry in entries[:page_size]:
+            changes = []
+            if entry.nort_bucks_delta:
+                changes.append(f"`{entry.nort_bucks_delta:+d}` NRT")
+            if entry.yash_coins_delta:
+                changes.append(f"`{entry.yash_coins_delta:+d}` YSH")
+            line = (f"`{datetime.fromtimestamp(entry.time).strftime('%b %d, %I:%M %p')}` " +
+                    f"**{(entry.reason or 'other').replace('_', ' ').capitalize()}** " +
+                    " ".join(changes))
+            if entry.price is not None:
+                line += f" at `{entry.price}` NRT"
+            lines.append(line)
+
+        embed_reply = self.create_embed()
+        embed_reply.set_author(
+            name=f"{member.display_name}'s History:",
+            icon_url=member.avatar_url
+        )
+        embed_reply.description = "\n".join(lines) or "No balance changes"
+        embed_reply.set_footer(text=f"Page {page}" +
+                                    (" | More on the next page"
+                                     if len(entries) > page_size else ""))
+
+        await ctx.send(embed=embed_reply)
+
+    ### Economy Command ###
+    @commands.command(
+        aliases=["eco"],
+        brief="Displays the server's economy",
+        description="Displays the NortBucks and YashCoins held by the members of the " +
+                    "server, how their net worth is distributed, and their NortMons " +
+                    "by rarity",
+        ignore_extra=False
+    )
+    @commands.guild_only()
+    async def economy(self, ctx):
+        summary = await self.state.economies.get(ctx.guild)
+        current_value = self.ticker.get_price(ctx.guild)
+
+        def format_worth(worth):
+            return "-" if worth is None else f"{round(worth)}"
+
+        embed_reply = self.create_embed()
+        embed_reply.set_author(name=f"{ctx.guild.name}'s Economy:",
+                               icon_url=ctx.guild.icon_url)
+        embed_reply.add_field(
+            name=f"**NortBuck Supply** {get_emoji(':dollar:')}",
+            value=f"`{summary['nort_bucks']}`",
+            inline=True
+        )
+        embed_reply.add_field(
+            name=f"**YashCoin Float** {get_emoji(':coin:')}",
+            value=f"`{summary['yash_coins']}` " +
+                  f"(`{summary['yash_coins'] * current_value}` NRT)",
+            inline=True
+        )
+        embed_reply.add_field(
+            name=f"**Net Worth** {get_emoji(':moneybag:')}",
+            value=f"Members: `{summary['members']}`\n" +
+                  f"Mean: `{format_worth(summary['mean'])}`\n" +
+                  f"Median: `{format_worth(summary['median'])}`\n" +
+                  f"90th percentile: `{format_worth(summary['p90'])}`\n" +
+                  "Gini coefficient: " +
+                  (f"`{summary['gini']:.3f}`" if summary["gini"] is not None else "`-`"),
+            inline=False
+        )
+        rarities = sorted(summary["rarities"].items(), key=lambda item: -item[1])
+        embed_reply.add_field(
+            name="**NortMons**",
+            value="\n".join(
+                f"{(rarity or 'none').capitalize()}: `{count}`"
+                for rarity, count in rarities
+            ) or "No registered members",
+            inline=False
+        )
+
+        await ctx.send(embed=embed_reply)
+
 
 
     ### Helper Methods ###
-    def get_yash_coin_values(self, yash_coin_data=None):
+    async def match_orders(self, snapshot):
         """
-            Return a list of YashCoin values stored inside ``yash_coin_data``. If
-            ``yash_coin_data`` is not given, retrieve the YashCoin data from the
-            ``yash_coin.json`` file.
+            Fill every order crossed by the prices of the given snapshot in a single
+            batch (see :meth:`market.orders.OrderBooks.match`).
 
             Parameters
             ----------
-            yash_coin_data: :class:`dict`
-                the data on YashCoins.
-            
-            Returns
-            -------
-            yash_coin_values: :class:`list`
-                a list of the current YashCoin values.
-
-            Raises
-            ------
-            LookupError:
-                the YashCoin values could not be found inside ``yash_coin_data``.
+            snapshot: :class:`market.ticker.PriceSnapshot`
+                the prices of the new tick.
         """
 
-        if yash_coin_data is None:
-            yash_coin_data = self.yash_coin_data
+        if not self.order_books:
+            return
 
-        yash_coin_values = dict_get_as_list(yash_coin_data, "values")
-        if not yash_coin_values:
-            raise LookupError("YashCoin values could not be properly retrieved")
+        fills = self.order_books.match(snapshot.prices, self.markets.columns)
+        if fills:
+            await self.fill_orders(fills)
 
-        return yash_coin_values
+    async def fill_orders(self, fills):
+        """
+            Credit the members whose orders were filled. Buyers receive their
+            YashCoins, along with the NortBucks they held above the price they bought
+            at, and sellers receive the NortBucks their YashCoins sold for. The members
+            of each guild are updated in a single batch, each of them once whatever
+            their number of filled orders, and the orders are only settled (see
+            :meth:`market.orders.OrderBooks.settle`) right after their batch is
+            applied, so that no flush ever writes one without the other. Every change
+            is written by a single flush.
 
-    def get_current_yash_coin_index(self, size):
+            Parameters
+            ----------
+            fills: :class:`list[tuple(market.orders.Order, int)]`
+                the filled orders, along with the price they were filled at.
         """
-            Return the index that points to the most current value of YashCoin, relative
-            to the amount of time that has passed since the start of the current day.
+
+        # Orders of a market are all filled at the same price on a given tick, and a
+        # guild trades on a single market, so there is a batch per guild
+        batches = {}
+        for order, price in fills:
+            batches.setdefault((order.guild_id, price), []).append(order)
+
+        for (guild_id, price), orders in batches.items():
+            credits = {}
+            for order in orders:
+                credit = credits.setdefault(order.member_id, [0, 0])
+                if order.side == Order.BUY:
+                    credit[0] += (order.price - price) * order.amount
+                    credit[1] += order.amount
+                else:
+                    credit[0] += price * order.amount
+
+            async with self.store.batch(guild_id, credits, reason="fill",
+                                        price=price) as member_list_data:
+                for member_id, (nort_bucks, yash_coins) in credits.items():
+                    member_list_data[member_id].nort_bucks += nort_bucks
+                    member_list_data[member_id].yash_coins += yash_coins
+            self.order_books.settle(orders)
+
+        await self.store.flush()
+
+    def get_yash_coin_values(self, guild):
+        """
+            Return the YashCoin values of the current day of the market that the given
+            guild trades on.
 
             Parameters
             ----------
-            size: :class:`int`
-                the number of times the value of YashCoin changes per day.
+            guild: :class:`discord.Guild`
+                a discord guild.
             
             Returns
             -------
-            index: :class:`int`
-                an index pointing to a value stored inside a list of YashCoin values.
+            yash_coin_values: :class:`numpy.ndarray`
+                the current YashCoin values.
 
             Raises
             ------
-            ValueError:
-                ``size`` is not a positive value.\n
+            LookupError:
+                the YashCoin values could not be properly retrieved.
         """
 
-        if size <= 0:
-            raise ValueError("'size' must be a positive value")
+        yash_coin_values = self.markets.get_values(guild)
+        if not yash_coin_values.any():
+            raise LookupError("YashCoin values could not be properly retrieved")
 
-        now = datetime.now()
-        return int(size * ((now.hour + (now.minute / 60)) / 24))
+        return yash_coin_values
 
     def create_yash_coin_values(self, start=1000, steps=96, mu=0, sigma=0.2,
                                 lower=500, upper=1500):
         """
             Return a list of YashCoin values which somewhat imitates stock prices over
-            time by using Geometric Brownian Motion.
+            time by using Geometric Brownian Motion (see
+            :func:`market.prices.generate_days`).
 
             Parameters
             ----------
@@ -260,29 +575,13 @@ class EconomyCog(BaseCog, name="Economy"):
                 ``lower`` or ``upper`` are not positive values.
         """
 
-        if start <= 0:
-            raise ValueError("'start' must be a positive value")
-        if steps < 0:
-            raise ValueError("'steps' must be a non-negative value")
-        if sigma < 0:
-            raise ValueError("'sigma' must be a non-negative value")
-        if lower >= upper:
-            raise ValueError("'lower' must be smaller than 'upper'")
-        if upper <= 0:
-            raise ValueError("'lower' and 'upper' must both be positive values")
-
-        if start < lower: mu = sigma
-        elif start > upper: mu = -sigma
-
-        dy = 1 / steps
-        dw = sqrt(dy) * random.randn(steps)
-        increments = (mu - sigma * sigma / 2) * dy + sigma * dw
-        values = [int(v) for v in start * cumprod(exp(increments))]
-        return [start] + values
-
-    def create_yash_coin_graph(self, values, indices):
+        return generate_days(start, 1, None, steps=steps, mu=mu, sigma=sigma,
+                             lower=lower, upper=upper)[0].tolist()
+
+    async def create_yash_coin_graph(self, values, indices):
         """
-            Return a buffer referencing the newly generated YashCoin stock graph.
+            Return the PNG data of a newly generated YashCoin stock graph, which is
+            rendered by the bot's graph renderer, off the event loop.
 
             Parameters
             ----------
@@ -293,33 +592,14 @@ class EconomyCog(BaseCog, name="Economy"):
             
             Returns
             -------
-            buffer: :class:`io.BytesIO`
-                the buffer referencing the newly plotted graph.
+            png: :class:`bytes`
+                the PNG data of the newly plotted graph.
         """
 
         color = self.get_yash_coin_line_color(values[0], values[-1])
-        return create_simple_graph(None, values, xlim=(0, indices), color=color)
-
-    def update_yash_coin_graph(self, new_values, indices):
-        """
-            Return a buffer referencing an updated YashCoin stock graph, based on the
-            values given.
-
-            Parameters
-            ----------
-            new_values: :class:`list[int]`
-                a list of YashCoin values to replace the previous values.
-            indices: :class:`int`
-                the number of YashCoin values given.
-            
-            Returns
-            -------
-            buffer: :class:`io.BytesIO`
-                the buffer referencing the updated graph.
-        """
-
-        color = self.get_yash_coin_line_color(new_values[0], new_values[-1])
-        return update_simple_graph(None, new_values, xlim=(0, indices), color=color)
+        return await self.renderer.render(render_graph, values,
+                                          renderer=settings.GRAPH_RENDERER,
+                                          xlim=(0, indices), color=color)
 
     def get_yash_coin_line_color(self, start, end):
         """
@@ -366,36 +646,95 @@ class EconomyCog(BaseCog, name="Economy"):
                 was successful, otherwise ``None``.
         """
 
-        yash_coin_values = self.get_yash_coin_values(self.yash_coin_data)
-        current_idx = self.get_current_yash_coin_index(len(yash_coin_values))
-        current_value = yash_coin_values[current_idx]
-
-        member_data = self.get_member_data(ctx.guild, ctx.author, default=True)
-
-        nort_bucks = dict_get_as_int(member_data, "nort_bucks", 0)
-        yash_coins = dict_get_as_int(member_data, "yash_coins", 0)
+        current_value = self.ticker.get_price(ctx.guild)
 
         value = amount * current_value
+        error = None
+
+        reason = "invest" if amount > 0 else "divest"
+        async with self.store.transaction(ctx.guild, ctx.author, reason=reason,
+                                          price=current_value) as member_data:
+            if amount > 0 and member_data.nort_bucks < value:
+                error = (f"You do not have the required `{value}` " +
+                         "NortBucks to make this investment")
+            elif amount < 0 and member_data.yash_coins < -amount:
+                error = (f"You do not have the required `{-amount}` " +
+                         "YashCoins to make this divestment")
+            else:
+                member_data.nort_bucks -= value
+                member_data.yash_coins += amount
 
-        if amount > 0 and nort_bucks < value:
-            await ctx.send(
-                f"You do not have the required `{value}` " + 
-                "NortBucks to make this investment"
-            )
+        if error is not None:
+            await ctx.send(error)
             return None
 
-        if amount < 0 and yash_coins < -amount:
-            await ctx.send(
-                f"You do not have the required `{-amount}` " + 
-                "YashCoins to make this divestment"
-            )
-            return None
+        return value
 
-        member_data["nort_bucks"] = nort_bucks - value
-        member_data["yash_coins"] = yash_coins + amount
+    async def handle_payment(self, ctx, recipients, amount, split=False):
+        """
+            Transfer NortBucks from the author of the command to the given members,
+            registering the ones that are not registered yet. The sender's balance is
+            checked once, and every credit along with the debit is applied as a
+            single batch, then written by a single flush.
 
-        set_json_data(self.data_path, self.data)
-        return value
+            Parameters
+            ----------
+            ctx: :class:`discord.Context`
+                the current context for a command sent by a member.
+            recipients: :class:`list[discord.Member, discord.Role]`
+                the members to pay, or roles whose members are all paid. Bots and the
+                sender are left out.
+            amount: :class:`int`
+                the number of NortBucks given to each recipient, or split between
+                them if ``split`` is set.
+            split: :class:`bool, optional`
+                a value determining whether ``amount`` is split evenly between the
+                recipients.
+        """
+
+        members = {}
+        for recipient in recipients:
+            for member in getattr(recipient, "members", [recipient]):
+                if not member.bot and member.id != ctx.author.id:
+                    members[member.id] = member
+
+        if not members:
+            await ctx.send("You must pay at least one other member")
+            return
+        if len(members) > settings.MAX_PAY_RECIPIENTS:
+            await ctx.send("You cannot pay more than " +
+                           f"`{settings.MAX_PAY_RECIPIENTS}` members at a time")
+            return
+
+        share = amount // len(members) if split else amount
+        if share < 1:
+            await ctx.send(f"`{amount}` NortBucks cannot be split between " +
+                           f"`{len(members)}` members")
+            return
+
+        total = share * len(members)
+        sender_id = str(ctx.author.id)
+        async with self.store.batch(ctx.guild, [sender_id, *members],
+                                    reason="pay") as member_list_data:
+            sender_data = member_list_data[sender_id]
+            if sender_data.nort_bucks < total:
+                error = (f"You do not have the required `{total}` NortBucks to make " +
+                         "this payment")
+            else:
+                error = None
+                sender_data.nort_bucks -= total
+                for member_id in members:
+                    member_list_data[str(member_id)].nort_bucks += share
+
+        if error is not None:
+            await ctx.send(error)
+            return
+
+        await self.store.flush()
+        await ctx.send(f"You've paid `{share}` NortBucks to " +
+                       (f"**{next(iter(members.values())).display_name}**"
+                        if len(members) == 1 else f"`{len(members)}` members") +
+                       f", for a total of `{total}` NortBucks")
 
 
 def setup(bot):
@@ -2,19 +2,16 @@ from random                     import randint, uniform
 
 import discord
 from discord.ext                import commands
-from utils                      import (dict_get_as_int, dict_get_as_list,
-                                        get_json_data, get_json_path, set_json_data)
+from utils                      import dict_get_as_list
 
 from cogs.base_cog              import BaseCog
 
 class NortMonsCog(BaseCog, name="NortMons"):
-    nort_mons_data_path = get_json_path("nort_mons")
-    nort_mons_data = get_json_data(nort_mons_data_path)
-
     NORT_MON_COST = 400
 
     def __init__(self, bot):
         super().__init__(bot)
+        self.nort_mons_data = self.state.get_catalog("nort_mons")
 
     @commands.command(
         brief="Catch NortMon",
@@ -24,29 +21,24 @@ class NortMonsCog(BaseCog, name="NortMons"):
     )
     @commands.guild_only()
     async def catch(self, ctx):
-        member_data = self.get_member_data(ctx.guild, ctx.author, default=True)
-        member_nort_mon = member_data.get("nort_mon")
-
-        if member_nort_mon is not None:
-            await ctx.send("You already own a NortMon")
-            return
-
-        nort_bucks = dict_get_as_int(member_data, "nort_bucks")
-
-        if nort_bucks < self.NORT_MON_COST:
-            await ctx.send(
-                f"You do not have the required `{self.NORT_MON_COST}` NortBucks to " +
-                "spend on catching a NortMon"
-            )
+        async with self.store.transaction(ctx.guild, ctx.author,
+                                          reason="nort_mon") as member_data:
+            if member_data.nort_mon is not None:
+                error = "You already own a NortMon"
+            elif member_data.nort_bucks < self.NORT_MON_COST:
+                error = (f"You do not have the required `{self.NORT_MON_COST}` " +
+                         "NortBucks to spend on catching a NortMon")
+            else:
+                error = None
+                nort_mon_name, nort_mon_id = self.get_random_nort_mon()
+                member_data.nort_mon = nort_mon_id
+                member_data.nort_bucks -= self.NORT_MON_COST
+
+        if error is not None:
+            await ctx.send(error)
             return
 
-        nort_mon_name, nort_mon_id = self.get_random_nort_mon()
         rarity, _ = nort_mon_id.split("-")
-
-        member_data["nort_mon"] = nort_mon_id
-        member_data["nort_bucks"] = nort_bucks - self.NORT_MON_COST
-        set_json_data(self.data_path, self.data)
-
         await ctx.send(
             f"You've spent `{self.NORT_MON_COST}` NortBucks to catch " +
             f"**{nort_mon_name}** — a `{rarity.capitalize()}` NortMon!"
@@ -59,16 +51,18 @@ class NortMonsCog(BaseCog, name="NortMons"):
     )
     @commands.guild_only()
     async def release(self, ctx):
-        member_data = self.get_member_data(ctx.guild, ctx.author)
-        member_nort_mon = member_data.get("nort_mon")
+        if not await self.member_is_registered(ctx.guild, ctx.author):
+            await ctx.send("You do not own a NortMon")
+            return
+
+        async with self.store.transaction(ctx.guild, ctx.author) as member_data:
+            member_nort_mon = member_data.nort_mon
+            member_data.nort_mon = None
 
         if member_nort_mon is None:
             await ctx.send("You do not own a NortMon")
             return
 
-        member_data["nort_mon"] = None
-        set_json_data(self.data_path, self.data)
-
         rarity, idx = member_nort_mon.split("-")
         nort_mon_data = dict_get_as_list(self.nort_mons_data, rarity)[int(idx)]
         nort_mon_name = nort_mon_data.get("name")
@@ -87,8 +81,8 @@ class NortMonsCog(BaseCog, name="NortMons"):
         if member is None:
             member= ctx.author
 
-        member_data = self.get_member_data(ctx.guild, member)
-        nort_mon_id = member_data.get("nort_mon") # TODO: create dict_get_as_str method?
+        member_data = await self.get_member_data(ctx.guild, member)
+        nort_mon_id = member_data.nort_mon
 
         if nort_mon_id is None:
             await ctx.send(
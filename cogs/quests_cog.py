@@ -1,19 +1,35 @@
 import asyncio
+import time
 from datetime                   import date
 
 import discord
 from discord.ext                import commands
-from utils                      import (dict_get_as_int, dict_get_as_list,
-                                        get_json_data, get_json_path, set_json_data)
+from utils                      import dict_get_as_int, dict_get_as_list
 
 from cogs.base_cog              import BaseCog
 
 class QuestsCog(BaseCog, name="Quests"):
-    quests_data_path = get_json_path("quests")
-    quests_data = get_json_data(quests_data_path)
-
     def __init__(self, bot):
         super().__init__(bot)
+        self.quests_data = self.state.get_catalog("quests")
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Resume the expeditions that were still running when the bot stopped
+        for guild_id, member_id in await self.store.pending_expeditions():
+            guild = discord.Object(id=int(guild_id))
+            member = discord.Object(id=int(member_id))
+            member_data = await self.get_member_data(guild, member)
+
+            if not member_data.on_expedition:
+                continue
+
+            if member_data.expedition_end is None:
+                # Started before expeditions were persisted, and cannot be resumed
+                async with self.store.transaction(guild, member) as member_data:
+                    member_data.on_expedition = 0
+            else:
+                self.schedule_expedition(guild, member)
 
     ### Daily Claim Command ###
     @commands.command(
@@ -23,22 +39,20 @@ class QuestsCog(BaseCog, name="Quests"):
     )
     @commands.guild_only()
     async def daily(self, ctx):
-        member_data = self.get_member_data(ctx.guild, ctx.author, default=True)
-
-        nort_bucks = dict_get_as_int(member_data, "nort_bucks", 0)
-        prev_daily = member_data.get("prev_daily") # TODO: create dict_get_as_str method?
-
         today = str(date.today())
-        if prev_daily != today:
-            member_data["nort_bucks"] = nort_bucks + 600
-            member_data["prev_daily"] = today
 
+        async with self.store.transaction(ctx.guild, ctx.author,
+                                          reason="daily") as member_data:
+            claimed = member_data.prev_daily != today
+            if claimed:
+                member_data.nort_bucks += 600
+                member_data.prev_daily = today
+
+        if claimed:
             await ctx.send("Daily NortBucks successfully claimed!")
         else:
             await ctx.send("Daily NortBucks already claimed!")
 
-        set_json_data(self.data_path, self.data)
-
     ### Expedition Command ###
     @commands.command(
         aliases=["exp"],
@@ -49,13 +63,7 @@ class QuestsCog(BaseCog, name="Quests"):
     )
     @commands.guild_only()
     async def expedition(self, ctx, level: str=None):
-        # Retrieve json contents
-        member_data = self.get_member_data(ctx.guild, ctx.author, default=True)
-
-        if member_data.get("on_expedition") == 0:
-            await self.start_expedition(ctx, member_data, level)
-        else:
-            await ctx.send("Currently on expedition!")
+        await self.start_expedition(ctx, level)
 
 
 
@@ -64,7 +72,7 @@ class QuestsCog(BaseCog, name="Quests"):
         """
             Return the quest data stored inside ``quest_list_data``. If
             ``quest_list_data`` is not given, retrieve the quest list data from the
-            ``quests.json`` file.
+            ``quests.json`` catalog.
 
             Parameters
             ----------
@@ -93,20 +101,19 @@ class QuestsCog(BaseCog, name="Quests"):
 
         return quest_data
 
-    async def start_expedition(self, ctx, member_data, level):
+    async def start_expedition(self, ctx, level):
         """
             Start an expedition that lasts for a set duration based on the given level.
             If the expedition is successful, add to the member's balance a set amount
             of NortBucks and send a message through the context indicating that the
-            expedition has completed. If any invalid inputs were given or the expedition
-            data could not be retrieved, send an error message through the context.
+            expedition has completed. If any invalid inputs were given, the member is
+            already on an expedition or the expedition data could not be retrieved,
+            send an error message through the context.
 
             Parameters
             ----------
             ctx: :class:`discord.Context`
                 the current context for a command sent by a member.
-            member_data: :class:`dict`
-                a member's data.
             level: :class:`str`
                 the expedition's difficulty level.
         """
@@ -127,23 +134,82 @@ class QuestsCog(BaseCog, name="Quests"):
             await ctx.send(f"Please input a valid level ({', '.join(difficulties)})")
             return
 
-        member_data["on_expedition"] = 1
-        set_json_data(self.data_path, self.data)
+        idx = difficulties.index(level)
+
+        async with self.store.transaction(ctx.guild, ctx.author) as member_data:
+            started = member_data.on_expedition == 0
+            if started:
+                member_data.on_expedition = 1
+                member_data.expedition_end = time.time() + durations[idx]
+                member_data.expedition_reward = rewards[idx]
+                member_data.expedition_channel = ctx.channel.id
+
+        if not started:
+            await ctx.send("Currently on expedition!")
+            return
+
         await ctx.send("Expedition started!")
 
-        idx = difficulties.index(level)
-        await asyncio.sleep(durations[idx])
-
-        nort_bucks = dict_get_as_int(member_data, "nort_bucks", 0)
-        gain = rewards[idx]
-        member_data["nort_bucks"] = nort_bucks + gain
-        member_data["on_expedition"] = 0
-
-        set_json_data(self.data_path, self.data)
-        await ctx.send(
-            f"{ctx.author.mention}\nYour expedition has completed, " +
-            f"netting you `{gain}` NortBucks!"
-        )
+        self.schedule_expedition(ctx.guild, ctx.author)
+
+    def schedule_expedition(self, guild, member):
+        """
+            Run ``finish_expedition`` for the guild member in a background task, unless
+            it is already running. Tasks are held by the bot state, so they keep
+            running when the cog is reloaded.
+
+            Parameters
+            ----------
+            guild: :class:`discord.Guild, discord.Object`
+                a discord guild.
+            member: :class:`discord.Member, discord.Object`
+                a discord member that is part of the guild.
+        """
+
+        key = (str(guild.id), str(member.id))
+        if key not in self.state.expeditions:
+            self.state.expeditions[key] = asyncio.create_task(
+                self.finish_expedition(guild, member)
+            )
+
+    async def finish_expedition(self, guild, member):
+        """
+            Wait until the running expedition of the guild member ends, then add its
+            reward to the member's balance and send a message through the channel the
+            expedition was started from indicating that the expedition has completed.
+
+            Parameters
+            ----------
+            guild: :class:`discord.Guild, discord.Object`
+                a discord guild.
+            member: :class:`discord.Member, discord.Object`
+                a discord member that is part of the guild.
+        """
+
+        try:
+            member_data = await self.get_member_data(guild, member)
+            ends_at = member_data.expedition_end or time.time()
+            await asyncio.sleep(max(0, ends_at - time.time()))
+
+            async with self.store.transaction(guild, member,
+                                              reason="expedition") as member_data:
+                gain = member_data.expedition_reward
+                channel_id = member_data.expedition_channel
+
+                member_data.nort_bucks += gain
+                member_data.on_expedition = 0
+                member_data.expedition_end = None
+                member_data.expedition_reward = 0
+                member_data.expedition_channel = None
+        finally:
+            self.state.expeditions.pop((str(guild.id), str(member.id)), None)
+
+        channel = self.bot.get_channel(channel_id) if channel_id is not None else None
+        if channel is not None:
+            await channel.send(
+                f"<@{member.id}>\nYour expedition has completed, " +
+                f"netting you `{gain}` NortBucks!"
+            )
 
 
 def setup(bot):
@@ -1,6 +1,6 @@
 import discord
 from discord.ext                import commands
-from utils                      import create_progress_bar, dict_get_as_float
+from utils                      import create_progress_bar
 
 from cogs.base_cog              import BaseCog
 
@@ -19,8 +19,8 @@ class StatisticsCog(BaseCog, name="Statistics"):
         if member is None:
             member = ctx.author
 
-        member_data = self.get_member_data(ctx.guild, member)
-        cringe_meter = dict_get_as_float(member_data, "cringe_meter")
+        member_data = await self.get_member_data(ctx.guild, member)
+        cringe_meter = member_data.cringe_meter
         percent, bar = create_progress_bar(cringe_meter)
 
         embed_reply = self.create_embed()
@@ -1,7 +1,11 @@
+from os.path                    import join
 from random                     import randint
+from tempfile                   import TemporaryDirectory
 
 import discord
 from discord.ext                import commands
+from storage.export             import EXPORTERS, FORMATS
+from storage.grants             import GRANT_COLUMNS, grant_members
 from utils                      import get_emoji
 
 from cogs.base_cog              import BaseCog
@@ -87,6 +91,88 @@ class UtilCog(BaseCog, name="Utility"):
             self.bot.reload_extension(cog)
         await ctx.send("All commands successfully reloaded!")
 
+    ### Storage Statistics Command ###
+    @commands.command(
+        brief="Displays storage statistics (me only)",
+        description="Displays the counters of the data store (data), of the graph "
+                    "cache (charts) or of the graph renderer (renders), such as "
+                    "their hits, misses and evictions, or render latencies",
+        ignore_extra=False
+    )
+    @commands.is_owner()
+    async def storage(self, ctx, cache: str="data"):
+        caches = {"data": self.store, "charts": self.state.charts,
+                  "renders": self.state.renderer}
+        if cache not in caches:
+            raise commands.BadArgument()
+
+        stats = caches[cache].stats()
+        embed_reply = self.create_embed()
+        embed_reply.title = "Storage Statistics" if cache == "data" else "Graph Statistics"
+        for name, value in stats.items():
+            embed_reply.add_field(name=f"**{name.capitalize()}**", value=f"`{value}`")
+
+        if "hits" in stats:
+            # Requests waiting for a graph being rendered are served without a render
+            hits = stats["hits"] + stats.get("waits", 0)
+            lookups = hits + stats["misses"]
+            embed_reply.add_field(
+                name="**Hit Rate**",
+                value=f"`{hits / lookups:.2%}`" if lookups else "`N/A`"
+            )
+
+        await ctx.send(embed=embed_reply)
+
+    ### Export Command ###
+    @commands.command(
+        brief="Exports economy data (me only)",
+        description="Exports the data of every member (members) or the YashCoin "
+                    "values (prices) as a compressed file (csv, ndjson)",
+        ignore_extra=False
+    )
+    @commands.is_owner()
+    async def export(self, ctx, data: str="members", fmt: str="csv"):
+        if data not in EXPORTERS or fmt not in FORMATS:
+            raise commands.BadArgument()
+
+        with TemporaryDirectory() as directory:
+            path = join(directory, f"{data}.{fmt}.gz")
+            count = await EXPORTERS[data](self.store, path, fmt)
+            await ctx.send(f"Exported {count} rows", file=discord.File(path))
+
+    ### Grant Command ###
+    @commands.command(
+        brief="Grants currency in bulk (me only)",
+        description="Credits or debits the members of the server from the attached "
+                    f"CSV file of ({', '.join(GRANT_COLUMNS)}) rows. Add \"dry\" to "
+                    "only validate the file",
+        ignore_extra=False
+    )
+    @commands.is_owner()
+    @commands.guild_only()
+    async def grant(self, ctx, mode: str=None):
+        if mode not in (None, "dry") or len(ctx.message.attachments) != 1:
+            raise commands.BadArgument()
+
+        status = await ctx.send("Reading grants...")
+        edited = 0
+
+        async def progress(report):
+            # The status is edited every few seconds at most, to stay under rate limits
+            nonlocal edited
+            if report.elapsed - edited >= 2:
+                edited = report.elapsed
+                await status.edit(content=f"`{report}`")
+
+        with TemporaryDirectory() as directory:
+            path = join(directory, "grants.csv")
+            await ctx.message.attachments[0].save(path)
+            report = await grant_members(self.store, ctx.guild, path,
+                                         dry_run=mode == "dry", progress=progress)
+
+        await status.edit(content=f"`{report}`" + "".join(f"\n`{error}`"
+                                                          for error in report.errors))
+
 
 
     ### Helper Methods ###
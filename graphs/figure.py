@@ -0,0 +1,63 @@
+import io
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure               import Figure
+
+
+def render_line_graph(values, xlim=(), ylim=(), title=None, graph_color="#777",
+                      gradient=True, **kwargs):
+    """
+        Return the PNG data of a line graph of the given values, drawn the same way
+        as :func:`utils.create_simple_graph`. The graph is drawn on its own Agg
+        ``Figure`` rather than on the global ``pyplot`` figure, so several graphs can
+        be rendered at once, in any thread or process.
+
+        Parameters
+        ----------
+        values: :class:`list[int]`
+            the values to plot.
+        xlim: :class:`tuple(int, int), optional`
+            the limits of the x axis.
+        ylim: :class:`tuple(int, int), optional`
+            the limits of the y axis.
+        title: :class:`str, optional`
+            the title of the graph.
+        graph_color: :class:`str, optional`
+            the color of the axes, which suits both light and dark themes by default.
+        gradient: :class:`bool, optional`
+            a value determining whether the area under the line is filled.
+        **kwargs:
+            the other arguments given to ``Axes.plot`` (e.g. ``color``).
+
+        Returns
+        -------
+        png: :class:`bytes`
+            the PNG data of the graph.
+    """
+
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    axes.set_title(title)
+    axes.spines.top.set_visible(False)
+    axes.spines.right.set_visible(False)
+    # Modify colors to be light and dark mode friendly
+    axes.spines.bottom.set_color(graph_color)
+    axes.spines.left.set_color(graph_color)
+    axes.xaxis.label.set_color(graph_color)
+    axes.yaxis.label.set_color(graph_color)
+    axes.tick_params(colors=graph_color, which="both")
+
+    if len(xlim) > 0: axes.set_xlim(*xlim)
+    if len(ylim) > 0: axes.set_ylim(*ylim)
+
+    line = axes.plot(values, **kwargs)[0]
+
+    if gradient:
+        steps = len(values)
+        axes.fill_between(x=range(steps), y1=values, y2=[min(values)] * steps,
+                          facecolor=line.get_color(), alpha=0.2)
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format="png", transparent=True)
+    return buffer.getvalue()
@@ -0,0 +1,113 @@
+import asyncio
+import multiprocessing
+import time
+from collections                import deque
+from concurrent.futures         import ProcessPoolExecutor
+from functools                  import partial
+
+
+class GraphRenderer:
+    """
+        Renders graphs inside a pool of ``workers`` processes, so that rendering never
+        blocks the event loop and several graphs are rendered at once. When
+        ``workers`` is ``0``, graphs are rendered inside a thread of the current
+        process instead, which is only safe for renderers that do not touch the
+        global ``pyplot`` state (e.g. :func:`graphs.figure.render_line_graph`).
+
+        The number of renders waiting for a worker and the time taken by the latest
+        renders (including that wait) are tracked, see ``stats``.
+    """
+
+    def __init__(self, workers=2, samples=100):
+        self.workers = workers
+        self.executor = None
+        self.latencies = deque(maxlen=samples)
+
+        self.renders = 0
+        self.failures = 0
+        self.pending = 0
+        self.max_queued = 0
+
+    @property
+    def queued(self):
+        """
+            The number of renders waiting for a free worker.
+        """
+
+        return max(0, self.pending - max(1, self.workers))
+
+    def stats(self):
+        """
+            Return the counters of the renderer.
+
+            Returns
+            -------
+            stats: :class:`dict`
+                the number of finished and failed renders, the number of renders in
+                progress and waiting for a worker (now and at most), and the mean and
+                95th percentile latency (in milliseconds) of the latest renders.
+        """
+
+        latencies = sorted(self.latencies)
+        return {
+            "workers"     : self.workers,
+            "renders"     : self.renders,
+            "failures"    : self.failures,
+            "pending"     : self.pending,
+            "queued"      : self.queued,
+            "max_queued"  : self.max_queued,
+            "mean_ms"     : round(1000 * sum(latencies) / len(latencies), 1)
+                            if latencies else None,
+            "p95_ms"      : round(1000 * latencies[int(0.95 * (len(latencies) - 1))], 1)
+                            if latencies else None
+        }
+
+    async def render(self, func, *args, **kwargs):
+        """
+            Call ``func`` with the given arguments inside a worker, and return its
+            result (e.g. PNG data). ``func`` and its arguments must be picklable, so
+            ``func`` has to be defined at the top level of a module.
+
+            Parameters
+            ----------
+            func: :class:`Callable[..., bytes]`
+                the rendering function.
+            *args:
+                the positional arguments given to ``func``.
+            **kwargs:
+                the keyword arguments given to ``func``.
+
+            Returns
+            -------
+            png: :class:`bytes`
+                the result of ``func``.
+        """
+
+        if self.executor is None and self.workers > 0:
+            # Workers are spawned rather than forked, since the bot's process holds
+            # running threads (e.g. the storage engine's worker)
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+
+        self.pending += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        start = time.perf_counter()
+        try:
+            result = await asyncio.get_event_loop().run_in_executor(
+                self.executor, partial(func, *args, **kwargs)
+            )
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self.pending -= 1
+
+        self.renders += 1
+        self.latencies.append(time.perf_counter() - start)
+        return result
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
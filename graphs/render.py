@@ -0,0 +1,46 @@
+import settings
+from graphs.sparkline           import render_sparkline
+
+RENDERERS = ("sparkline", "matplotlib")
+
+
+def render_graph(values, renderer=settings.GRAPH_RENDERER, **kwargs):
+    """
+        Return the PNG data of a line graph of the given values, drawn by the given
+        renderer. The ``"sparkline"`` renderer (see
+        :func:`graphs.sparkline.render_sparkline`) falls back to matplotlib (see
+        :func:`graphs.figure.render_line_graph`) for graphs it cannot draw, such as
+        graphs with a title.
+
+        Parameters
+        ----------
+        values: :class:`list[int]`
+            the values to plot.
+        renderer: :class:`str, optional`
+            the renderer (``"sparkline"`` or ``"matplotlib"``).
+        **kwargs:
+            the other arguments given to the renderer (e.g. ``xlim`` or ``color``).
+
+        Returns
+        -------
+        png: :class:`bytes`
+            the PNG data of the graph.
+
+        Raises
+        ------
+        ValueError:
+            ``renderer`` is not a known renderer.
+    """
+
+    if renderer not in RENDERERS:
+        raise ValueError(f"Unknown renderer '{renderer}'")
+
+    if renderer == "sparkline":
+        try:
+            return render_sparkline(values, **kwargs)
+        except ValueError:
+            pass
+
+    # matplotlib is only imported once it is needed, since importing it is slow
+    from graphs.figure import render_line_graph
+    return render_line_graph(values, **kwargs)
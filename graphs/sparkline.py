@@ -0,0 +1,220 @@
+import struct
+import zlib
+
+import numpy as np
+
+# Colors accepted by ``render_sparkline``, matching the named colors of matplotlib
+COLORS = {
+    "gray"  : (128, 128, 128),
+    "green" : (0, 128, 0),
+    "red"   : (255, 0, 0),
+    "blue"  : (0, 0, 255),
+    "black" : (0, 0, 0)
+}
+
+# Position of the plotting area inside the image (left, bottom, right, top), as
+# fractions of its size, which are the defaults of a matplotlib figure
+AXES_BOX = (0.125, 0.11, 0.9, 0.88)
+
+
+def parse_color(color):
+    """
+        Return the RGB components of the given color.
+
+        Parameters
+        ----------
+        color: :class:`str`
+            the name of a color (see ``COLORS``), or its hexadecimal code (e.g.
+            ``"#777"`` or ``"#008000"``).
+
+        Returns
+        -------
+        rgb: :class:`tuple(int, int, int)`
+            the red, green and blue components of the color.
+
+        Raises
+        ------
+        ValueError:
+            ``color`` is not a known color name or a valid hexadecimal code.
+    """
+
+    if color in COLORS:
+        return COLORS[color]
+
+    code = color[1:] if color.startswith("#") else ""
+    if len(code) == 3:
+        code = "".join(digit * 2 for digit in code)
+    if len(code) != 6:
+        raise ValueError(f"Unknown color '{color}'")
+
+    return tuple(int(code[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def encode_png(pixels, level=3):
+    """
+        Return the PNG data of the given RGBA pixels.
+
+        Parameters
+        ----------
+        pixels: :class:`numpy.ndarray`
+            the pixels, as ``uint8`` values with a shape of ``(height, width, 4)``.
+        level: :class:`int, optional`
+            the zlib compression level, which is kept low by default since
+            compressing takes most of the time of a render.
+
+        Returns
+        -------
+        png: :class:`bytes`
+            the PNG data.
+    """
+
+    height, width, _ = pixels.shape
+
+    def chunk(kind, data):
+        return (struct.pack(">I", len(data)) + kind + data
+                + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    # Every row is stored as its difference with the row above ("Up" filter, type 2),
+    # which is mostly zeros for graphs and compresses much faster
+    flat = pixels.reshape(height, width * 4)
+    rows = np.empty((height, 1 + width * 4), dtype=np.uint8)
+    rows[:, 0] = 2
+    rows[0, 1:] = flat[0]
+    np.subtract(flat[1:], flat[:-1], out=rows[1:, 1:])
+
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows.tobytes(), level))
+            + chunk(b"IEND", b""))
+
+
+def render_sparkline(values, xlim=(), ylim=(), color="gray", graph_color="#777",
+                     gradient=True, title=None, width=640, height=480, line_width=1.5):
+    """
+        Return the PNG data of a line graph of the given values, drawn with NumPy
+        alone: the area under the line is filled with a vertical gradient of the
+        line's color, and the line is drawn over it with anti-aliasing, on a
+        transparent background. The graph is laid out like
+        :func:`graphs.figure.render_line_graph`, but without tick labels, which makes
+        it much cheaper to render than through matplotlib. A single value, or limits
+        of the x axis spanning no values, are drawn as a flat line across the axes
+        at the last value.
+
+        Parameters
+        ----------
+        values: :class:`list[int]`
+            the values to plot.
+        xlim: :class:`tuple(int, int), optional`
+            the limits of the x axis.
+        ylim: :class:`tuple(int, int), optional`
+            the limits of the y axis.
+        color: :class:`str, optional`
+            the color of the line (see ``parse_color``).
+        graph_color: :class:`str, optional`
+            the color of the axes.
+        gradient: :class:`bool, optional`
+            a value determining whether the area under the line is filled.
+        title: :class:`str, optional`
+            must be ``None``, since text cannot be drawn.
+        width: :class:`int, optional`
+            the width of the image, in pixels.
+        height: :class:`int, optional`
+            the height of the image, in pixels.
+        line_width: :class:`float, optional`
+            the width of the line, in pixels.
+
+        Returns
+        -------
+        png: :class:`bytes`
+            the PNG data of the graph.
+
+        Raises
+        ------
+        ValueError:
+            ``values`` is empty.\n
+            ``title`` is given.\n
+            ``color`` or ``graph_color`` is not a known color.
+    """
+
+    if len(values) == 0:
+        raise ValueError("'values' must not be empty")
+    if title:
+        raise ValueError("Titles cannot be drawn")
+
+    values = np.asarray(values, dtype=np.float64)
+    line_rgb = parse_color(color)
+    axes_rgb = parse_color(graph_color)
+
+    # Limits default to the data, with the same 5% margins as matplotlib
+    low, high = ylim if len(ylim) > 0 else (values.min(), values.max())
+    if len(ylim) == 0:
+        margin = (high - low) * 0.05 or 1
+        low, high = low - margin, high + margin
+    elif low == high:
+        low, high = low - 1, high + 1
+    first, last = xlim if len(xlim) > 0 else (0, max(1, len(values) - 1))
+
+    if len(values) < 2 or first == last:
+        values = np.full(2, values[-1])
+        first, last = 0, 1
+
+    left, bottom, right, top = (AXES_BOX[0] * width, (1 - AXES_BOX[1]) * height,
+                                AXES_BOX[2] * width, (1 - AXES_BOX[3]) * height)
+    xs = left + (np.arange(len(values)) - first) / (last - first) * (right - left)
+    ys = bottom - (values - low) / (high - low) * (bottom - top)
+
+    # The line and the area under it share the same color, so only their opacities
+    # need to be combined, and only the rows and columns they span are drawn
+    alpha = np.zeros((height, width), dtype=np.uint8)
+    if gradient and len(values) > 1:
+        # Fill down to the lowest value, fading out from 0.3 to 0.1 opacity
+        start, end = max(0, int(np.ceil(xs[0]))), min(width, int(xs[-1]) + 1)
+        base = ys.max()
+        first_row, last_row = max(0, int(ys.min())), min(height, int(base) + 1)
+        line_ys = np.interp(np.arange(start, end) + 0.5, xs, ys).astype(np.float32)
+        rows = np.arange(first_row, last_row, dtype=np.float32)[:, None] + 0.5
+        depth = (rows - ys.min()) / max(base - ys.min(), 1)
+        alpha[first_row:last_row, start:end] = np.where(rows >= line_ys,
+                                                        255 * (0.3 - 0.2 * depth), 0)
+
+    # The line is sampled every half pixel, and each sample covers the pixels within
+    # half the line's width of it (fully, or partially near the edge)
+    lengths = np.hypot(np.diff(xs), np.diff(ys))
+    counts = np.maximum(1, np.ceil(lengths * 2).astype(np.intp))
+    segments = np.repeat(np.arange(len(lengths)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    steps = offsets / counts[segments]
+    sample_xs = np.append(xs[segments] + np.diff(xs)[segments] * steps, xs[-1])
+    sample_ys = np.append(ys[segments] + np.diff(ys)[segments] * steps, ys[-1])
+
+    reach = int(np.ceil(line_width / 2))
+    offsets = np.arange(-reach, reach + 1)
+    pixel_xs = (np.floor(sample_xs).astype(np.intp)[:, None, None] + offsets[None, None, :])
+    pixel_ys = (np.floor(sample_ys).astype(np.intp)[:, None, None] + offsets[None, :, None])
+    distances = np.hypot(pixel_xs + 0.5 - sample_xs[:, None, None],
+                         pixel_ys + 0.5 - sample_ys[:, None, None])
+    pixel_xs, pixel_ys = np.broadcast_arrays(pixel_xs, pixel_ys)
+    covered = np.clip(line_width / 2 + 0.5 - distances, 0, 1).ravel()
+    inside = ((pixel_xs >= 0) & (pixel_xs < width)
+              & (pixel_ys >= 0) & (pixel_ys < height)).ravel() & (covered > 0)
+
+    # Each pixel keeps the coverage of its closest sample
+    pixel_ids = (pixel_ys.ravel() * width + pixel_xs.ravel())[inside]
+    covered = covered[inside]
+    order = np.lexsort((covered, pixel_ids))
+    pixel_ids, covered = pixel_ids[order], covered[order]
+    last = np.append(pixel_ids[1:] != pixel_ids[:-1], True)
+    pixel_ids, covered = pixel_ids[last], covered[last]
+
+    flat_alpha = alpha.reshape(-1)
+    fill = flat_alpha[pixel_ids] / 255
+    flat_alpha[pixel_ids] = np.round(255 * (covered + fill * (1 - covered)))
+
+    pixels = np.empty((height, width, 4), dtype=np.uint8)
+    pixels[..., :3] = line_rgb
+    pixels[..., 3] = alpha
+
+    # Opaque left and bottom spines, like the graphs drawn by matplotlib
+    pixels[int(top):int(bottom) + 1, int(left)] = (*axes_rgb, 255)
+    pixels[int(bottom), int(left):int(right) + 1] = (*axes_rgb, 255)
+    return encode_png(pixels)
@@ -0,0 +1,203 @@
+import os
+from datetime                   import date
+from os.path                    import getsize, isdir, isfile, join
+
+import numpy as np
+
+import settings
+from utils                      import get_rel_path
+
+
+def create_archive(market_data, steps=96):
+    """
+        Return the archive of past YashCoin values that the given YashCoin data points
+        to, storing a pointer to a new archive if there is none yet. The pointer is
+        all that is kept inside the YashCoin data.
+
+        Parameters
+        ----------
+        market_data: :class:`dict`
+            the data on YashCoins.
+        steps: :class:`int, optional`
+            the number of times the value of YashCoin fluctuates per day.
+
+        Returns
+        -------
+        archive: :class:`PriceArchive`
+            the archive of past YashCoin values.
+    """
+
+    pointer = market_data.setdefault(
+        "archive", {"directory": settings.MARKET_ARCHIVE_NAME, "steps": steps}
+    )
+    return PriceArchive(get_rel_path("assets", pointer["directory"]), pointer["steps"])
+
+
+class PriceArchive:
+    """
+        Append-only archive of the values of every finished day of every market. Each
+        market is stored in two files of ``directory``: ``<market>.ticks`` holds the
+        values of each day as a row of ``1 + steps`` int32 values, and
+        ``<market>.days`` holds the ordinal of each row's day, in increasing order,
+        which indexes the rows. Both are read through NumPy memory maps, so a range
+        query only touches the rows it returns.
+
+        The day of a row is written after its values, so a row is only visible once
+        it is complete, and a partially written row is ignored. Both files are cut
+        back to their complete rows before the next row is added, so that it stays
+        aligned with its day.
+    """
+
+    def __init__(self, directory, steps=96):
+        self.directory = directory
+        self.steps = steps
+        self._maps = {}
+
+    def markets(self):
+        """
+            Return the keys of every market with archived values.
+
+            Returns
+            -------
+            markets: :class:`list[str]`
+                the keys of the markets, sorted.
+        """
+
+        if not isdir(self.directory):
+            return []
+
+        return sorted(fname[:-5].replace("-", ":") for fname in os.listdir(self.directory)
+                      if fname.endswith(".days"))
+
+    def get_paths(self, market):
+        """
+            Return the paths of the files holding the values of the given market.
+
+            Parameters
+            ----------
+            market: :class:`str`
+                the key of the market.
+
+            Returns
+            -------
+            paths: :class:`tuple(str, str)`
+                the paths of the values and of the day index.
+        """
+
+        name = market.replace(":", "-")
+        return (join(self.directory, f"{name}.ticks"), join(self.directory, f"{name}.days"))
+
+    def append(self, market, day, values):
+        """
+            Add the values of the given day of the given market, unless a day at or
+            after it is already archived.
+
+            Parameters
+            ----------
+            market: :class:`str`
+                the key of the market.
+            day: :class:`datetime.date`
+                the day of the values.
+            values: :class:`numpy.ndarray`
+                the ``1 + steps`` values of the day.
+
+            Returns
+            -------
+            appended: :class:`bool`
+                a value indicating whether the values were archived.
+        """
+
+        days, _ = self._load(market)
+        if len(days) and days[-1] >= day.toordinal():
+            return False
+
+        ticks_path, days_path = self.get_paths(market)
+        row_size = (self.steps + 1) * 4
+        os.makedirs(self.directory, exist_ok=True)
+        with open(ticks_path, "ab") as ticks_file:
+            # Drop any partially written row first
+            ticks_file.truncate(len(days) * row_size)
+            ticks_file.write(np.asarray(values, dtype=np.int32).tobytes())
+        with open(days_path, "ab") as days_file:
+            # As well as any partially written day
+            days_file.truncate(len(days) * 4)
+            days_file.write(np.int32(day.toordinal()).tobytes())
+
+        self._maps.pop(market, None)
+        return True
+
+    def append_columns(self, day, columns, values):
+        """
+            Add the values of the given day of several markets at once.
+
+            Parameters
+            ----------
+            day: :class:`datetime.date`
+                the day of the values.
+            columns: :class:`dict`
+                the column of every market, by key.
+            values: :class:`numpy.ndarray`
+                the values of every market, with a shape of ``(1 + steps, markets)``.
+
+            Returns
+            -------
+            count: :class:`int`
+                the number of archived markets.
+        """
+
+        return sum(self.append(market, day, values[:, column])
+                   for market, column in columns.items() if column < values.shape[1])
+
+    def get_range(self, market, first_day=None, last_day=None):
+        """
+            Return the archived values of the given market between two days.
+
+            Parameters
+            ----------
+            market: :class:`str`
+                the key of the market.
+            first_day: :class:`datetime.date, optional`
+                the first day of the range, or ``None`` to start from the oldest day.
+            last_day: :class:`datetime.date, optional`
+                the last day of the range, or ``None`` to end at the latest day.
+
+            Returns
+            -------
+            days: :class:`numpy.ndarray`
+                the ordinal of each archived day inside the range.
+            ticks: :class:`numpy.ndarray`
+                the values of each of those days, with a shape of
+                ``(days, 1 + steps)``.
+        """
+
+        days, ticks = self._load(market)
+        start = 0 if first_day is None else np.searchsorted(days, first_day.toordinal())
+        end = (len(days) if last_day is None
+               else np.searchsorted(days, last_day.toordinal(), side="right"))
+        return (days[start:end], ticks[start:end])
+
+    def get_first_day(self, market):
+        days, _ = self._load(market)
+        return date.fromordinal(int(days[0])) if len(days) else None
+
+    def _load(self, market):
+        ticks_path, days_path = self.get_paths(market)
+        size = getsize(days_path) if isfile(days_path) else 0
+        cached = self._maps.get(market)
+        if cached is not None and cached[0] == size:
+            return cached[1]
+
+        count = size // 4
+        if isfile(ticks_path):
+            count = min(count, getsize(ticks_path) // ((self.steps + 1) * 4))
+
+        if count:
+            days = np.memmap(days_path, dtype=np.int32, mode="r", shape=(count,))
+            ticks = np.memmap(ticks_path, dtype=np.int32, mode="r",
+                              shape=(count, self.steps + 1))
+        else:
+            days = np.empty(0, dtype=np.int32)
+            ticks = np.empty((0, self.steps + 1), dtype=np.int32)
+
+        self._maps[market] = (size, (days, ticks))
+        return (days, ticks)
@@ -0,0 +1,118 @@
+import numpy as np
+
+
+def lttb(values, budget):
+    """
+        Return at most ``budget`` of the given values, picked with the
+        Largest-Triangle-Three-Buckets algorithm, which keeps the visual shape of a
+        line (its peaks and troughs) much better than picking values at a regular
+        interval. The first and last values are always kept.
+
+        Parameters
+        ----------
+        values: :class:`numpy.ndarray`
+            the values to downsample.
+        budget: :class:`int`
+            the maximum number of values to return (at least ``3``).
+
+        Returns
+        -------
+        indices: :class:`numpy.ndarray`
+            the sorted indices of the kept values.
+    """
+
+    size = len(values)
+    if size <= budget or budget < 3:
+        return np.arange(size)
+
+    values = np.asarray(values, dtype=np.float64)
+    edges = np.linspace(1, size - 1, budget - 1).astype(np.intp)
+
+    indices = np.empty(budget, dtype=np.intp)
+    indices[0] = 0
+    indices[-1] = size - 1
+
+    previous = 0
+    for bucket in range(budget - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else size
+        next_x = (end + next_end - 1) / 2
+        next_y = values[end:next_end].mean() if next_end > end else values[-1]
+
+        # Keep the value forming the largest triangle with the previously kept value
+        # and the average of the next bucket
+        xs = np.arange(start, end)
+        areas = np.abs((previous - next_x) * (values[start:end] - values[previous])
+                       - (previous - xs) * (next_y - values[previous]))
+        previous = indices[bucket + 1] = start + int(np.argmax(areas))
+
+    return indices
+
+
+def min_max(values, budget):
+    """
+        Return at most ``budget`` of the given values, by splitting them into
+        ``budget // 2`` buckets and keeping the smallest and largest value of each
+        bucket, in their original order. This is cheaper than ``lttb`` and never
+        hides a spike.
+
+        Parameters
+        ----------
+        values: :class:`numpy.ndarray`
+            the values to downsample.
+        budget: :class:`int`
+            the maximum number of values to return (at least ``2``).
+
+        Returns
+        -------
+        indices: :class:`numpy.ndarray`
+            the sorted indices of the kept values.
+    """
+
+    size = len(values)
+    buckets = budget // 2
+    if size <= budget or buckets < 1:
+        return np.arange(size)
+
+    values = np.asarray(values)
+    edges = np.linspace(0, size, buckets + 1).astype(np.intp)
+    lows = np.minimum.reduceat(values, edges[:-1])
+    highs = np.maximum.reduceat(values, edges[:-1])
+
+    # Position of the first minimum and maximum inside each bucket
+    bucket_ids = np.repeat(np.arange(buckets), np.diff(edges))
+    is_low = values == lows[bucket_ids]
+    is_high = values == highs[bucket_ids]
+    low_indices = np.flatnonzero(is_low)[np.searchsorted(
+        bucket_ids[is_low], np.arange(buckets))]
+    high_indices = np.flatnonzero(is_high)[np.searchsorted(
+        bucket_ids[is_high], np.arange(buckets))]
+
+    return np.unique(np.concatenate((low_indices, high_indices)))
+
+
+METHODS = {"lttb": lttb, "min_max": min_max}
+
+
+def downsample(values, budget, method="lttb"):
+    """
+        Return the given values reduced to at most ``budget`` values using the given
+        method, so that plotting a long range costs as much as plotting a short one.
+
+        Parameters
+        ----------
+        values: :class:`numpy.ndarray`
+            the values to downsample.
+        budget: :class:`int`
+            the maximum number of values to return.
+        method: :class:`str, optional`
+            the downsampling method (``"lttb"`` or ``"min_max"``).
+
+        Returns
+        -------
+        values: :class:`numpy.ndarray`
+            the downsampled values.
+    """
+
+    values = np.asarray(values)
+    return values[METHODS[method](values, budget)]
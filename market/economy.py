@@ -0,0 +1,416 @@
+import asyncio
+import math
+import time
+from collections                import Counter, OrderedDict
+from operator                   import attrgetter, itemgetter
+
+import numpy as np
+
+import settings
+from storage.records            import MemberRecord
+
+
+class QuantileSketch:
+    """
+        Approximate distribution of a multiset of values, which can be updated, merged
+        with another sketch and queried in a time that only depends on the spread of
+        the values, not on their number. Values are counted inside logarithmic buckets
+        (as in DDSketch), so every quantile is returned with a relative error of at
+        most ``accuracy``. Since buckets only hold counts, values can be removed as
+        well as added.
+    """
+
+    def __init__(self, accuracy=settings.ECONOMY_SKETCH_ACCURACY):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        # Counts of the positive values and of the absolute negative values, by bucket
+        self.positive = Counter()
+        self.negative = Counter()
+        self.zeros = 0
+        self.count = 0
+
+    def get_bucket(self, value):
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def get_value(self, bucket):
+        """
+            Return the value representing the given bucket, which is within the
+            sketch's accuracy of any value inside the bucket.
+        """
+
+        return 2 * self.gamma ** bucket / (1 + self.gamma)
+
+    def add(self, value, count=1):
+        """
+            Add the given value to the sketch, or remove it if ``count`` is negative.
+
+            Parameters
+            ----------
+            value: :class:`float`
+                the value.
+            count: :class:`int, optional`
+                the number of times the value is added.
+        """
+
+        if value > 0:
+            buckets, bucket = self.positive, self.get_bucket(value)
+        elif value < 0:
+            buckets, bucket = self.negative, self.get_bucket(-value)
+        else:
+            self.zeros += count
+            self.count += count
+            return
+
+        buckets[bucket] += count
+        if buckets[bucket] <= 0:
+            del buckets[bucket]
+        self.count += count
+
+    def remove(self, value):
+        self.add(value, -1)
+
+    def add_array(self, values):
+        """
+            Add every value of the given array to the sketch at once.
+
+            Parameters
+            ----------
+            values: :class:`numpy.ndarray`
+                the values.
+        """
+
+        values = np.asarray(values, dtype=np.float64)
+        for buckets, selected in ((self.positive, values[values > 0]),
+                                  (self.negative, -values[values < 0])):
+            indices, counts = np.unique(np.ceil(np.log(selected) / self.log_gamma),
+                                        return_counts=True)
+            buckets.update(dict(zip(indices.astype(int).tolist(), counts.tolist())))
+
+        self.zeros += int(np.count_nonzero(values == 0))
+        self.count += len(values)
+
+    def merge(self, other):
+        """
+            Add every value of another sketch with the same accuracy to the sketch.
+
+            Parameters
+            ----------
+            other: :class:`QuantileSketch`
+                the other sketch.
+        """
+
+        if other.accuracy != self.accuracy:
+            raise ValueError("Sketches of different accuracies cannot be merged")
+
+        self.positive.update(other.positive)
+        self.negative.update(other.negative)
+        self.zeros += other.zeros
+        self.count += other.count
+
+    def groups(self):
+        """
+            Return the value representing each non-empty bucket along with its count,
+            in increasing order of value.
+
+            Returns
+            -------
+            groups: :class:`list[tuple(float, int)]`
+                the value and count of every bucket.
+        """
+
+        groups = [(-self.get_value(bucket), self.negative[bucket])
+                  for bucket in sorted(self.negative, reverse=True)]
+        if self.zeros:
+            groups.append((0, self.zeros))
+        groups.extend((self.get_value(bucket), self.positive[bucket])
+                      for bucket in sorted(self.positive))
+        return groups
+
+    def quantile(self, q, groups=None):
+        """
+            Return the value at the given quantile.
+
+            Parameters
+            ----------
+            q: :class:`float`
+                the quantile, between 0 and 1 (e.g. ``0.5`` for the median).
+            groups: :class:`list[tuple(float, int)], optional`
+                the result of ``groups``, if it was already computed.
+
+            Returns
+            -------
+            value: :class:`float, None`
+                the value at the quantile, or ``None`` if the sketch is empty.
+        """
+
+        if self.count <= 0:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = 0
+        for value, count in groups or self.groups():
+            seen += count
+            if seen > rank:
+                return value
+
+        return value
+
+    def gini(self, groups=None):
+        """
+            Return the Gini coefficient of the values, computed from their buckets.
+
+            Parameters
+            ----------
+            groups: :class:`list[tuple(float, int)], optional`
+                the result of ``groups``, if it was already computed.
+
+            Returns
+            -------
+            gini: :class:`float, None`
+                the Gini coefficient, or ``None`` if the sketch is empty or its values
+                do not add up to a positive total.
+        """
+
+        # With values sorted in increasing order, G = 2 * sum(i * x_i) / (n * sum(x_i))
+        # - (n + 1) / n, where a bucket of c values occupies c consecutive ranks
+        total = weighted = 0
+        seen = 0
+        for value, count in groups or self.groups():
+            total += value * count
+            weighted += value * (count * seen + count * (count + 1) / 2)
+            seen += count
+
+        if seen <= 0 or total <= 0:
+            return None
+
+        return 2 * weighted / (seen * total) - (seen + 1) / seen
+
+
+class EconomySummary:
+    """
+        Running aggregates of the economy of a guild: the total NortBucks and
+        YashCoins of its members, the number of NortMons of each rarity, and a sketch
+        of their net worths at the YashCoin price it was computed at. The balance of
+        each member is kept, so that a change only replaces its member's
+        contribution, and a summary is read without going through the members.
+
+        Computing a summary only reads the given records, so it can be done off the
+        event loop.
+    """
+
+    get_entry = attrgetter("nort_bucks", "yash_coins", "nort_mon")
+
+    def __init__(self, members, price, accuracy=settings.ECONOMY_SKETCH_ACCURACY):
+        member_ids = [member_id for member_id, _ in members]
+        entries = [self.get_entry(record) for _, record in members]
+        self.members = dict(zip(member_ids, entries))
+
+        nort_bucks = np.fromiter(map(itemgetter(0), entries), dtype=np.int64,
+                                 count=len(entries))
+        yash_coins = np.fromiter(map(itemgetter(1), entries), dtype=np.int64,
+                                 count=len(entries))
+
+        self.price = price
+        self.nort_bucks = int(nort_bucks.sum())
+        self.yash_coins = int(yash_coins.sum())
+        self.rarities = Counter()
+        for nort_mon, count in Counter(map(itemgetter(2), entries)).items():
+            self.rarities[self.get_rarity(nort_mon)] += count
+        self.sketch = QuantileSketch(accuracy)
+        self.sketch.add_array(nort_bucks + yash_coins * price)
+        self.computed = time.monotonic()
+
+    @staticmethod
+    def get_rarity(nort_mon):
+        return nort_mon.split("-")[0] if nort_mon else None
+
+    def update(self, member_id, record):
+        """
+            Replace the contribution of the given member by its current balance.
+
+            Parameters
+            ----------
+            member_id: :class:`str`
+                the id of the member.
+            record: :class:`storage.records.MemberRecord, None`
+                the member's record, or ``None`` if the member was removed.
+        """
+
+        entry = None if record is None else self.get_entry(record)
+        previous = self.members.pop(member_id, None)
+        if entry is not None:
+            self.members[member_id] = entry
+        if previous == entry:
+            return
+
+        for sign, member_entry in ((-1, previous), (1, entry)):
+            if member_entry is None:
+                continue
+
+            nort_bucks, yash_coins, nort_mon = member_entry
+            self.nort_bucks += sign * nort_bucks
+            self.yash_coins += sign * yash_coins
+            self.rarities[self.get_rarity(nort_mon)] += sign
+            self.sketch.add(nort_bucks + yash_coins * self.price, sign)
+
+    def summarize(self, price):
+        """
+            Return the summary of the economy.
+
+            Parameters
+            ----------
+            price: :class:`int`
+                the current YashCoin price, which values the mean net worth
+                (percentiles and the Gini coefficient use the price the summary was
+                computed at).
+
+            Returns
+            -------
+            summary: :class:`dict`
+                the number of members, NortBuck supply, YashCoin float, mean, median
+                and 90th percentile net worth, Gini coefficient, and number of
+                NortMons by rarity (``None`` counting members without one).
+        """
+
+        members = len(self.members)
+        groups = self.sketch.groups()
+        return {
+            "members"     : members,
+            "nort_bucks"  : self.nort_bucks,
+            "yash_coins"  : self.yash_coins,
+            "mean"        : (self.nort_bucks + self.yash_coins * price) / members
+                            if members else None,
+            "median"      : self.sketch.quantile(0.5, groups),
+            "p90"         : self.sketch.quantile(0.9, groups),
+            "gini"        : self.sketch.gini(groups),
+            "rarities"    : {rarity: count for rarity, count in self.rarities.items()
+                             if count > 0}
+        }
+
+
+class EconomySummaries:
+    """
+        The economy summaries of the guilds that were recently asked for, kept up to
+        date as members change (through the data store's change listeners). Members
+        moved to the cold storage keep counting with their archived balance. The
+        totals do not depend on the YashCoin price, which is applied when a summary is
+        read, but the net worth sketch does: a summary older than ``interval`` minutes
+        is computed again inside a thread when it is read, from every member, which
+        also corrects any drift. Members modified in the meantime are applied again to
+        the new summary. Only the ``size`` most recently used summaries are kept.
+    """
+
+    def __init__(self, store, ticker, size=settings.ECONOMY_CACHE_SIZE,
+                 interval=settings.ECONOMY_RECOMPUTE_MINUTES):
+        self.store = store
+        self.ticker = ticker
+        self.size = size
+        self.interval = interval * 60
+        self.summaries = OrderedDict()
+        # Records of the members modified while their guild's summary is computed
+        # again, by member id, by guild
+        self._recomputing = {}
+
+        store.add_listener(self.on_change)
+
+    async def get(self, guild):
+        """
+            Return the economy summary of the given guild.
+
+            Parameters
+            ----------
+            guild: :class:`discord.Guild, int, str`
+                a discord guild, or its id.
+
+            Returns
+            -------
+            summary: :class:`dict`
+                the guild's summary (see :meth:`EconomySummary.summarize`).
+        """
+
+        guild_id = str(getattr(guild, "id", guild))
+        summary = self.summaries.get(guild_id)
+        if summary is None:
+            members = await self._get_members(guild_id)
+            # The summary may have been computed by another lookup while loading
+            if guild_id in self.summaries:
+                return await self.get(guild_id)
+
+            summary = self.summaries[guild_id] = EconomySummary(
+                members, self.ticker.get_price(guild_id)
+            )
+            while len(self.summaries) > self.size:
+                self.summaries.popitem(last=False)
+        else:
+            self.summaries.move_to_end(guild_id)
+            if (time.monotonic() - summary.computed >= self.interval
+                    and guild_id not in self._recomputing):
+                asyncio.ensure_future(self.recompute(guild_id))
+
+        return summary.summarize(self.ticker.get_price(guild_id))
+
+    def on_change(self, guild_id, guild_data, member_ids):
+        summary = self.summaries.get(guild_id)
+        if summary is None:
+            return
+
+        if member_ids is None or guild_data is None:
+            # The whole guild changed, so its summary is computed again when needed
+            del self.summaries[guild_id]
+            return
+
+        # Members missing from their guild were moved to the cold storage, and keep
+        # their archived balance
+        member_list_data = guild_data.get("yc_members", {})
+        records = {member_id: member_list_data[member_id] for member_id in member_ids
+                   if member_id in member_list_data}
+        for member_id, record in records.items():
+            summary.update(member_id, record)
+        if guild_id in self._recomputing:
+            self._recomputing[guild_id].update(records)
+
+    async def recompute(self, guild_id):
+        """
+            Compute the summary of the given guild again, inside a thread, at the
+            current YashCoin price.
+
+            Parameters
+            ----------
+            guild_id: :class:`str`
+                the id of the guild.
+        """
+
+        summary = self.summaries.get(guild_id)
+        if summary is None or guild_id in self._recomputing:
+            return
+
+        # Members modified until the new summary replaces the current one are applied
+        # to it, so the collection only stops once it is in place
+        modified = self._recomputing[guild_id] = {}
+        try:
+            members = await self._get_members(guild_id)
+            recomputed = await asyncio.get_event_loop().run_in_executor(
+                None, EconomySummary, members, self.ticker.get_price(guild_id),
+                summary.sketch.accuracy
+            )
+
+            # The summary may have been dropped while computing
+            if self.summaries.get(guild_id) is not summary:
+                return
+
+            for member_id, record in modified.items():
+                recomputed.update(member_id, record)
+            self.summaries[guild_id] = recomputed
+        except Exception as error:
+            print(f"Failed to compute the economy of {guild_id}: {error}", flush=True)
+        finally:
+            del self._recomputing[guild_id]
+
+    async def _get_members(self, guild_id):
+        guild_data = await self.store.get_guild(guild_id) or {}
+        members = list(guild_data.get("yc_members", {}).items())
+        members.extend((member_id, MemberRecord.from_dict(member_data))
+                       for member_id, member_data
+                       in (await self.store.get_archived(guild_id)).items())
+        return members
@@ -0,0 +1,384 @@
+import asyncio
+from datetime                   import date, timedelta
+
+import numpy as np
+
+import settings
+from market.prices              import generate_markets, roll_over
+
+
+class MarketEngine:
+    """
+        Prices of every market, where a market is a ticker listed in a guild. The
+        values of the current day are stored column-wise, inside a single array of
+        shape ``(1 + steps, markets)``, so that advancing every market by a tick is a
+        single row lookup and starting a new day is a single NumPy call.
+
+        Column ``0`` is the market shared by every guild, whose days are pregenerated
+        by :func:`market.prices.roll_over`. When ``per_guild`` is set, each guild
+        trades on its own markets instead, which are listed on first access. Since the
+        values are regenerated from their seeds, only the current day and its seed
+        are stored inside the YashCoin data (under ``"markets"``), while the listed
+        markets are stored apart, in ``listings``: the column of each market, the
+        value it starts the current day with and the day it was listed on, by key.
+        Listing a market only marks that market as modified (through ``on_list``),
+        and starting a new day marks the YashCoin data as modified (through
+        ``on_change``) along with every market. The seed of each day is derived from
+        a root seed, so any past day can be generated again from its starting values
+        and the markets listed before it. Days skipped while the bot was offline are
+        generated as well when the next day starts, one after the other, so that
+        every market starts that day where the skipped ones left it.
+
+        When an ``archive`` is given, the values of every market are added to it once
+        their day is over, inside another thread (see ``archive_days``), and read from
+        memory until then. Unless ``roll`` is unset, a new day is started right away
+        if the stored one is over.
+
+        Columns are allocated ahead of time, and their number doubles whenever it
+        runs out, so listing many markets one at a time only copies the values a
+        logarithmic number of times. ``values`` is a view of the listed columns.
+    """
+
+    SHARED = "shared"
+    DEFAULT_TICKER = "YSH"
+
+    def __init__(self, market_data, listings=None, per_guild=settings.MARKET_PER_GUILD,
+                 steps=96, archive=None, on_change=None, on_list=None, roll=True):
+        self.market_data = market_data
+        self.listings = {} if listings is None else listings
+        self.per_guild = per_guild
+        self.steps = steps
+        self.archive = archive
+        self.on_change = on_change
+        self.on_list = on_list
+        self.finished = []
+
+        self.state = market_data.setdefault("markets",
+                                            {"day": None, "seed": None, "rolled": 0})
+        # Keys of the listed markets, in the order of their columns
+        self.keys = sorted(self.listings, key=lambda key: self.listings[key][0])
+        self.columns = {self.SHARED: 0}
+        self.columns.update((key, column) for column, key in enumerate(self.keys, start=1))
+        self.values = np.empty((steps + 1, 0), dtype=np.int64)
+        self.prices = None
+        self._buffer = self.values
+        self._archiving = False
+
+        # The stored day is loaded first, since the next day starts where it ended
+        if self.state["day"] is not None:
+            self._load_day()
+        if roll:
+            self.roll_over(date.today())
+
+    ### Accessors ###
+    def get_key(self, guild, ticker=DEFAULT_TICKER):
+        """
+            Return the key of the market that the given guild trades the given ticker
+            on.
+
+            Parameters
+            ----------
+            guild: :class:`discord.Guild, int, str`
+                a discord guild, or its id.
+            ticker: :class:`str, optional`
+                the ticker of the market.
+
+            Returns
+            -------
+            key: :class:`str`
+                the key of the market.
+        """
+
+        if not self.per_guild:
+            return self.SHARED
+
+        return f"{getattr(guild, 'id', guild)}:{ticker}"
+
+    def get_column(self, guild, ticker=DEFAULT_TICKER):
+        """
+            Return the column holding the values of the market that the given guild
+            trades the given ticker on, listing the market if it does not exist yet.
+
+            Parameters
+            ----------
+            guild: :class:`discord.Guild, int, str`
+                a discord guild, or its id.
+            ticker: :class:`str, optional`
+                the ticker of the market.
+
+            Returns
+            -------
+            column: :class:`int`
+                the index of the market's column.
+        """
+
+        key = self.get_key(guild, ticker)
+        column = self.columns.get(key)
+        if column is None:
+            column = self._list(key)
+
+        return column
+
+    def get_values(self, guild, ticker=DEFAULT_TICKER):
+        """
+            Return the values of the current day of the given guild's market.
+
+            Parameters
+            ----------
+            guild: :class:`discord.Guild, int, str`
+                a discord guild, or its id.
+            ticker: :class:`str, optional`
+                the ticker of the market.
+
+            Returns
+            -------
+            yash_coin_values: :class:`numpy.ndarray`
+                the values of the market, with a length of ``1 + steps``.
+        """
+
+        return self.values[:, self.get_column(guild, ticker)]
+
+    def get_history(self, guild, days=None, index=None, ticker=DEFAULT_TICKER):
+        """
+            Return the values of the given guild's market over the last ``days`` days,
+            from the archive and the values of the current day. Each archived day
+            contributes its ``steps`` ticks, since its last value is the first value of
+            the following day.
+
+            Parameters
+            ----------
+            guild: :class:`discord.Guild, int, str`
+                a discord guild, or its id.
+            days: :class:`int, optional`
+                the number of days, including the current one, or ``None`` for every
+                archived day.
+            index: :class:`int, optional`
+                the index of the last value of the current day, or ``None`` for every
+                value.
+            ticker: :class:`str, optional`
+                the ticker of the market.
+
+            Returns
+            -------
+            yash_coin_values: :class:`numpy.ndarray`
+                the values of the market, from oldest to newest.
+        """
+
+        today = self.get_values(guild, ticker)
+        if index is not None:
+            today = today[:index + 1]
+        if self.archive is None or days == 1:
+            return today
+
+        key = self.get_key(guild, ticker)
+        current = date.fromisoformat(self.state["day"])
+        first_day = None if days is None else current - timedelta(days=days - 1)
+        archived, ticks = self.archive.get_range(key, first_day,
+                                                 current - timedelta(days=1))
+
+        # Finished days that are still being archived follow the archived ones
+        last = date.fromordinal(int(archived[-1])) if len(archived) else date.min
+        pending = [values[:self.steps, columns[key]]
+                   for day, columns, values in self.finished
+                   if key in columns and last < day < current
+                   and (first_day is None or day >= first_day)]
+        return np.concatenate((ticks[:, :self.steps].ravel(), *pending, today))
+
+    def get_seed(self, day):
+        """
+            Return the seed of the given day, derived from the root seed of the
+            markets (which is picked the first time).
+
+            Parameters
+            ----------
+            day: :class:`datetime.date`
+                the day.
+
+            Returns
+            -------
+            seed: :class:`int`
+                the seed of the day.
+        """
+
+        root = self.state.setdefault("root", int(np.random.SeedSequence().entropy))
+        return int(np.random.SeedSequence([root, day.toordinal()]).generate_state(1)[0])
+
+    def tick(self, index):
+        """
+            Advance every market to the given tick of the current day at once, and
+            return their prices.
+
+            Parameters
+            ----------
+            index: :class:`int`
+                the index of the tick.
+
+            Returns
+            -------
+            prices: :class:`numpy.ndarray`
+                the price of every market, indexed by column.
+        """
+
+        self.prices = self.values[index]
+        return self.prices
+
+    ### Days ###
+    def roll_over(self, today):
+        """
+            Start a new day for every market, unless it has already started. The
+            shared market uses its pregenerated values, while the values of every
+            other market are generated at once, each starting at its last value. Any
+            day skipped since the stored one is generated (and archived) first; the
+            shared market is left out of those days when its schedule does not
+            cover them, since its new values then start from its last stored ones.
+
+            Parameters
+            ----------
+            today: :class:`datetime.date`
+                the current day.
+
+            Returns
+            -------
+            rolled_over: :class:`bool`
+                a value indicating whether a new day started.
+        """
+
+        # Days never go backwards, even if the clock does
+        day = str(today)
+        if (self.state["day"] is not None and self.state["day"] >= day
+                and self.market_data.get("prev_check") == self.state["day"]):
+            return False
+
+        # Starting a new day replaces the values, so the finished ones are kept
+        # as they are until they are archived
+        previous = self.state["day"]
+        if previous is not None:
+            previous = date.fromisoformat(previous)
+            self._finish(previous, self.columns)
+
+        # The pregenerated values of the skipped days are dropped by the roll over
+        scheduled = self._get_scheduled(previous, today)
+        roll_over(self.market_data, today)
+        if previous is not None:
+            self._update_starts()
+            skipped = previous + timedelta(days=1)
+            while skipped < today:
+                shared = scheduled.get(skipped, [])
+                self.state["day"] = str(skipped)
+                self.state["seed"] = self.get_seed(skipped)
+                self.state["rolled"] = len(self.keys)
+                self._load_day(shared)
+                self._finish(skipped, {key: column for key, column in self.columns.items()
+                                       if column != 0 or len(shared)})
+                self._update_starts()
+                skipped += timedelta(days=1)
+
+        self.state["day"] = day
+        self.state["seed"] = self.get_seed(today)
+        self.state["rolled"] = len(self.keys)
+        self._load_day()
+
+        if self.on_list is not None and self.keys:
+            self.on_list(self.keys)
+        if self.on_change is not None:
+            self.on_change()
+
+        return True
+
+    async def archive_days(self):
+        """
+            Add the values of every finished day to the archive, inside another
+            thread, from oldest to newest. Calls made while days are being archived
+            have no effect, since the days they would archive are archived as well.
+        """
+
+        if self._archiving:
+            return
+
+        loop = asyncio.get_event_loop()
+        self._archiving = True
+        try:
+            while self.finished:
+                await loop.run_in_executor(None, self.archive.append_columns,
+                                           *self.finished[0])
+                self.finished.pop(0)
+        finally:
+            self._archiving = False
+
+    def close(self):
+        """
+            Synchronously add the values of every finished day that is not archived
+            yet to the archive. This is meant to be called once the event loop has
+            stopped.
+        """
+
+        while self.finished:
+            self.archive.append_columns(*self.finished.pop(0))
+
+    def _finish(self, day, columns):
+        if self.archive is not None:
+            self.finished.append((day, dict(columns), self.values))
+
+    def _update_starts(self):
+        for key, start in zip(self.keys, self.values[-1, 1:].tolist()):
+            self.listings[key][1] = start
+
+    def _get_scheduled(self, previous, today):
+        # Pregenerated values of the shared market on each day between the given
+        # ones, which are only used if the schedule also covers the new day
+        schedule = self.market_data.get("schedule") or {}
+        upcoming = schedule.get("values", [])
+        if previous is None or not upcoming:
+            return {}
+
+        first_day = date.fromisoformat(schedule["first_day"])
+        if not 0 <= (today - first_day).days < len(upcoming):
+            return {}
+
+        return {first_day + timedelta(days=offset): values
+                for offset, values in enumerate(upcoming)
+                if previous < first_day + timedelta(days=offset) < today}
+
+    def _load_day(self, shared=None):
+        # Markets listed after the day started are generated on their own, so that
+        # listing a market never changes the values of the others
+        state = self.state
+        rolled = state["rolled"]
+        if shared is None:
+            shared = self.market_data.get("values", [])
+        shared = np.asarray(shared, dtype=np.int64)
+
+        starts = [self.listings[key][1] for key in self.keys[:rolled]]
+        count = 1 + len(self.keys)
+        self._buffer = np.empty((self.steps + 1, 2 * count), dtype=np.int64)
+        self.values = self._buffer[:, :count]
+        self.values[:, 0] = shared[:self.steps + 1] if len(shared) else 0
+        self.values[:, 1:rolled + 1] = generate_markets(starts, state["seed"],
+                                                        steps=self.steps)
+        for column in range(rolled + 1, count):
+            self.values[:, column:column + 1] = self._generate_late(column)
+
+        self.prices = None
+
+    def _generate_late(self, column):
+        return generate_markets([self.listings[self.keys[column - 1]][1]],
+                                [self.state["seed"], column], steps=self.steps)
+
+    def _list(self, key, start=1000):
+        column = len(self.keys) + 1
+        self.listings[key] = [column, start, self.state["day"]]
+        self.keys.append(key)
+        self.columns[key] = column
+
+        if column == self._buffer.shape[1]:
+            buffer = np.empty((self.steps + 1, 2 * column), dtype=np.int64)
+            buffer[:, :column] = self.values
+            self._buffer = buffer
+        self._buffer[:, column:column + 1] = self._generate_late(column)
+        self.values = self._buffer[:, :column + 1]
+        self.prices = None
+
+        if self.on_list is not None:
+            self.on_list([key])
+
+        return column
@@ -0,0 +1,321 @@
+from collections                import OrderedDict
+
+import numpy as np
+
+import settings
+from storage.records            import MemberRecord
+
+
+class Leaderboard:
+    """
+        Ranking of the members of a guild by net worth (NortBucks plus YashCoins at
+        their current price). NortBucks and YashCoins are kept in separate columns,
+        one slot per member, next to the slots sorted by decreasing worth at the
+        latest price.
+
+        A balance change only moves its member inside the ranking, and many pending
+        changes are applied by re-ranking everyone at once, which is then cheaper. A
+        new price can reorder members holding different amounts of YashCoins, so it
+        drops the sorted slots instead of sorting every member again: until the next
+        full re-rank, pages are selected with a partial sort of the worths (keeping
+        every member tied with the last one of the page, so pages never overlap),
+        and ranks are counted from them.
+
+        Slots are allocated ahead of time, and their number doubles whenever they run
+        out, so adding members one at a time only copies the columns a logarithmic
+        number of times. Unused slots are never active.
+    """
+
+    def __init__(self, member_ids=(), nort_bucks=(), yash_coins=(), price=0,
+                 max_moves=64):
+        self.member_ids = list(member_ids)
+        self.slots = {member_id: slot for slot, member_id in enumerate(self.member_ids)}
+        self.nort_bucks = np.array(nort_bucks, dtype=np.int64)
+        self.yash_coins = np.array(yash_coins, dtype=np.int64)
+        self.active = np.ones(len(self.member_ids), dtype=bool)
+        self.max_moves = max_moves
+
+        self.price = price
+        # Worth each slot is ranked with, and ranked slots along with their negated
+        # worths (which are sorted in increasing order, for binary searches), or
+        # ``None`` once the price changed
+        self.ranked_worths = np.zeros(len(self.member_ids), dtype=np.int64)
+        self.order = np.empty(0, dtype=np.intp)
+        self.keys = np.empty(0, dtype=np.int64)
+        self.stale = set()
+        self.rerank()
+
+    def __len__(self):
+        self.refresh()
+        if self.order is None:
+            return int(np.count_nonzero(self.active))
+
+        return len(self.order)
+
+    def update(self, member_id, nort_bucks, yash_coins):
+        """
+            Set the balance of the given member, adding it to the ranking if needed.
+
+            Parameters
+            ----------
+            member_id: :class:`str`
+                the id of the member.
+            nort_bucks: :class:`int`
+                the member's NortBucks.
+            yash_coins: :class:`int`
+                the member's YashCoins.
+        """
+
+        slot = self.slots.get(member_id)
+        if slot is None:
+            slot = self.slots[member_id] = len(self.member_ids)
+            self.member_ids.append(member_id)
+            if slot == len(self.active):
+                self._grow()
+
+        self.nort_bucks[slot] = nort_bucks
+        self.yash_coins[slot] = yash_coins
+        self.stale.add(slot)
+
+    def remove(self, member_id):
+        """
+            Remove the given member from the ranking.
+
+            Parameters
+            ----------
+            member_id: :class:`str`
+                the id of the member.
+        """
+
+        slot = self.slots.pop(member_id, None)
+        if slot is not None:
+            self.stale.add(slot)
+
+    def reprice(self, price):
+        """
+            Value every member at the given YashCoin price, if it changed, which
+            drops the sorted slots.
+
+            Parameters
+            ----------
+            price: :class:`int`
+                the current YashCoin price.
+        """
+
+        if price != self.price:
+            self.price = price
+            self.order = self.keys = None
+            self.ranked_worths = self.nort_bucks + self.yash_coins * price
+
+    def rerank(self):
+        """
+            Rank every member again, from their current balances.
+        """
+
+        for slot in self.stale:
+            self.active[slot] = self._is_current(slot)
+        self.stale.clear()
+
+        worths = self.nort_bucks + self.yash_coins * self.price
+        slots = np.flatnonzero(self.active)
+        self.order = slots[np.argsort(-worths[slots], kind="stable")]
+        self.keys = -worths[self.order]
+        self.ranked_worths = worths
+
+    def refresh(self):
+        """
+            Apply the pending balance changes to the ranking.
+        """
+
+        if self.order is None:
+            for slot in self.stale:
+                self.active[slot] = self._is_current(slot)
+                self.ranked_worths[slot] = (self.nort_bucks[slot]
+                                            + self.yash_coins[slot] * self.price)
+            self.stale.clear()
+            return
+
+        if len(self.stale) > self.max_moves:
+            self.rerank()
+            return
+
+        for slot in self.stale:
+            if self.active[slot]:
+                # Drop the slot from its previous position, among the slots of the
+                # same worth
+                key = -self.ranked_worths[slot]
+                start = np.searchsorted(self.keys, key, side="left")
+                end = np.searchsorted(self.keys, key, side="right")
+                position = start + int(np.flatnonzero(self.order[start:end] == slot)[0])
+                self.order = np.delete(self.order, position)
+                self.keys = np.delete(self.keys, position)
+
+            self.active[slot] = self._is_current(slot)
+            if self.active[slot]:
+                worth = self.nort_bucks[slot] + self.yash_coins[slot] * self.price
+                position = np.searchsorted(self.keys, -worth, side="left")
+                self.order = np.insert(self.order, position, slot)
+                self.keys = np.insert(self.keys, position, -worth)
+                self.ranked_worths[slot] = worth
+
+        self.stale.clear()
+
+    def top(self, count, offset=0):
+        """
+            Return the members ranked from ``offset + 1`` to ``offset + count``.
+
+            Parameters
+            ----------
+            count: :class:`int`
+                the number of members.
+            offset: :class:`int, optional`
+                the number of higher ranked members to skip.
+
+            Returns
+            -------
+            members: :class:`list[tuple(int, str, int, int, int)]`
+                the rank, id, NortBucks, YashCoins and worth of each member. Members
+                with the same worth share the same rank.
+        """
+
+        self.refresh()
+        order, keys = ((self.order, self.keys) if self.order is not None
+                       else self._select(offset + count))
+        slots = order[offset:offset + count]
+        ranks = np.searchsorted(keys, keys[offset:offset + count]) + 1
+        return [(int(rank), self.member_ids[slot], int(self.nort_bucks[slot]),
+                 int(self.yash_coins[slot]), int(self.ranked_worths[slot]))
+                for rank, slot in zip(ranks, slots)]
+
+    def rank(self, member_id):
+        """
+            Return the rank of the given member.
+
+            Parameters
+            ----------
+            member_id: :class:`str`
+                the id of the member.
+
+            Returns
+            -------
+            rank: :class:`tuple(int, int), None`
+                the member's rank and worth, or ``None`` if the member is not ranked.
+        """
+
+        self.refresh()
+        slot = self.slots.get(member_id)
+        if slot is None or not self.active[slot]:
+            return None
+
+        worth = int(self.ranked_worths[slot])
+        if self.order is None:
+            higher = np.count_nonzero(self.active & (self.ranked_worths > worth))
+            return (int(higher) + 1, worth)
+
+        return (int(np.searchsorted(self.keys, -worth)) + 1, worth)
+
+    def _select(self, count):
+        # Highest ranked slots along with their negated worths, like the sorted
+        # slots, including every slot tied with the last one (so that the rank of
+        # each of them can be found among them)
+        slots = np.flatnonzero(self.active)
+        keys = -self.ranked_worths[slots]
+        if 0 < count < len(slots):
+            kept = keys <= np.partition(keys, count - 1)[count - 1]
+            slots, keys = slots[kept], keys[kept]
+
+        order = np.argsort(keys, kind="stable")
+        return (slots[order], keys[order])
+
+    def _grow(self):
+        capacity = max(16, 2 * len(self.active))
+        for name in ("nort_bucks", "yash_coins", "active", "ranked_worths"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def _is_current(self, slot):
+        # Removed members keep their slot, which is no longer used even if they are
+        # added again
+        return self.slots.get(self.member_ids[slot]) == slot
+
+
+class Leaderboards:
+    """
+        The leaderboards of the guilds that were recently asked for, kept up to date
+        as balances change (through the data store's change listeners). Prices only
+        re-rank a leaderboard once it is asked for, so a tick costs nothing however
+        many leaderboards are kept. Members moved to the cold storage are ranked
+        with their archived balance. Only the ``size`` most recently used
+        leaderboards are kept; the others are built again from the stored members
+        (archived ones included) when needed.
+    """
+
+    def __init__(self, store, ticker, size=settings.LEADERBOARD_CACHE_SIZE):
+        self.store = store
+        self.ticker = ticker
+        self.size = size
+        self.boards = OrderedDict()
+
+        store.add_listener(self.on_change)
+
+    async def get(self, guild):
+        """
+            Return the leaderboard of the given guild, ranked at the current price.
+
+            Parameters
+            ----------
+            guild: :class:`discord.Guild, int, str`
+                a discord guild, or its id.
+
+            Returns
+            -------
+            leaderboard: :class:`Leaderboard`
+                the guild's leaderboard.
+        """
+
+        guild_id = str(getattr(guild, "id", guild))
+        board = self.boards.get(guild_id)
+        if board is None:
+            guild_data = await self.store.get_guild(guild_id) or {}
+            archived = await self.store.get_archived(guild_id)
+            # The board may have been built by another lookup while loading
+            if guild_id in self.boards:
+                return await self.get(guild_id)
+
+            members = dict(guild_data.get("yc_members", {}))
+            members.update((member_id, MemberRecord.from_dict(member_data))
+                           for member_id, member_data in archived.items()
+                           if member_id not in members)
+            board = self.boards[guild_id] = Leaderboard(
+                members.keys(),
+                [record.nort_bucks for record in members.values()],
+                [record.yash_coins for record in members.values()],
+                self.ticker.get_price(guild_id)
+            )
+            while len(self.boards) > self.size:
+                self.boards.popitem(last=False)
+        else:
+            self.boards.move_to_end(guild_id)
+            board.reprice(self.ticker.get_price(guild_id))
+
+        return board
+
+    def on_change(self, guild_id, guild_data, member_ids):
+        board = self.boards.get(guild_id)
+        if board is None:
+            return
+
+        if member_ids is None or guild_data is None:
+            # The whole guild changed, so its leaderboard is built again when needed
+            del self.boards[guild_id]
+            return
+
+        # Members missing from their guild were moved to the cold storage, and keep
+        # their archived balance
+        member_list_data = guild_data.get("yc_members", {})
+        for member_id in member_ids:
+            record = member_list_data.get(member_id)
+            if record is not None:
+                board.update(member_id, record.nort_bucks, record.yash_coins)
@@ -0,0 +1,267 @@
+from bisect                     import bisect_left, bisect_right, insort
+
+
+class Order:
+    """
+        A resting limit order of a guild member on a market. The funds needed to fill
+        the order (NortBucks for a buy order, YashCoins for a sell order) are taken
+        from the member when it is placed, and given back if it is cancelled.
+    """
+
+    __slots__ = ("order_id", "market", "guild_id", "member_id", "side", "price",
+                 "amount")
+
+    BUY = "buy"
+    SELL = "sell"
+
+    def __init__(self, order_id, market, guild_id, member_id, side, price, amount):
+        self.order_id = order_id
+        self.market = market
+        self.guild_id = guild_id
+        self.member_id = member_id
+        self.side = side
+        self.price = price
+        self.amount = amount
+
+    def to_list(self):
+        return [getattr(self, field) for field in self.__slots__]
+
+    @property
+    def reserved(self):
+        """
+            The amount of NortBucks (for a buy order) or YashCoins (for a sell order)
+            held by the order.
+        """
+
+        return self.price * self.amount if self.side == self.BUY else self.amount
+
+
+class OrderBook:
+    """
+        The resting orders of a single market. Buy orders are kept sorted from the
+        highest to the lowest price, and sell orders from the lowest to the highest
+        price (then by age), so that the orders filled by a price are always a prefix
+        of their list.
+    """
+
+    def __init__(self):
+        self.bids = []
+        self.asks = []
+
+    def __len__(self):
+        return len(self.bids) + len(self.asks)
+
+    def add(self, order):
+        if order.side == Order.BUY:
+            insort(self.bids, (-order.price, order.order_id))
+        else:
+            insort(self.asks, (order.price, order.order_id))
+
+    def remove(self, order):
+        entries, key = ((self.bids, (-order.price, order.order_id))
+                        if order.side == Order.BUY
+                        else (self.asks, (order.price, order.order_id)))
+        idx = bisect_left(entries, key)
+        if idx < len(entries) and entries[idx] == key:
+            del entries[idx]
+
+    def match(self, price):
+        """
+            Remove and return the ids of every order filled at the given price: buy
+            orders at or above it, and sell orders at or below it.
+
+            Parameters
+            ----------
+            price: :class:`int`
+                the current price of the market.
+
+            Returns
+            -------
+            order_ids: :class:`list[int]`
+                the ids of the filled orders.
+        """
+
+        buy_count = bisect_right(self.bids, (-price, float("inf")))
+        sell_count = bisect_right(self.asks, (price, float("inf")))
+
+        order_ids = [order_id for _, order_id in self.bids[:buy_count]]
+        order_ids.extend(order_id for _, order_id in self.asks[:sell_count])
+        del self.bids[:buy_count]
+        del self.asks[:sell_count]
+        return order_ids
+
+
+class OrderBooks:
+    """
+        The order books of every market. Open orders are stored inside the given
+        order data (see :attr:`storage.store.DataStore.orders`), keyed by id, and
+        indexed in memory by market and by member. ``on_change`` is called with the
+        ids of the orders placed or removed, so that only these orders are written.
+        Filled orders leave the books right away, but stay stored until they are
+        settled, once their members were credited.
+    """
+
+    def __init__(self, order_data, on_change=None):
+        self.on_change = on_change
+        self.state = order_data
+
+        self.orders = {}
+        self.books = {}
+        self.by_member = {}
+        for fields in self.state["open"].values():
+            self._add(Order(*fields))
+
+    def __len__(self):
+        return len(self.orders)
+
+    def place(self, market, guild_id, member_id, side, price, amount):
+        """
+            Place a new order. The funds it needs must already have been taken from
+            the member.
+
+            Parameters
+            ----------
+            market: :class:`str`
+                the key of the market (see :meth:`market.engine.MarketEngine.get_key`).
+            guild_id: :class:`str`
+                the id of the member's guild.
+            member_id: :class:`str`
+                the id of the member.
+            side: :class:`str`
+                either ``Order.BUY`` or ``Order.SELL``.
+            price: :class:`int`
+                the limit price of a single YashCoin.
+            amount: :class:`int`
+                the number of YashCoins to buy or sell.
+
+            Returns
+            -------
+            order: :class:`Order`
+                the placed order.
+        """
+
+        order = Order(self.state["next_id"], market, str(guild_id), str(member_id), side,
+                      price, amount)
+        self.state["next_id"] += 1
+        self._add(order)
+        self._changed([order.order_id])
+        return order
+
+    def cancel(self, order_id):
+        """
+            Remove the given order from its book, and return it. Giving back the funds
+            it held is left to the caller.
+
+            Parameters
+            ----------
+            order_id: :class:`int`
+                the id of the order.
+
+            Returns
+            -------
+            order: :class:`Order, None`
+                the cancelled order, or ``None`` if there is no such open order.
+        """
+
+        order = self.orders.get(order_id)
+        if order is None:
+            return None
+
+        self.books[order.market].remove(order)
+        self._discard(order)
+        self._changed([order_id])
+        return order
+
+    def get_member_orders(self, guild_id, member_id):
+        """
+            Return the open orders of the given guild member, from oldest to newest.
+
+            Parameters
+            ----------
+            guild_id: :class:`str`
+                the id of the member's guild.
+            member_id: :class:`str`
+                the id of the member.
+
+            Returns
+            -------
+            orders: :class:`list[Order]`
+                the member's open orders.
+        """
+
+        order_ids = self.by_member.get((str(guild_id), str(member_id)), ())
+        return [self.orders[order_id] for order_id in sorted(order_ids)]
+
+    def match(self, prices, columns):
+        """
+            Fill every order crossed by the current prices, in a single batch. Only
+            the books holding orders are visited. The filled orders are taken out of
+            the books, so they can neither be filled again nor cancelled, but they
+            stay stored as open until they are settled (see ``settle``).
+
+            Parameters
+            ----------
+            prices: :class:`numpy.ndarray`
+                the current price of every market, indexed by column.
+            columns: :class:`dict`
+                the column of every market, by key.
+
+            Returns
+            -------
+            fills: :class:`list[tuple(Order, int)]`
+                the filled orders, along with the price they were filled at.
+        """
+
+        fills = []
+        prices = prices.tolist()
+        for market, book in self.books.items():
+            # Markets listed after the prices were taken wait for the next tick
+            column = columns.get(market)
+            if not book or column is None or column >= len(prices):
+                continue
+
+            price = prices[column]
+            for order_id in book.match(price):
+                fills.append((self._unindex(self.orders[order_id]), price))
+
+        return fills
+
+    def settle(self, orders):
+        """
+            Remove the given filled orders (see ``match``) from the stored open
+            orders, once the funds they held were credited to their members.
+
+            Parameters
+            ----------
+            orders: :class:`list[Order]`
+                the filled orders.
+        """
+
+        for order in orders:
+            del self.state["open"][str(order.order_id)]
+        self._changed([order.order_id for order in orders])
+
+    def _add(self, order):
+        self.state["open"][str(order.order_id)] = order.to_list()
+        self.orders[order.order_id] = order
+        self.books.setdefault(order.market, OrderBook()).add(order)
+        self.by_member.setdefault((order.guild_id, order.member_id), set()).add(
+            order.order_id
+        )
+
+    def _discard(self, order):
+        del self.state["open"][str(order.order_id)]
+        return self._unindex(order)
+
+    def _unindex(self, order):
+        del self.orders[order.order_id]
+        member_orders = self.by_member[(order.guild_id, order.member_id)]
+        member_orders.discard(order.order_id)
+        if not member_orders:
+            del self.by_member[(order.guild_id, order.member_id)]
+
+        return order
+
+    def _changed(self, order_ids):
+        if self.on_change is not None:
+            self.on_change(order_ids)
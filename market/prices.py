@@ -0,0 +1,279 @@
+import argparse
+from datetime                   import date, timedelta
+
+import numpy as np
+
+import settings
+from storage.store              import create_backend
+
+
+def generate_days(start, days, seed, steps=96, mu=0, sigma=0.2, lower=500, upper=1500):
+    """
+        Return YashCoin values for several consecutive days, which somewhat imitate
+        stock prices over time by using Geometric Brownian Motion. Each day starts at
+        the last value of the previous day, and its drift is set to ``sigma`` if it
+        starts below ``lower``, or to ``-sigma`` if it starts above ``upper``, to
+        slightly prevent the value of YashCoin from drifting away. The same arguments
+        always give the same values.
+
+        Parameters
+        ----------
+        start: :class:`int`
+            the value the first day starts with.
+        days: :class:`int`
+            the number of days to generate.
+        seed: :class:`int`
+            the seed of the random number generator.
+        steps: :class:`int, optional`
+            the number of times the value of YashCoin fluctuates per day.
+        mu: :class:`float, optional`
+            the amount of drift from the starting value, or the rate of growth.
+        sigma: :class:`float, optional`
+            the amount of variation across the values.
+        lower: :class:`int, optional`
+            the minimum starting value of a day before its drift is set to ``sigma``.
+        upper: :class:`int, optional`
+            the maximum starting value of a day before its drift is set to ``-sigma``.
+
+        Returns
+        -------
+        yash_coin_values: :class:`numpy.ndarray`
+            the values of each day, with a shape of ``(days, 1 + steps)``.
+
+        Raises
+        ------
+        ValueError:
+            ``start`` is not a positive value.\n
+            ``days`` or ``steps`` is a negative value.\n
+            ``sigma`` is a negative value.\n
+            ``lower`` is greater than or equal to ``upper``.\n
+            ``lower`` or ``upper`` are not positive values.
+    """
+
+    if start <= 0:
+        raise ValueError("'start' must be a positive value")
+    if days < 0 or steps < 0:
+        raise ValueError("'days' and 'steps' must be non-negative values")
+    if sigma < 0:
+        raise ValueError("'sigma' must be a non-negative value")
+    if lower >= upper:
+        raise ValueError("'lower' must be smaller than 'upper'")
+    if upper <= 0:
+        raise ValueError("'lower' and 'upper' must both be positive values")
+
+    rng = np.random.default_rng(seed)
+    dy = 1 / steps if steps else 0
+    times = np.arange(1, steps + 1) * dy
+
+    # Growth of every step without its drift, along with the growth caused by each of
+    # the possible drifts, so that a day is the product of both
+    walks = np.cumsum(sigma * np.sqrt(dy) * rng.standard_normal((days, steps)), axis=1)
+    growths = np.exp(walks - (sigma * sigma / 2) * times)
+    drift_growths = np.exp(np.outer([mu, sigma, -sigma], times))
+
+    # Only the drift of each day depends on the previous day, so the days are chained
+    # using their last growth alone
+    starts = np.empty(days, dtype=np.int64)
+    drifts = np.empty(days, dtype=np.intp)
+    for day in range(days):
+        drift = 1 if start < lower else 2 if start > upper else 0
+        starts[day] = start
+        drifts[day] = drift
+        if steps:
+            start = int(start * growths[day, -1] * drift_growths[drift, -1])
+
+    values = np.empty((days, steps + 1), dtype=np.int64)
+    values[:, 0] = starts
+    values[:, 1:] = starts[:, None] * growths * drift_growths[drifts]
+    return values
+
+
+def generate_markets(starts, seed, steps=96, mu=0, sigma=0.2, lower=500, upper=1500):
+    """
+        Return the YashCoin values of a single day for several independent markets
+        at once, using the same model as ``generate_days``. Values are returned
+        column-wise: each row holds the values of every market at a given step. The
+        same arguments always give the same values.
+
+        Parameters
+        ----------
+        starts: :class:`Sequence[int]`
+            the value each market starts the day with.
+        seed: :class:`int, list[int]`
+            the seed of the random number generator.
+        steps: :class:`int, optional`
+            the number of times the value of YashCoin fluctuates per day.
+        mu: :class:`float, optional`
+            the amount of drift from the starting value, or the rate of growth.
+        sigma: :class:`float, optional`
+            the amount of variation across the values.
+        lower: :class:`int, optional`
+            the minimum starting value of a market before its drift is set to
+            ``sigma``.
+        upper: :class:`int, optional`
+            the maximum starting value of a market before its drift is set to
+            ``-sigma``.
+
+        Returns
+        -------
+        yash_coin_values: :class:`numpy.ndarray`
+            the values of each market, with a shape of ``(1 + steps, len(starts))``.
+    """
+
+    starts = np.asarray(starts, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    dy = 1 / steps if steps else 0
+    times = (np.arange(1, steps + 1) * dy)[:, None]
+
+    walks = np.cumsum(sigma * np.sqrt(dy) * rng.standard_normal((steps, len(starts))),
+                      axis=0)
+    drifts = np.where(starts < lower, sigma, np.where(starts > upper, -sigma, mu))
+
+    values = np.empty((steps + 1, len(starts)), dtype=np.int64)
+    values[0] = starts
+    values[1:] = starts * np.exp(walks + (drifts - sigma * sigma / 2) * times)
+    return values
+
+
+def create_batch(first_day, start, days, seed=None, **params):
+    """
+        Return a newly generated batch of days along with the parameters that were
+        used to generate it, which are enough to regenerate the same batch.
+
+        Parameters
+        ----------
+        first_day: :class:`datetime.date`
+            the first day of the batch.
+        start: :class:`int`
+            the value the first day starts with.
+        days: :class:`int`
+            the number of days to generate.
+        seed: :class:`int, optional`
+            the seed of the random number generator, picked randomly if not given.
+        **params:
+            the other arguments given to ``generate_days``.
+
+        Returns
+        -------
+        batch: :class:`tuple(dict, numpy.ndarray)`
+            the parameters of the batch, and the values of each day.
+    """
+
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy)
+
+    entry = {"first_day": str(first_day), "start": int(start), "days": days,
+             "seed": seed, **params}
+    return (entry, generate_days(start, days, seed, **params))
+
+
+def regenerate_day(market_data, day):
+    """
+        Return the values of the given day, regenerated from the stored seeds.
+
+        Parameters
+        ----------
+        market_data: :class:`dict`
+            the data on YashCoins.
+        day: :class:`datetime.date`
+            the day to regenerate.
+
+        Returns
+        -------
+        yash_coin_values: :class:`list[int]`
+            the values of the day.
+
+        Raises
+        ------
+        LookupError:
+            no stored seed covers the given day.
+    """
+
+    for entry in reversed(market_data.get("seeds", [])):
+        offset = (day - date.fromisoformat(entry["first_day"])).days
+        if 0 <= offset < entry["days"]:
+            params = {k: v for k, v in entry.items() if k != "first_day"}
+            return generate_days(**params)[offset].tolist()
+
+    raise LookupError(f"No stored seed covers '{day}'")
+
+
+def roll_over(market_data, today, days=settings.MARKET_PREGENERATE_DAYS,
+              refill=settings.MARKET_REFILL_DAYS, default_start=1000):
+    """
+        Make the pregenerated values of ``today`` the current YashCoin values, unless
+        they already are. Days are pregenerated ``days`` at a time, whenever fewer
+        than ``refill`` upcoming days remain, and the parameters of every batch are
+        added to the stored seeds.
+
+        Parameters
+        ----------
+        market_data: :class:`dict`
+            the data on YashCoins, which is modified in place.
+        today: :class:`datetime.date`
+            the current day.
+        days: :class:`int, optional`
+            the number of days generated at a time.
+        refill: :class:`int, optional`
+            the number of upcoming days under which more days are generated.
+        default_start: :class:`int, optional`
+            the starting value used when there are no previous values.
+
+        Returns
+        -------
+        rolled_over: :class:`bool`
+            a value indicating whether the current values changed.
+    """
+
+    if market_data.get("prev_check") == str(today):
+        return False
+
+    schedule = market_data.get("schedule") or {}
+    upcoming = schedule.get("values", [])
+    offset = -1
+    if upcoming:
+        offset = (today - date.fromisoformat(schedule["first_day"])).days
+
+    seeds = market_data.setdefault("seeds", [])
+    if not 0 <= offset < len(upcoming):
+        # The schedule ran out (e.g. the bot was offline for a while), so a new one
+        # starts from the latest known value
+        values = market_data.get("values") or [default_start]
+        entry, generated = create_batch(today, values[-1], days)
+        seeds.append(entry)
+        upcoming, offset = generated.tolist(), 0
+
+    values = upcoming[offset]
+    upcoming = upcoming[offset + 1:]
+    if len(upcoming) < refill:
+        last = upcoming[-1] if upcoming else values
+        entry, generated = create_batch(today + timedelta(days=len(upcoming) + 1),
+                                        last[-1], days)
+        seeds.append(entry)
+        upcoming.extend(generated.tolist())
+
+    market_data["prev_check"] = str(today)
+    market_data["values"] = values
+    market_data["schedule"] = {"first_day": str(today + timedelta(days=1)),
+                               "values": upcoming}
+    return True
+
+
+
+### Command Line ###
+def main():
+    parser = argparse.ArgumentParser(
+        description="Regenerate the YashCoin values of a day from the stored seeds."
+    )
+    parser.add_argument("day", type=date.fromisoformat, help="the day (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    backend = create_backend(read_only=True)
+    try:
+        print(regenerate_day(backend.load_market(), args.day))
+    finally:
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import asyncio
+from datetime                   import datetime, time
+from typing                     import NamedTuple
+
+import numpy as np
+
+
+class PriceSnapshot(NamedTuple):
+    """
+        The prices of every market at a given tick. Snapshots are never modified
+        (their prices are read-only), so every command reading the same snapshot
+        values YashCoins the same way.
+    """
+
+    day: str
+    index: int
+    prices: np.ndarray
+    time: datetime
+
+    def get_price(self, column):
+        """
+            Return the price of the market stored in the given column, or ``None`` if
+            the market was listed after the snapshot was taken.
+
+            Parameters
+            ----------
+            column: :class:`int`
+                the column of the market (see
+                :meth:`market.engine.MarketEngine.get_column`).
+
+            Returns
+            -------
+            price: :class:`int, None`
+                the price of the market.
+        """
+
+        return int(self.prices[column]) if column < len(self.prices) else None
+
+
+def get_tick_index(now, steps):
+    """
+        Return the index of the tick that the given time falls into, when a day is
+        split into ``steps`` ticks of the same length.
+
+        Parameters
+        ----------
+        now: :class:`datetime.datetime`
+            the time.
+        steps: :class:`int`
+            the number of ticks per day.
+
+        Returns
+        -------
+        index: :class:`int`
+            the index of the tick, from ``0`` to ``steps - 1``.
+    """
+
+    seconds = now.hour * 3600 + now.minute * 60 + now.second
+    return seconds * steps // (24 * 3600)
+
+
+class Ticker:
+    """
+        Background service advancing every market on each tick boundary (every 15
+        minutes, for 96 steps per day) and starting new days at midnight. Each tick
+        publishes a new :class:`PriceSnapshot`, so reading the current price is a
+        single lookup, and then awaits the listeners added with ``add_listener``
+        (e.g. order matching).
+    """
+
+    JOB_ID = "market_tick"
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.listeners = []
+        self.snapshot = None
+        self.advance()
+
+    def add_listener(self, listener):
+        """
+            Add a coroutine function called with every new snapshot.
+
+            Parameters
+            ----------
+            listener: :class:`Callable[[PriceSnapshot], Awaitable]`
+                the coroutine function.
+        """
+
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def get_price(self, guild, ticker=None):
+        """
+            Return the current price of the market that the given guild trades the
+            given ticker on.
+
+            Parameters
+            ----------
+            guild: :class:`discord.Guild, int, str`
+                a discord guild, or its id.
+            ticker: :class:`str, optional`
+                the ticker of the market.
+
+            Returns
+            -------
+            price: :class:`int`
+                the current price.
+        """
+
+        ticker = ticker or self.engine.DEFAULT_TICKER
+        column = self.engine.get_column(guild, ticker)
+        price = self.snapshot.get_price(column)
+        if price is None:
+            # Listed since the latest tick, so its price has not been published yet
+            price = int(self.engine.values[self.snapshot.index, column])
+
+        return price
+
+    def advance(self, now=None):
+        """
+            Start a new day if needed, and publish the snapshot of the tick that the
+            given time falls into, unless it is already the current one.
+
+            Parameters
+            ----------
+            now: :class:`datetime.datetime, optional`
+                the current time.
+
+            Returns
+            -------
+            advanced: :class:`bool`
+                a value indicating whether a new snapshot was published.
+        """
+
+        now = now or datetime.now()
+        rolled_over = self.engine.roll_over(now.date())
+        day = self.engine.state["day"]
+        index = get_tick_index(now, self.engine.steps)
+        if (not rolled_over and self.snapshot is not None
+                and (self.snapshot.day, self.snapshot.index) == (day, index)):
+            return False
+
+        prices = self.engine.tick(index).copy()
+        prices.setflags(write=False)
+        self.snapshot = PriceSnapshot(day, index, prices, now)
+        return True
+
+    async def tick(self):
+        """
+            Advance to the current tick, and await every listener if a new snapshot
+            was published. A failing listener does not prevent the others from
+            running. Once done, any finished day is archived inside another thread.
+        """
+
+        if self.advance():
+            snapshot = self.snapshot
+            for listener in list(self.listeners):
+                try:
+                    await listener(snapshot)
+                except Exception as error:
+                    print(f"Failed to handle market tick: {error}", flush=True)
+
+        await self.engine.archive_days()
+
+    def start(self, scheduler):
+        """
+            Schedule a tick on every tick boundary, starting from midnight, and run
+            one right away to catch up with the current time.
+
+            Parameters
+            ----------
+            scheduler: :class:`apscheduler.schedulers.asyncio.AsyncIOScheduler`
+                the scheduler running the ticks.
+        """
+
+        midnight = datetime.combine(datetime.now().date(), time())
+        scheduler.add_job(self.tick, "interval", seconds=24 * 3600 // self.engine.steps,
+                          start_date=midnight, id=self.JOB_ID, replace_existing=True,
+                          coalesce=True, misfire_grace_time=60)
+        asyncio.get_event_loop().create_task(self.tick())
@@ -19,3 +19,127 @@ NOW_PLAYING = "FF14 with the Norters" # COMMAND_PREFIX + "commands"
 
 # Base directory. Feel free to use it if you want.
 BASE_DIR = os.path.dirname(os.path.realpath(__file__))
+
+# How often (in milliseconds) pending changes to the stored data are written to disk
+DATA_FLUSH_INTERVAL_MS = 5000
+
+# Number of pending changes that will trigger a write before DATA_FLUSH_INTERVAL_MS
+DATA_FLUSH_THRESHOLD = 50
+
+# Storage engine used for member and YashCoin data ("json" or "sqlite")
+STORAGE_BACKEND = "json"
+
+# Name of the database file (inside the assets directory) used by the "sqlite" engine
+SQLITE_DB_NAME = "nortbot.db"
+
+# Whether data changes are appended to a journal (and only periodically written as a
+# full snapshot by the storage engine), which makes every flush cheap and allows
+# recovering changes made right before a crash
+JOURNAL_ENABLED = True
+
+# Name of the journal file (inside the assets directory)
+JOURNAL_NAME = "journal.ndjson"
+
+# Size (in bytes) the journal may reach before it is folded into a new snapshot
+JOURNAL_COMPACT_SIZE = 1024 * 1024
+
+# Format used by the "json" engine to write data files ("json", "compact" or
+# "pickle"). Files are always read back whatever format they were written with
+# (including "marshal", written by older versions), and can be converted with
+# `python -m storage.codecs <format> <paths>`
+DATA_CODEC = "json"
+
+# Number of locks shared by member transactions; members are spread across them
+LOCK_STRIPES = 64
+
+# Maximum number of guilds, and of members across those guilds, kept in memory.
+# The least recently used guilds are written back and unloaded past these limits
+GUILD_CACHE_SIZE = 1000
+GUILD_CACHE_MEMBERS = 200000
+
+# Whether members that have not claimed their daily NortBucks for
+# COLD_STORAGE_AFTER_DAYS days are moved to a compressed cold storage, out of the
+# data loaded and written on every command. They are restored on their next command
+COLD_STORAGE_ENABLED = True
+
+# Name of the cold storage directory (inside the assets directory)
+COLD_STORAGE_NAME = "cold"
+
+# Number of days without claiming daily NortBucks after which a member is inactive
+COLD_STORAGE_AFTER_DAYS = 90
+
+# How often (in hours) inactive members are moved to the cold storage
+COLD_STORAGE_INTERVAL_HOURS = 24
+
+# Whether every change of a member's balance is recorded in an append-only ledger,
+# which the history command reads from
+LEDGER_ENABLED = True
+
+# Name of the ledger directory (inside the assets directory), number of days covered
+# by each of its segments before it is compressed, and number of entries per page of
+# the history command
+LEDGER_NAME = "ledger"
+LEDGER_SEGMENT_DAYS = 7
+LEDGER_PAGE_SIZE = 10
+
+# How long (in milliseconds) guild joins and leaves are buffered before being
+# persisted together
+GUILD_EVENT_BATCH_MS = 2000
+
+# Number of days of YashCoin values generated at a time, ahead of when they are used,
+# and number of upcoming days under which more days are generated
+MARKET_PREGENERATE_DAYS = 28
+MARKET_REFILL_DAYS = 7
+
+# Whether each guild trades YashCoins on its own market, instead of a market shared
+# by every guild
+MARKET_PER_GUILD = False
+
+# Maximum number of open limit orders a member may have at a time
+MAX_OPEN_ORDERS = 25
+
+# Maximum number of members paid by a single pay command
+MAX_PAY_RECIPIENTS = 1000
+
+# Name of the directory (inside the assets directory) archiving the YashCoin values of
+# every past day, and maximum number of values plotted by a stocks graph, however
+# long its period
+MARKET_ARCHIVE_NAME = "archive"
+MARKET_CHART_POINTS = 400
+
+# Name of the directory (inside the assets directory) caching rendered graphs, and
+# maximum size (in bytes) of the cached graphs before the least recently used ones
+# are deleted
+CHART_CACHE_NAME = "charts"
+CHART_CACHE_BYTES = 64 * 1024 * 1024
+
+# Delay (in seconds) before the index of the cached graphs is written after it
+# changes, so that a burst of renders only writes it once
+CHART_INDEX_DELAY = 5
+
+# Number of processes rendering graphs off the event loop (0 renders them inside a
+# thread of the bot's process instead)
+GRAPH_RENDER_WORKERS = 2
+
+# Renderer of the stocks graphs: "sparkline" draws them with NumPy alone, which is
+# much faster but draws no tick labels, while "matplotlib" draws full graphs. The
+# benchmark `python -m bench.sparkline` compares both
+GRAPH_RENDERER = "sparkline"
+
+# Maximum number of guild leaderboards kept up to date in memory, and number of
+# members listed per page of a leaderboard
+LEADERBOARD_CACHE_SIZE = 100
+LEADERBOARD_PAGE_SIZE = 10
+
+# Maximum number of guild economy summaries kept up to date in memory, relative error
+# of their net worth percentiles, and maximum age (in minutes) of their aggregates
+# before they are computed again from every member to correct any drift
+ECONOMY_CACHE_SIZE = 100
+ECONOMY_SKETCH_ACCURACY = 0.01
+ECONOMY_RECOMPUTE_MINUTES = 60
+
+# Number of rows of a bulk grant CSV applied (and written) at a time
+GRANT_CHUNK_SIZE = 5000
+
+# Number of archived days of a market written at a time when exporting prices
+EXPORT_CHUNK_DAYS = 1000
@@ -0,0 +1,110 @@
+import os
+
+import settings
+from graphs.pool                import GraphRenderer
+from market.archive             import create_archive
+from market.economy             import EconomySummaries
+from market.engine              import MarketEngine
+from market.leaderboard         import Leaderboards
+from market.orders              import OrderBooks
+from market.ticker              import Ticker
+from storage.chart_cache        import ChartCache
+from storage.store              import (DataStore, create_backend, create_cold_storage,
+                                        create_journal, create_ledger)
+from utils                      import get_json_data, get_json_path, get_rel_path
+
+
+class Catalog:
+    """
+        Static data file shipped with the bot (e.g. ``quests.json``), kept in memory
+        and only read again once the file has been modified.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+        self.data = {}
+
+    def refresh(self):
+        """
+            Read the file again if it was modified since it was last read.
+
+            Returns
+            -------
+            refreshed: :class:`bool`
+                a value indicating whether the file was read.
+        """
+
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self.mtime:
+            return False
+
+        self.data = get_json_data(self.path)
+        self.mtime = mtime
+        return True
+
+
+class BotState:
+    """
+        State shared by every cog, attached to the bot as ``bot.state``. Since it is
+        owned by the bot rather than by the cogs, it survives extension reloads: the
+        data store keeps its unsaved changes, markets keep their prices and open
+        orders, running expeditions keep running, and only the catalogs whose files
+        changed are read again.
+    """
+
+    def __init__(self, store=None):
+        if store is None:
+            store = DataStore(create_backend(), create_journal(), create_cold_storage(),
+                              create_ledger())
+
+        self.store = store
+        self.markets = MarketEngine(store.market, store.listings,
+                                    archive=create_archive(store.market),
+                                    on_change=store.mark_market_dirty,
+                                    on_list=store.mark_listings_dirty)
+        self.orders = OrderBooks(store.orders, on_change=store.mark_orders_dirty)
+        self.ticker = Ticker(self.markets)
+        self.charts = ChartCache(get_rel_path("assets", settings.CHART_CACHE_NAME),
+                                 settings.CHART_CACHE_BYTES)
+        self.renderer = GraphRenderer(settings.GRAPH_RENDER_WORKERS)
+        self.leaderboards = Leaderboards(store, self.ticker)
+        self.economies = EconomySummaries(store, self.ticker)
+        self.catalogs = {}
+        self.expeditions = {}
+
+    def get_catalog(self, name):
+        """
+            Return the data of the catalog stored in ``assets/json/<name>.json``,
+            reading the file again only if it changed since the last call.
+
+            Parameters
+            ----------
+            name: :class:`str`
+                the name of the catalog (e.g. ``"quests"``).
+
+            Returns
+            -------
+            catalog_data: :class:`dict`
+                the catalog's data.
+        """
+
+        catalog = self.catalogs.get(name)
+        if catalog is None:
+            catalog = self.catalogs[name] = Catalog(get_json_path(name))
+
+        catalog.refresh()
+        return catalog.data
+
+    def close(self):
+        """
+            Write any pending data changes, archive any finished market day, release
+            the data store, write the index of the cached charts and stop the graph
+            rendering workers. This is meant to be called once the event loop has
+            stopped.
+        """
+
+        self.markets.close()
+        self.store.close()
+        self.charts.close()
+        self.renderer.close()
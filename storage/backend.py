@@ -0,0 +1,240 @@
+from concurrent.futures         import ThreadPoolExecutor
+
+
+class Backend:
+    """
+        Base class of the storage engines used by :class:`storage.store.DataStore`.
+        Every access to the underlying storage happens on the backend's own single
+        worker thread (see ``executor``), so that reads always observe the writes
+        queued before them. ``write`` is submitted to that thread by the store, while
+        the loading methods dispatch themselves to it and wait for their result.
+        ``prepare_guild``, ``prepare_market``, ``prepare_orders`` and
+        ``prepare_listings`` are called on the event loop to take a snapshot of the
+        data to write, so they only copy it, and leave any encoding to ``write``.
+    """
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def run(self, func, *args):
+        """
+            Run ``func`` inside the backend's worker thread and return its result,
+            blocking the caller until then. This must not be called from the worker
+            thread itself.
+        """
+
+        return self.executor.submit(func, *args).result()
+
+    def guild_ids(self):
+        """
+            Return the ids of every stored guild that is not archived.
+
+            Returns
+            -------
+            guild_ids: :class:`list[str]`
+                the ids of the stored guilds.
+        """
+
+        raise NotImplementedError
+
+    def load_guild(self, guild_id):
+        """
+            Return the stored data of the given guild, or ``None`` if the guild is not
+            stored.
+
+            Parameters
+            ----------
+            guild_id: :class:`str`
+                the id of a discord guild.
+
+            Returns
+            -------
+            guild_data: :class:`dict, None`
+                a guild's data.
+        """
+
+        raise NotImplementedError
+
+    def restore_guild(self, guild_id):
+        """
+            Return the data of the given archived guild, or ``None`` if the guild was
+            never archived. The archived data stays archived until it is written again.
+
+            Parameters
+            ----------
+            guild_id: :class:`str`
+                the id of a discord guild.
+
+            Returns
+            -------
+            guild_data: :class:`dict, None`
+                a guild's archived data.
+        """
+
+        raise NotImplementedError
+
+    def pending_expeditions(self):
+        """
+            Return the guild and member ids of every stored member currently marked as
+            being on an expedition.
+
+            Returns
+            -------
+            expeditions: :class:`list[tuple(str, str)]`
+                pairs of guild ids and member ids.
+        """
+
+        raise NotImplementedError
+
+    def load_market(self):
+        """
+            Return the stored YashCoin data, or an empty dictionary if there is none.
+
+            Returns
+            -------
+            market_data: :class:`dict`
+                the data on YashCoins.
+        """
+
+        raise NotImplementedError
+
+    def load_orders(self):
+        """
+            Return the stored open limit orders, along with the id of the next order.
+
+            Returns
+            -------
+            order_data: :class:`dict`
+                the id of the next order (under ``"next_id"``), and the fields of each
+                open order, by order id (under ``"open"``).
+        """
+
+        raise NotImplementedError
+
+    def load_listings(self):
+        """
+            Return the stored markets listed by the market engine (see
+            :class:`market.engine.MarketEngine`).
+
+            Returns
+            -------
+            listing_data: :class:`dict`
+                the fields of each listed market, by key.
+        """
+
+        raise NotImplementedError
+
+    def prepare_guild(self, guild_id, guild_data, member_ids=None):
+        """
+            Return a snapshot of the given guild data that can be passed to ``write``.
+
+            Parameters
+            ----------
+            guild_id: :class:`str`
+                the id of a discord guild.
+            guild_data: :class:`dict, None`
+                a guild's data, or ``None`` if the guild should be archived.
+            member_ids: :class:`set[str], optional`
+                the ids of the members that were modified or removed, or ``None`` if
+                the whole guild was modified.
+
+            Returns
+            -------
+            payload: :class:`Any`
+                the snapshot of the guild data.
+        """
+
+        raise NotImplementedError
+
+    def prepare_market(self, market_data):
+        """
+            Return a snapshot of the given YashCoin data that can be passed to
+            ``write``.
+
+            Parameters
+            ----------
+            market_data: :class:`dict`
+                the data on YashCoins.
+
+            Returns
+            -------
+            payload: :class:`Any`
+                the snapshot of the YashCoin data.
+        """
+
+        raise NotImplementedError
+
+    def prepare_orders(self, order_data, order_ids=None):
+        """
+            Return a snapshot of the given open orders that can be passed to ``write``.
+
+            Parameters
+            ----------
+            order_data: :class:`dict`
+                the open orders, as returned by ``load_orders``.
+            order_ids: :class:`set[str], optional`
+                the ids of the orders that were placed or removed, or ``None`` if
+                every order was.
+
+            Returns
+            -------
+            payload: :class:`Any`
+                the snapshot of the orders.
+        """
+
+        raise NotImplementedError
+
+    def prepare_listings(self, listing_data, keys=None):
+        """
+            Return a snapshot of the given listed markets that can be passed to
+            ``write``.
+
+            Parameters
+            ----------
+            listing_data: :class:`dict`
+                the listed markets, as returned by ``load_listings``.
+            keys: :class:`set[str], optional`
+                the keys of the markets that were listed or modified, or ``None`` if
+                every market was.
+
+            Returns
+            -------
+            payload: :class:`Any`
+                the snapshot of the listed markets.
+        """
+
+        raise NotImplementedError
+
+    def write(self, guild_payloads, market_payload=None, order_payload=None,
+              listing_payload=None):
+        """
+            Persist the snapshots returned by ``prepare_guild``, ``prepare_market``,
+            ``prepare_orders`` and ``prepare_listings``.
+
+            Parameters
+            ----------
+            guild_payloads: :class:`list`
+                the guild snapshots to write.
+            market_payload: :class:`Any, optional`
+                the YashCoin snapshot to write, if any.
+            order_payload: :class:`Any, optional`
+                the snapshot of the orders to write, if any.
+            listing_payload: :class:`Any, optional`
+                the snapshot of the listed markets to write, if any.
+        """
+
+        raise NotImplementedError
+
+    def sync(self):
+        """
+            Make sure every snapshot passed to ``write`` has reached the disk, so that
+            the changes it holds can be discarded from the journal. Like ``write``,
+            this is called inside the worker thread.
+        """
+
+    def close(self):
+        """
+            Release the resources held by the backend.
+        """
+
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,231 @@
+import asyncio
+import hashlib
+import os
+from collections                import OrderedDict
+from os.path                    import isfile, join
+
+import settings
+from storage                    import codecs
+
+
+class ChartEntry:
+    """
+        A rendered chart: the size of its PNG file, and the URL of the attachment it
+        was last sent as (if any), which can be reused instead of sending it again.
+    """
+
+    __slots__ = ("name", "size", "url")
+
+    def __init__(self, name, size, url=None):
+        self.name = name
+        self.size = size
+        self.url = url
+
+
+class ChartCache:
+    """
+        Cache of rendered charts, keyed by everything they depend on (e.g. market,
+        day, tick index, period and theme), so that a chart is never rendered twice.
+        PNG files are stored in ``directory``, along with an index listing them from
+        least to most recently used, which keeps the cache across restarts. Once the
+        files add up to more than ``max_bytes``, the least recently used ones are
+        deleted. The index is written inside another thread, ``index_delay`` seconds
+        after it first changes, so a burst of changes writes it once; ``close`` writes
+        any change left.
+
+        Requests for a chart that is being rendered wait for that render instead of
+        starting another one, so a burst of requests renders a chart once.
+    """
+
+    INDEX_NAME = "index.json"
+
+    def __init__(self, directory, max_bytes, index_delay=settings.CHART_INDEX_DELAY):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_delay = index_delay
+        self.entries = OrderedDict()
+        self.size = 0
+        self._rendering = {}
+        self._index_changed = False
+        self._saving = None
+
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def stats(self):
+        """
+            Return the counters of the cache.
+
+            Returns
+            -------
+            stats: :class:`dict`
+                the number of hits, misses (renders), requests that waited for a
+                render, evictions, cached charts and cached bytes.
+        """
+
+        return {
+            "hits"      : self.hits,
+            "misses"    : self.misses,
+            "waits"     : self.waits,
+            "evictions" : self.evictions,
+            "charts"    : len(self.entries),
+            "bytes"     : self.size
+        }
+
+    async def get(self, key, render):
+        """
+            Return the cached chart of the given key, rendering it with ``render`` if
+            it is not cached yet.
+
+            Parameters
+            ----------
+            key: :class:`tuple`
+                the values the chart depends on.
+            render: :class:`Callable[[], Awaitable[bytes]]`
+                the coroutine function returning the PNG data of the chart.
+
+            Returns
+            -------
+            chart: :class:`tuple(ChartEntry, bytes)`
+                the cached chart, along with its PNG data if it has no URL yet (or
+                ``None`` otherwise).
+        """
+
+        name = self.get_name(key)
+        entry = self.entries.get(name)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(name)
+            png = None if entry.url is not None else await self._read(entry)
+            return (entry, png)
+
+        rendering = self._rendering.get(name)
+        if rendering is not None:
+            self.waits += 1
+            return await asyncio.shield(rendering)
+
+        self.misses += 1
+        rendering = self._rendering[name] = asyncio.get_event_loop().create_future()
+        try:
+            png = await render()
+            entry = ChartEntry(name, len(png))
+            await asyncio.get_event_loop().run_in_executor(
+                None, codecs.write_bytes, join(self.directory, name), png
+            )
+            self._add(entry)
+            rendering.set_result((entry, png))
+        except Exception as error:
+            rendering.set_exception(error)
+            # Retrieve the exception, in case no other request was waiting for it
+            rendering.exception()
+            raise
+        finally:
+            del self._rendering[name]
+
+        return (entry, png)
+
+    def set_url(self, entry, url):
+        """
+            Remember the URL of the attachment that the given chart was sent as.
+
+            Parameters
+            ----------
+            entry: :class:`ChartEntry`
+                the cached chart.
+            url: :class:`str`
+                the URL of the attachment.
+        """
+
+        entry.url = url
+        if entry.name in self.entries:
+            self._save_index()
+
+    def close(self):
+        """
+            Synchronously write the index if it changed since it was last written.
+            This is meant to be called once the event loop has stopped.
+        """
+
+        if self._index_changed:
+            self._index_changed = False
+            self._write_index(self._get_index())
+
+    @staticmethod
+    def get_name(key):
+        """
+            Return the name of the PNG file of the chart with the given key.
+
+            Parameters
+            ----------
+            key: :class:`tuple`
+                the values the chart depends on.
+
+            Returns
+            -------
+            name: :class:`str`
+                the name of the file.
+        """
+
+        digest = hashlib.sha1(repr(tuple(key)).encode()).hexdigest()
+        return f"{digest}.png"
+
+    def _add(self, entry):
+        self.entries[entry.name] = entry
+        self.size += entry.size
+
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= evicted.size
+            self.evictions += 1
+            path = join(self.directory, evicted.name)
+            if isfile(path):
+                os.remove(path)
+
+        self._save_index()
+
+    async def _read(self, entry):
+        def read():
+            with open(join(self.directory, entry.name), "rb") as png_file:
+                return png_file.read()
+
+        return await asyncio.get_event_loop().run_in_executor(None, read)
+
+    def _load_index(self):
+        path = join(self.directory, self.INDEX_NAME)
+        if not isfile(path):
+            return
+
+        for name, size, url in codecs.load(path):
+            if isfile(join(self.directory, name)):
+                self.entries[name] = ChartEntry(name, size, url)
+                self.size += size
+
+    def _save_index(self):
+        self._index_changed = True
+        if self._saving is None:
+            self._saving = asyncio.ensure_future(self._save_later())
+
+    async def _save_later(self):
+        # Changes made while the index is written are written by the next iteration
+        loop = asyncio.get_event_loop()
+        try:
+            await asyncio.sleep(self.index_delay)
+            while self._index_changed:
+                self._index_changed = False
+                await loop.run_in_executor(None, self._write_index, self._get_index())
+        except Exception as error:
+            self._index_changed = True
+            print(f"Failed to save the chart index: {error}", flush=True)
+        finally:
+            self._saving = None
+
+    def _get_index(self):
+        return [[entry.name, entry.size, entry.url] for entry in self.entries.values()]
+
+    def _write_index(self, index):
+        codecs.dump(join(self.directory, self.INDEX_NAME), index, "compact")
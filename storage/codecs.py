@@ -0,0 +1,285 @@
+import argparse
+import io
+import json
+import marshal
+import os
+import pickle
+from os.path                    import dirname, isdir, join
+
+
+class JsonCodec:
+    """
+        Human-readable JSON, indented like the files shipped with the bot.
+    """
+
+    name = "json"
+
+    def dumps(self, data):
+        return json.dumps(data, indent=4).encode()
+
+    def loads(self, raw):
+        return json.loads(raw)
+
+
+class CompactJsonCodec(JsonCodec):
+    """
+        JSON without any whitespace, which is smaller and faster to write.
+    """
+
+    name = "compact"
+
+    def dumps(self, data):
+        return json.dumps(data, separators=(",", ":")).encode()
+
+
+class DataUnpickler(pickle.Unpickler):
+    """
+        Unpickler that only rebuilds builtin types, which are the only ones stored by
+        the bot.
+    """
+
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"Unexpected object '{module}.{name}'")
+
+
+class PickleCodec:
+    """
+        Binary snapshot using the stdlib ``pickle`` module, which is the fastest to
+        load and save the plain dictionaries, lists and numbers stored by the bot.
+        The protocol is pinned, so files stay readable by any later version of
+        Python, and loading refuses anything but these builtin types, so a file
+        cannot run code. A magic header is written first so the format can be
+        detected on load.
+    """
+
+    name = "pickle"
+    MAGIC = b"NRTP\x01"
+    PROTOCOL = 4
+
+    def dumps(self, data):
+        return self.MAGIC + pickle.dumps(data, protocol=self.PROTOCOL)
+
+    def loads(self, raw):
+        try:
+            return DataUnpickler(io.BytesIO(raw[len(self.MAGIC):])).load()
+        except pickle.UnpicklingError as error:
+            raise ValueError(str(error)) from error
+
+
+class MarshalCodec:
+    """
+        Binary snapshot using the stdlib ``marshal`` module, written by older
+        versions. Since the format of ``marshal`` may change between versions of
+        Python, files are only read back (to be converted to another format), and
+        never written with it anymore.
+    """
+
+    name = "marshal"
+    MAGIC = b"NRTM\x01"
+
+    def loads(self, raw):
+        return marshal.loads(raw[len(self.MAGIC):])
+
+
+CODECS = {codec.name: codec for codec in (JsonCodec(), CompactJsonCodec(), PickleCodec())}
+
+
+def get_codec(name):
+    """
+        Return the codec registered under ``name``.
+
+        Parameters
+        ----------
+        name: :class:`str`
+            the name of a codec (``"json"``, ``"compact"`` or ``"pickle"``).
+
+        Returns
+        -------
+        codec: :class:`JsonCodec, CompactJsonCodec, PickleCodec`
+            the codec.
+
+        Raises
+        ------
+        ValueError:
+            no codec is registered under ``name``.
+    """
+
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown codec '{name}'")
+
+
+def detect_codec(raw):
+    """
+        Return the codec that was used to encode ``raw``. Both JSON codecs can read
+        each other's output, so ``"json"`` is returned for either of them. Files
+        written with ``marshal`` by older versions are detected as well.
+
+        Parameters
+        ----------
+        raw: :class:`bytes`
+            the encoded data.
+
+        Returns
+        -------
+        codec: :class:`JsonCodec, PickleCodec, MarshalCodec`
+            the codec able to decode ``raw``.
+    """
+
+    if raw.startswith(PickleCodec.MAGIC):
+        return CODECS["pickle"]
+    if raw.startswith(MarshalCodec.MAGIC):
+        return MarshalCodec()
+
+    return CODECS["json"]
+
+
+def loads(raw):
+    """
+        Return the data encoded inside ``raw``, whatever its format.
+
+        Parameters
+        ----------
+        raw: :class:`bytes`
+            the encoded data.
+
+        Returns
+        -------
+        data: :class:`Any`
+            the decoded data.
+
+        Raises
+        ------
+        ValueError:
+            ``raw`` is not valid data for the detected format.
+    """
+
+    return detect_codec(raw).loads(raw)
+
+
+def load(path):
+    """
+        Return the data stored inside the file at ``path``, whatever its format.
+
+        Parameters
+        ----------
+        path: :class:`str`
+            the path of the file.
+
+        Returns
+        -------
+        data: :class:`Any`
+            the decoded data.
+    """
+
+    with open(path, "rb") as data_file:
+        return loads(data_file.read())
+
+
+def dump(path, data, codec="json"):
+    """
+        Atomically replace the file at ``path`` with ``data`` encoded by ``codec``.
+
+        Parameters
+        ----------
+        path: :class:`str`
+            the path of the file.
+        data: :class:`Any`
+            the data to store.
+        codec: :class:`str, optional`
+            the name of the codec to encode the data with.
+    """
+
+    write_bytes(path, get_codec(codec).dumps(data))
+
+
+def write_bytes(path, raw):
+    """
+        Atomically replace the file at ``path`` with ``raw``, and make sure the new
+        content has reached the disk before returning.
+
+        Parameters
+        ----------
+        path: :class:`str`
+            the path of the file.
+        raw: :class:`bytes`
+            the content to write.
+    """
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as data_file:
+        data_file.write(raw)
+        data_file.flush()
+        os.fsync(data_file.fileno())
+
+    os.replace(tmp_path, path)
+    sync_directory(dirname(path))
+
+
+def sync_directory(path):
+    """
+        Make sure the files renamed inside the directory at ``path`` keep their new
+        names after a crash. Directories cannot be synced on Windows, where this
+        does nothing.
+
+        Parameters
+        ----------
+        path: :class:`str`
+            the path of the directory.
+    """
+
+    if os.name != "posix":
+        return
+
+    fd = os.open(path or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+
+### Command Line ###
+def convert(path, codec):
+    """
+        Re-encode the file at ``path`` with ``codec``. If ``path`` is a directory,
+        every ``.json`` file inside of it is converted.
+
+        Parameters
+        ----------
+        path: :class:`str`
+            the path of a file or directory.
+        codec: :class:`str`
+            the name of the codec to encode the data with.
+
+        Returns
+        -------
+        count: :class:`int`
+            the number of converted files.
+    """
+
+    if isdir(path):
+        return sum(convert(join(path, fname), codec) for fname in os.listdir(path)
+                   if fname.endswith(".json"))
+
+    dump(path, load(path), codec)
+    return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert stored data files between formats. File names are "
+                    "kept, since the format is detected from the content on load."
+    )
+    parser.add_argument("codec", choices=sorted(CODECS),
+                        help="the target format")
+    parser.add_argument("paths", nargs="+", help="files or directories to convert")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        print(f"{path}: converted {convert(path, args.codec)} file(s) to {args.codec}")
+
+
+if __name__ == "__main__":
+    main()
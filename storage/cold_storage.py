@@ -0,0 +1,281 @@
+import json
+import os
+import zlib
+from collections                import OrderedDict
+from os.path                    import getsize, isfile, join
+
+from storage                    import codecs
+
+
+class ColdStorage:
+    """
+        Compressed storage of the members that have been inactive for a long time,
+        away from the data loaded and written on every command.
+
+        The stored data of each archived member is compressed into its own zlib
+        block, appended to its guild's data file in ``directory``. The guild's index
+        (``<guild id>.idx``) logs the offset and size of the latest block of each
+        member, or its removal, one JSON line at a time. Archiving, restoring or
+        discarding members therefore only reads and writes their own blocks, whatever
+        the number of archived members. Once most of a data file is made of replaced
+        or discarded blocks, the live blocks are copied into a new data file.
+
+        Like the storage engines, this is only meant to be used from the backend's
+        worker thread. With ``read_only``, archives are only read, and the ones of
+        older versions are read without being migrated.
+    """
+
+    def __init__(self, directory, level=9, cache_size=64, read_only=False):
+        self.directory = directory
+        self.level = level
+        self.cache_size = cache_size
+        self.read_only = read_only
+
+        self._indexes = OrderedDict()
+
+        if not read_only:
+            os.makedirs(directory, exist_ok=True)
+
+    def get_path(self, name, extension):
+        return join(self.directory, f"{name}.{extension}")
+
+    def get_data_path(self, guild_id, generation):
+        return self.get_path(f"{guild_id}.{generation}", "cold")
+
+    def member_ids(self, guild_id):
+        """
+            Return the ids of the archived members of the given guild, which only
+            reads the guild's index.
+
+            Parameters
+            ----------
+            guild_id: :class:`str`
+                the id of a discord guild.
+
+            Returns
+            -------
+            member_ids: :class:`list[str]`
+                the ids of the guild's archived members.
+        """
+
+        return list(self._get_index(guild_id)["blocks"])
+
+    def read(self, guild_id, member_ids=None):
+        """
+            Return the stored data of the given archived members of the guild, only
+            decompressing their own blocks.
+
+            Parameters
+            ----------
+            guild_id: :class:`str`
+                the id of a discord guild.
+            member_ids: :class:`Iterable[str], optional`
+                the ids of the members to read, or ``None`` to read every archived
+                member of the guild.
+
+            Returns
+            -------
+            member_list_data: :class:`dict`
+                the stored data of the archived members among the given ones, by
+                member id.
+        """
+
+        index = self._get_index(guild_id)
+        blocks = index["blocks"]
+        if member_ids is None:
+            member_ids = list(blocks)
+
+        legacy = index.get("legacy")
+        if legacy is not None:
+            return {member_id: legacy[member_id] for member_id in set(member_ids)
+                    if member_id in legacy}
+
+        selected = sorted((blocks[member_id], member_id) for member_id in set(member_ids)
+                          if member_id in blocks)
+        if not selected:
+            return {}
+
+        member_list_data = {}
+        with open(self.get_data_path(guild_id, index["generation"]), "rb") as data_file:
+            for (offset, size), member_id in selected:
+                data_file.seek(offset)
+                raw = zlib.decompress(data_file.read(size))
+                member_list_data[member_id] = codecs.loads(raw)
+
+        return member_list_data
+
+    def add(self, guild_id, member_list_data):
+        """
+            Archive the given members of the guild, replacing any older archived data
+            of the same members.
+
+            Parameters
+            ----------
+            guild_id: :class:`str`
+                the id of a discord guild.
+            member_list_data: :class:`dict`
+                the stored data of the members to archive, by member id.
+        """
+
+        if member_list_data:
+            self._add_blocks(guild_id, self._get_index(guild_id), member_list_data)
+
+    def remove(self, guild_id, member_ids):
+        """
+            Discard the archived data of the given members of the guild, typically
+            once they have been restored and written back to the storage engine.
+
+            Parameters
+            ----------
+            guild_id: :class:`str`
+                the id of a discord guild.
+            member_ids: :class:`set[str]`
+                the ids of the members to discard.
+        """
+
+        index = self._get_index(guild_id)
+        lines = [[member_id] for member_id in member_ids if member_id in index["blocks"]]
+        if lines:
+            self._append_index(guild_id, index, lines)
+
+    def _add_blocks(self, guild_id, index, member_list_data):
+        # Blocks must reach the disk before the index lines pointing to them
+        codec = codecs.get_codec("compact")
+        lines = []
+        with open(self.get_data_path(guild_id, index["generation"]), "ab") as data_file:
+            for member_id, member_data in member_list_data.items():
+                block = zlib.compress(codec.dumps(member_data), self.level)
+                lines.append([member_id, data_file.tell(), len(block)])
+                data_file.write(block)
+            data_file.flush()
+            os.fsync(data_file.fileno())
+            index["size"] = data_file.tell()
+
+        self._append_index(guild_id, index, lines)
+
+    def _get_index(self, guild_id):
+        index = self._indexes.get(guild_id)
+        if index is None:
+            index = self._indexes[guild_id] = self._load_index(guild_id)
+            while len(self._indexes) > self.cache_size:
+                self._indexes.popitem(last=False)
+        else:
+            self._indexes.move_to_end(guild_id)
+
+        return index
+
+    def _load_index(self, guild_id):
+        index = {"generation": 0, "blocks": {}, "live": 0, "size": 0, "end": 0}
+        path = self.get_path(guild_id, "idx")
+        if not isfile(path):
+            self._migrate(guild_id, index)
+            return index
+
+        # The first line holds the generation of the data file, and the following ones
+        # add or remove the block of a member. A torn last line is ignored, and cut off
+        # on the next write
+        with open(path, "rb") as index_file:
+            for line in index_file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    fields = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                index["end"] += len(line)
+
+                if isinstance(fields, dict):
+                    index["generation"] = fields["generation"]
+                else:
+                    self._apply(index, fields)
+
+        data_path = self.get_data_path(guild_id, index["generation"])
+        index["size"] = getsize(data_path) if isfile(data_path) else 0
+        return index
+
+    def _migrate(self, guild_id, index):
+        # Older versions compressed every archived member of a guild together
+        legacy_path = self.get_path(guild_id, "json.z")
+        if not isfile(legacy_path):
+            return
+
+        with open(legacy_path, "rb") as legacy_file:
+            member_list_data = codecs.loads(zlib.decompress(legacy_file.read()))
+        if self.read_only:
+            index["legacy"] = member_list_data
+            index["blocks"] = dict.fromkeys(member_list_data)
+            return
+
+        self._add_blocks(guild_id, index, member_list_data)
+        os.remove(legacy_path)
+
+    def _append_index(self, guild_id, index, lines):
+        path = self.get_path(guild_id, "idx")
+        if index["end"] == 0:
+            lines = [{"generation": index["generation"]}, *lines]
+        encoded = self._encode(lines)
+
+        with open(path, "ab") as index_file:
+            index_file.truncate(index["end"])
+            index_file.write(encoded)
+            index_file.flush()
+            os.fsync(index_file.fileno())
+        index["end"] += len(encoded)
+
+        for fields in lines:
+            if isinstance(fields, list):
+                self._apply(index, fields)
+
+        # Discarded and replaced blocks are dropped once they outweigh the live ones
+        if (index["size"] - index["live"] > max(index["live"], 64 * 1024)
+                or not index["blocks"]):
+            self._compact(guild_id, index)
+
+    @staticmethod
+    def _encode(lines):
+        return b"".join(json.dumps(fields, separators=(",", ":")).encode() + b"\n"
+                        for fields in lines)
+
+    @staticmethod
+    def _apply(index, fields):
+        # Lines hold a member id, along with the offset and size of its new block
+        previous = index["blocks"].pop(fields[0], None)
+        if previous is not None:
+            index["live"] -= previous[1]
+        if len(fields) == 3:
+            index["blocks"][fields[0]] = (fields[1], fields[2])
+            index["live"] += fields[2]
+
+    def _compact(self, guild_id, index):
+        path = self.get_path(guild_id, "idx")
+        old_data_path = self.get_data_path(guild_id, index["generation"])
+        if not index["blocks"]:
+            os.remove(path)
+            if isfile(old_data_path):
+                os.remove(old_data_path)
+            index.update(generation=0, live=0, size=0, end=0)
+            return
+
+        # The live blocks are copied as is into a new data file, which only replaces
+        # the old one once the new index pointing to it is written
+        generation = index["generation"] + 1
+        blocks = {}
+        with open(old_data_path, "rb") as old_file, \
+             open(self.get_data_path(guild_id, generation), "wb") as data_file:
+            for member_id, (offset, size) in sorted(index["blocks"].items(),
+                                                    key=lambda item: item[1]):
+                old_file.seek(offset)
+                blocks[member_id] = (data_file.tell(), size)
+                data_file.write(old_file.read(size))
+            data_file.flush()
+            os.fsync(data_file.fileno())
+            size = data_file.tell()
+
+        encoded = self._encode([{"generation": generation}, *(
+            [member_id, offset, block_size]
+            for member_id, (offset, block_size) in blocks.items()
+        )])
+        codecs.write_bytes(path, encoded)
+        os.remove(old_data_path)
+
+        index.update(generation=generation, blocks=blocks, size=size, end=len(encoded))
@@ -0,0 +1,190 @@
+import argparse
+import asyncio
+import csv
+import gzip
+import json
+from datetime                   import date
+
+import settings
+from market.archive             import create_archive
+from market.engine              import MarketEngine
+from storage.store              import (DataStore, create_backend, create_cold_storage,
+                                        create_journal)
+
+MEMBER_COLUMNS = ("guild", "member", "nort_bucks", "yash_coins", "nort_mon", "prev_daily")
+PRICE_COLUMNS = ("market", "day", "tick", "value")
+FORMATS = ("csv", "ndjson")
+
+
+class RowWriter:
+    """
+        Writer of rows into a gzip-compressed CSV or NDJSON file. Each NDJSON line is
+        an object keyed by the column names.
+    """
+
+    def __init__(self, path, columns, fmt="csv"):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format '{fmt}'")
+
+        self.columns = columns
+        self.fmt = fmt
+        self.count = 0
+        self.file = gzip.open(path, "wt", newline="")
+
+        self.csv_writer = None
+        if fmt == "csv":
+            self.csv_writer = csv.writer(self.file)
+            self.csv_writer.writerow(columns)
+
+    def write(self, rows):
+        """
+            Write the given rows to the file.
+
+            Parameters
+            ----------
+            rows: :class:`list[tuple]`
+                the rows to write, holding one value per column.
+        """
+
+        if self.csv_writer is not None:
+            self.csv_writer.writerows(rows)
+        else:
+            self.file.writelines(json.dumps(dict(zip(self.columns, row))) + "\n"
+                                 for row in rows)
+
+        self.count += len(rows)
+
+    def close(self):
+        self.file.close()
+
+
+async def export_members(store, path, fmt="csv"):
+    """
+        Write the data of every stored member into a compressed file at ``path``.
+        Guilds are exported one at a time, and rows are written inside another
+        thread, so that memory use stays flat and the event loop is not blocked.
+
+        Parameters
+        ----------
+        store: :class:`storage.store.DataStore`
+            the data store to export the members of.
+        path: :class:`str`
+            the path of the file to write.
+        fmt: :class:`str, optional`
+            the format of the file (``"csv"`` or ``"ndjson"``).
+
+        Returns
+        -------
+        count: :class:`int`
+            the number of exported rows.
+    """
+
+    loop = asyncio.get_event_loop()
+    writer = RowWriter(path, MEMBER_COLUMNS, fmt)
+    try:
+        async for guild_id, member_list_data in store.iter_members():
+            rows = [(guild_id, member_id, record.nort_bucks, record.yash_coins,
+                     record.nort_mon, record.prev_daily)
+                    for member_id, record in member_list_data.items()]
+            await loop.run_in_executor(None, writer.write, rows)
+    finally:
+        await loop.run_in_executor(None, writer.close)
+
+    return writer.count
+
+
+async def export_prices(store, path, fmt="csv", chunk_days=settings.EXPORT_CHUNK_DAYS):
+    """
+        Write the YashCoin values of every market into a compressed file at ``path``:
+        the archived days of each market (see :class:`market.archive.PriceArchive`),
+        followed by its current day. Archived days are read from their memory maps
+        and written ``chunk_days`` at a time inside another thread, so that memory
+        use stays flat however long the history is.
+
+        Parameters
+        ----------
+        store: :class:`storage.store.DataStore`
+            the data store to export the YashCoin values of.
+        path: :class:`str`
+            the path of the file to write.
+        fmt: :class:`str, optional`
+            the format of the file (``"csv"`` or ``"ndjson"``).
+        chunk_days: :class:`int, optional`
+            the number of archived days written at a time.
+
+        Returns
+        -------
+        count: :class:`int`
+            the number of exported rows.
+    """
+
+    # The values of the current day are regenerated from the stored markets, without
+    # ever starting a new day
+    engine = MarketEngine(store.market, store.listings,
+                          archive=create_archive(store.market), roll=False)
+    day = engine.state["day"]
+    if day is not None:
+        current = {market: engine.values[:, column]
+                   for market, column in engine.columns.items()}
+    else:
+        day = store.market.get("prev_check")
+        current = {MarketEngine.SHARED: store.market.get("values", [])}
+
+    loop = asyncio.get_event_loop()
+    writer = RowWriter(path, PRICE_COLUMNS, fmt)
+    try:
+        for market in sorted(set(engine.archive.markets()) | set(current)):
+            days, ticks = engine.archive.get_range(market)
+            for start in range(0, len(days), chunk_days):
+                await loop.run_in_executor(None, write_days, writer, market,
+                                           days[start:start + chunk_days],
+                                           ticks[start:start + chunk_days])
+
+            if (market in current and day is not None
+                    and (not len(days) or days[-1] < date.fromisoformat(day).toordinal())):
+                rows = [(market, day, tick, int(value))
+                        for tick, value in enumerate(current[market])]
+                await loop.run_in_executor(None, writer.write, rows)
+    finally:
+        await loop.run_in_executor(None, writer.close)
+
+    return writer.count
+
+
+def write_days(writer, market, days, ticks):
+    # Rows are built inside the writer's thread, straight from the memory maps
+    writer.write([(market, date.fromordinal(ordinal).isoformat(), tick, value)
+                  for ordinal, values in zip(days.tolist(), ticks.tolist())
+                  for tick, value in enumerate(values)])
+
+
+EXPORTERS = {"members": export_members, "prices": export_prices}
+
+
+
+### Command Line ###
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the stored members or YashCoin values as a compressed "
+                    "file. The data is only read, so this can run alongside the bot."
+    )
+    parser.add_argument("data", choices=sorted(EXPORTERS), help="the data to export")
+    parser.add_argument("path", help="the file to write (e.g. members.csv.gz)")
+    parser.add_argument("--format", choices=FORMATS, default="csv", dest="fmt",
+                        help="the format of the file")
+    args = parser.parse_args()
+
+    # Nothing is migrated, and the journal is replayed into a view that is never
+    # written back
+    store = DataStore(create_backend(read_only=True), create_journal(read_only=True),
+                      create_cold_storage(read_only=True), read_only=True)
+    try:
+        count = asyncio.run(EXPORTERS[args.data](store, args.path, args.fmt))
+    finally:
+        store.close()
+
+    print(f"{args.path}: exported {count} row(s)")
+
+
+if __name__ == "__main__":
+    main()
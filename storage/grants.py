@@ -0,0 +1,278 @@
+import argparse
+import asyncio
+import csv
+import time
+
+import settings
+from storage.records            import MemberRecord
+from storage.store              import (DataStore, create_backend, create_cold_storage,
+                                        create_journal, create_ledger)
+
+GRANT_COLUMNS = ("member", "nort_bucks", "yash_coins")
+
+
+class GrantReport:
+    """
+        Progress of a bulk grant: the number of rows read and applied, the rows that
+        were rejected (along with a sample of the reasons why), the NortBucks and
+        YashCoins granted, and the throughput.
+    """
+
+    def __init__(self, dry_run=False, max_errors=10):
+        self.dry_run = dry_run
+        self.max_errors = max_errors
+        self.rows = 0
+        self.applied = 0
+        self.rejected = 0
+        self.errors = []
+        self.nort_bucks = 0
+        self.yash_coins = 0
+        self.chunks = 0
+        self.start = time.perf_counter()
+        self.elapsed = 0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0
+
+    def reject(self, line, reason):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(f"line {line}: {reason}")
+
+    def __str__(self):
+        return (f"{'[dry run] ' if self.dry_run else ''}{self.rows} row(s) read, " +
+                f"{self.applied} applied, {self.rejected} rejected | {self.nort_bucks:+d} NRT, " +
+                f"{self.yash_coins:+d} YSH | {self.rows_per_second:.0f} rows/s")
+
+
+def parse_row(row):
+    """
+        Return the member id and the changes of NortBucks and YashCoins of a CSV
+        row. Empty changes count as ``0``.
+
+        Parameters
+        ----------
+        row: :class:`list[str]`
+            the fields of the row.
+
+        Returns
+        -------
+        grant: :class:`tuple(str, int, int)`
+            the id of the member, and the changes of its NortBucks and YashCoins.
+
+        Raises
+        ------
+        ValueError:
+            the row does not hold a member id and two integers.
+    """
+
+    if len(row) != len(GRANT_COLUMNS):
+        raise ValueError(f"expected {len(GRANT_COLUMNS)} fields, got {len(row)}")
+
+    member_id, nort_bucks, yash_coins = (field.strip() for field in row)
+    if not member_id.isdigit():
+        raise ValueError(f"invalid member id '{member_id}'")
+
+    try:
+        return (str(int(member_id)), int(nort_bucks or 0), int(yash_coins or 0))
+    except ValueError:
+        raise ValueError(f"invalid amounts '{nort_bucks}', '{yash_coins}'")
+
+
+def read_chunk(reader, size, report):
+    """
+        Read and validate the next rows of a CSV reader, merging the rows of the same
+        member. Invalid rows are rejected in the report.
+
+        Parameters
+        ----------
+        reader: :class:`csv.reader`
+            the reader of the file.
+        size: :class:`int`
+            the maximum number of rows to read.
+        report: :class:`GrantReport`
+            the report of the grant.
+
+        Returns
+        -------
+        grants: :class:`dict, None`
+            the changes of NortBucks and YashCoins of each member, along with the
+            lines they come from, by member id, or ``None`` once the file is read.
+    """
+
+    grants = {}
+    count = 0
+    for row in reader:
+        if not row:
+            continue
+
+        count += 1
+        try:
+            member_id, nort_bucks, yash_coins = parse_row(row)
+        except ValueError as error:
+            # The first line may be a header
+            if not (reader.line_num == 1 and row[0].strip().lower() == GRANT_COLUMNS[0]):
+                report.rows += 1
+                report.reject(reader.line_num, error)
+        else:
+            report.rows += 1
+            grant = grants.setdefault(member_id, [0, 0, []])
+            grant[0] += nort_bucks
+            grant[1] += yash_coins
+            grant[2].append(reader.line_num)
+
+        if count >= size:
+            break
+
+    return grants if count else None
+
+
+def apply_chunk(records, grants, report):
+    """
+        Apply the given grants to the given records, rejecting the ones that would
+        leave a member with a negative balance.
+
+        Parameters
+        ----------
+        records: :class:`dict`
+            the record of each member, by member id.
+        grants: :class:`dict`
+            the grants returned by ``read_chunk``.
+        report: :class:`GrantReport`
+            the report of the grant.
+    """
+
+    for member_id, (nort_bucks, yash_coins, lines) in grants.items():
+        record = records.get(member_id) or MemberRecord()
+        if record.nort_bucks + nort_bucks < 0 or record.yash_coins + yash_coins < 0:
+            for line in lines:
+                report.reject(line, f"member {member_id} would have a negative balance")
+            continue
+
+        record.nort_bucks += nort_bucks
+        record.yash_coins += yash_coins
+
+        report.applied += len(lines)
+        report.nort_bucks += nort_bucks
+        report.yash_coins += yash_coins
+
+
+async def grant_members(store, guild, path, chunk_size=settings.GRANT_CHUNK_SIZE,
+                        dry_run=False, progress=None):
+    """
+        Credit (or debit) the members of a guild from the CSV file at ``path``, whose
+        rows hold a member id, a change of NortBucks and a change of YashCoins. The
+        file is streamed in chunks of ``chunk_size`` rows, which are read and validated
+        inside another thread. Each chunk is applied as a single batch and written
+        by a single flush, so memory use stays flat and the event loop is only held
+        while a chunk is applied. The journal is only folded into a snapshot once
+        every chunk is written. Unregistered members are registered.
+
+        Parameters
+        ----------
+        store: :class:`storage.store.DataStore`
+            the data store to grant the members of, which must be started.
+        guild: :class:`discord.Guild, int, str`
+            a discord guild, or its id.
+        path: :class:`str`
+            the path of the CSV file.
+        chunk_size: :class:`int, optional`
+            the number of rows applied at a time.
+        dry_run: :class:`bool, optional`
+            a value determining whether the rows are only validated, without
+            modifying anything. Each chunk is then applied to copies of the
+            members' records, which are kept across chunks so that every row is
+            validated against the balances left by the rows before it. Archived
+            members are read without being restored.
+        progress: :class:`Callable[[GrantReport], Awaitable[None]], optional`
+            the coroutine function called with the report after each chunk.
+
+        Returns
+        -------
+        report: :class:`GrantReport`
+            the report of the grant.
+    """
+
+    loop = asyncio.get_event_loop()
+    report = GrantReport(dry_run)
+    simulated = {}
+    async with store.defer_compaction():
+        with open(path, "r", newline="") as csv_file:
+            reader = csv.reader(csv_file)
+            while True:
+                grants = await loop.run_in_executor(None, read_chunk, reader, chunk_size,
+                                                    report)
+                if grants is None:
+                    break
+
+                if dry_run:
+                    missing = [member_id for member_id in grants
+                               if member_id not in simulated]
+                    records = await store.get_members(guild, missing, restore=False)
+                    simulated.update((member_id, records[member_id].copy()
+                                      if member_id in records else MemberRecord())
+                                     for member_id in missing)
+                    apply_chunk(simulated, grants, report)
+                else:
+                    async with store.batch(guild, grants, reason="grant") as records:
+                        apply_chunk(records, grants, report)
+                    await store.flush()
+
+                report.chunks += 1
+                report.elapsed = time.perf_counter() - report.start
+                if progress is not None:
+                    await progress(report)
+
+    report.elapsed = time.perf_counter() - report.start
+    return report
+
+
+
+### Command Line ###
+async def run(store, guild_id, path, chunk_size, dry_run):
+    async def progress(report):
+        print(report, flush=True)
+
+    if not store.read_only:
+        store.start()
+    return await grant_members(store, guild_id, path, chunk_size, dry_run, progress)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Credit or debit the members of a guild from a CSV file of "
+                    f"({', '.join(GRANT_COLUMNS)}) rows. The data is modified, so this "
+                    "must not run alongside the bot (use its grant command instead), "
+                    "unless it is a dry run."
+    )
+    parser.add_argument("path", help="the CSV file of grants")
+    parser.add_argument("--guild", required=True,
+                        help="the id of the guild to grant the members of")
+    parser.add_argument("--chunk-size", type=int, default=settings.GRANT_CHUNK_SIZE,
+                        help="the number of rows applied at a time")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="only validate the rows, each against the balances left "
+                             "by the rows before it, without modifying anything")
+    args = parser.parse_args()
+
+    # A dry run only reads the data, like an export
+    if args.dry_run:
+        store = DataStore(create_backend(read_only=True), create_journal(read_only=True),
+                          create_cold_storage(read_only=True), read_only=True)
+    else:
+        store = DataStore(create_backend(), create_journal(), create_cold_storage(),
+                          create_ledger())
+    try:
+        report = asyncio.run(run(store, args.guild, args.path, args.chunk_size,
+                                 args.dry_run))
+    finally:
+        store.close()
+
+    print(report)
+    for error in report.errors:
+        print(error)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import json
+import os
+from os.path                    import isfile
+
+
+class Journal:
+    """
+        Append-only file of the changes made to the stored data since the last
+        snapshot. Each line is a JSON record holding the new state of a member, a
+        guild or the YashCoin data, so replaying a record more than once is harmless.
+        With ``read_only``, the journal can only be replayed.
+    """
+
+    def __init__(self, path, read_only=False):
+        self.path = path
+        self.file = None
+        # A torn last line is cut off, since the next records would be glued to it
+        self.size = self._find_end()
+        if not read_only:
+            self.file = open(path, "a")
+            self.file.truncate(self.size)
+
+    @staticmethod
+    def encode(records):
+        """
+            Return the given records encoded as journal lines. This is meant to be
+            called while the data cannot change (i.e. on the event loop), so that the
+            result can safely be passed to ``append`` from another thread.
+
+            Parameters
+            ----------
+            records: :class:`list[dict]`
+                the records to encode.
+
+            Returns
+            -------
+            encoded: :class:`str`
+                the encoded records, one per line.
+        """
+
+        return "".join(json.dumps(record, separators=(",", ":")) + "\n"
+                       for record in records)
+
+    def append(self, encoded):
+        """
+            Append the given encoded records to the journal and make sure they reach
+            the disk before returning, using a single ``fsync`` for the whole batch.
+
+            Parameters
+            ----------
+            encoded: :class:`str`
+                the records returned by ``encode``.
+        """
+
+        if not encoded:
+            return
+
+        self.file.write(encoded)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.size += len(encoded)
+
+    def replay(self):
+        """
+            Return an iterator over every record stored in the journal. A torn last
+            line (e.g. caused by a crash in the middle of a write) is ignored.
+
+            Returns
+            -------
+            records: :class:`Iterator[dict]`
+                the stored records, from oldest to newest.
+        """
+
+        if not isfile(self.path):
+            return
+
+        with open(self.path, "r") as journal_file:
+            for line in journal_file:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    return
+
+    def truncate(self):
+        """
+            Discard every record stored in the journal, typically once they have been
+            folded into a snapshot.
+        """
+
+        self.file.truncate(0)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.size = 0
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+    def _find_end(self):
+        # Return the offset right after the last complete record
+        if not isfile(self.path):
+            return 0
+
+        end = 0
+        with open(self.path, "rb") as journal_file:
+            for line in journal_file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                end += len(line)
+
+        return end
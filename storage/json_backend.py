@@ -0,0 +1,172 @@
+import os
+from os.path                    import dirname, exists, isdir, isfile, join
+
+from storage                    import codecs
+from storage.backend            import Backend
+from storage.records            import dump_guild_data
+from utils                      import get_json_data
+
+
+class JsonBackend(Backend):
+    """
+        Storage engine keeping the data of each guild in its own file (or shard)
+        inside ``directory``, the YashCoin data in ``market_path``, and the open orders
+        and listed markets in ``orders_path`` and ``listings_path`` (next to
+        ``market_path`` by default). Files are written with the given codec (see
+        :mod:`storage.codecs`), and read back whatever codec they were written with.
+        With ``read_only``, nothing is created or migrated.
+    """
+
+    ARCHIVE_DIR = "archive"
+
+    def __init__(self, directory, market_path, legacy_path=None, codec="json",
+                 read_only=False, orders_path=None, listings_path=None):
+        super().__init__()
+        self.directory = directory
+        self.archive_directory = join(directory, self.ARCHIVE_DIR)
+        self.market_path = market_path
+        self.orders_path = orders_path or join(dirname(market_path), "orders.json")
+        self.listings_path = listings_path or join(dirname(market_path), "listings.json")
+        self.codec = codecs.get_codec(codec)
+        self.read_only = read_only
+
+        if read_only:
+            return
+
+        os.makedirs(self.archive_directory, exist_ok=True)
+        if legacy_path is not None and isfile(legacy_path):
+            self.migrate(legacy_path)
+
+    def get_shard_path(self, guild_id, archived=False):
+        """
+            Return the path of the file holding the data of the given guild.
+
+            Parameters
+            ----------
+            guild_id: :class:`str`
+                the id of a discord guild.
+            archived: :class:`bool, optional`
+                a value determining whether to return the path of the archived shard.
+
+            Returns
+            -------
+            path: :class:`str`
+                the path of the guild's shard.
+        """
+
+        directory = self.archive_directory if archived else self.directory
+        return join(directory, f"{guild_id}.json")
+
+    def migrate(self, legacy_path):
+        """
+            Split the single data file used by older versions into one shard per
+            guild. Shards that already exist are left untouched. Once done, the old
+            file is renamed so that the migration only runs once.
+
+            Parameters
+            ----------
+            legacy_path: :class:`str`
+                the path of the old data file.
+        """
+
+        for guild_id, guild_data in get_json_data(legacy_path).items():
+            shard_path = self.get_shard_path(guild_id)
+            if not exists(shard_path):
+                codecs.write_bytes(shard_path, self.codec.dumps(guild_data))
+
+        os.replace(legacy_path, f"{legacy_path}.migrated")
+        print(f"Migrated '{legacy_path}' into '{self.directory}'", flush=True)
+
+    ### Loading ###
+    def guild_ids(self):
+        if not isdir(self.directory):
+            return []
+
+        return self.run(lambda: [
+            fname[:-5] for fname in os.listdir(self.directory)
+            if fname.endswith(".json") and isfile(join(self.directory, fname))
+        ])
+
+    def load_guild(self, guild_id):
+        return self.run(self._load_file, self.get_shard_path(guild_id))
+
+    def restore_guild(self, guild_id):
+        return self.run(self._load_file, self.get_shard_path(guild_id, archived=True))
+
+    def load_market(self):
+        return self.run(self._load_file, self.market_path) or {}
+
+    def load_orders(self):
+        return self.run(self._load_file, self.orders_path) or {"next_id": 1, "open": {}}
+
+    def load_listings(self):
+        return self.run(self._load_file, self.listings_path) or {}
+
+    def pending_expeditions(self):
+        # Shards have no index, so every one of them has to be scanned
+        def scan():
+            expeditions = []
+            for fname in os.listdir(self.directory):
+                if not fname.endswith(".json"):
+                    continue
+
+                guild_data = self._load_file(join(self.directory, fname)) or {}
+                expeditions.extend(
+                    (fname[:-5], member_id) for member_id, member_data
+                    in guild_data.get("yc_members", {}).items()
+                    if isinstance(member_data, dict) and member_data.get("on_expedition")
+                )
+
+            return expeditions
+
+        return self.run(scan)
+
+    @staticmethod
+    def _load_file(path):
+        return get_json_data(path) if isfile(path) else None
+
+    ### Writing ###
+    def prepare_guild(self, guild_id, guild_data, member_ids=None):
+        # Shards are always rewritten as a whole, regardless of which members changed.
+        # The records are copied, and only encoded inside the worker thread
+        if guild_data is None:
+            return (guild_id, None)
+
+        return (guild_id, dump_guild_data(guild_data))
+
+    def prepare_market(self, market_data):
+        # The YashCoin data is nested and modified in place, and only written when a
+        # new day starts, so it is encoded right away
+        return self.codec.dumps(market_data)
+
+    def prepare_orders(self, order_data, order_ids=None):
+        # Like shards, the orders file is always rewritten as a whole. The fields of an
+        # order are replaced rather than modified, so they are not copied
+        return {"next_id": order_data["next_id"], "open": dict(order_data["open"])}
+
+    def prepare_listings(self, listing_data, keys=None):
+        return {key: list(fields) for key, fields in listing_data.items()}
+
+    def write(self, guild_payloads, market_payload=None, order_payload=None,
+              listing_payload=None):
+        archived = False
+        for guild_id, dumped in guild_payloads:
+            shard_path = self.get_shard_path(guild_id)
+            if dumped is not None:
+                codecs.write_bytes(shard_path, self.codec.dumps(dumped))
+            elif isfile(shard_path):
+                os.replace(shard_path, self.get_shard_path(guild_id, archived=True))
+                archived = True
+
+        if archived:
+            codecs.sync_directory(self.directory)
+            codecs.sync_directory(self.archive_directory)
+
+        # Orders and listings are written first, since the ones left inside older
+        # YashCoin data are only moved out of it while none is stored
+        if order_payload is not None:
+            codecs.write_bytes(self.orders_path, self.codec.dumps(order_payload))
+        if listing_payload is not None:
+            codecs.write_bytes(self.listings_path, self.codec.dumps(listing_payload))
+        if market_payload is not None:
+            codecs.write_bytes(self.market_path, market_payload)
@@ -0,0 +1,283 @@
+import json
+import os
+import zlib
+from collections                import OrderedDict
+from datetime                   import date, datetime, timezone
+from os.path                    import isfile, join
+
+from storage                    import codecs
+
+
+class LedgerEntry:
+    """
+        A change of a member's balance: when and why it happened, by how much the
+        NortBucks and YashCoins of the member changed, what they became, and the
+        YashCoin price it was made at (if any).
+    """
+
+    __slots__ = ("time", "guild_id", "member_id", "reason", "nort_bucks_delta",
+                 "yash_coins_delta", "nort_bucks", "yash_coins", "price")
+
+    def __init__(self, time, guild_id, member_id, reason, nort_bucks_delta,
+                 yash_coins_delta, nort_bucks, yash_coins, price=None):
+        self.time = time
+        self.guild_id = guild_id
+        self.member_id = member_id
+        self.reason = reason
+        self.nort_bucks_delta = nort_bucks_delta
+        self.yash_coins_delta = yash_coins_delta
+        self.nort_bucks = nort_bucks
+        self.yash_coins = yash_coins
+        self.price = price
+
+    def to_list(self):
+        return [getattr(self, field) for field in self.__slots__]
+
+    @classmethod
+    def from_list(cls, fields):
+        return cls(*fields)
+
+
+class Ledger:
+    """
+        Append-only record of every change of the members' balances, split into
+        segments of ``segment_days`` days stored in ``directory``.
+
+        The active segment (``<first day>.log``) holds one JSON line per entry, and
+        the offset of each member's entries is kept in memory. Once its period is
+        over, a segment is sealed: the entries of each member are compressed together
+        into their own zlib block of ``<first day>.seg``, and ``<first day>.idx``
+        indexes the offset, size and number of entries of every block. Reading a
+        page of a member's history therefore only decompresses the blocks of that
+        member inside the segments the page spans, which the entry counts of the
+        indexes point to without reading anything else.
+
+        Like the storage engines, this is only meant to be used from the backend's
+        worker thread.
+    """
+
+    def __init__(self, directory, segment_days=7, level=9, cache_size=64):
+        self.directory = directory
+        self.segment_days = segment_days
+        self.level = level
+        self.cache_size = cache_size
+
+        self._file = None
+        self._active = None
+        self._offsets = {}
+        self._indexes = OrderedDict()
+
+        os.makedirs(directory, exist_ok=True)
+        self._segments = self._open()
+
+    @staticmethod
+    def get_key(guild_id, member_id):
+        return f"{guild_id}:{member_id}"
+
+    def get_segment(self, timestamp):
+        """
+            Return the name of the segment holding the entries made at the given
+            time, which is the first day of its period.
+
+            Parameters
+            ----------
+            timestamp: :class:`float`
+                a POSIX timestamp.
+
+            Returns
+            -------
+            name: :class:`str`
+                the name of the segment.
+        """
+
+        ordinal = datetime.fromtimestamp(timestamp, timezone.utc).date().toordinal()
+        return date.fromordinal(ordinal - ordinal % self.segment_days).isoformat()
+
+    def get_path(self, name, extension):
+        return join(self.directory, f"{name}.{extension}")
+
+    def append(self, entries):
+        """
+            Append the given entries to the ledger, sealing the active segment first
+            when an entry starts a new period, and make sure they reach the disk before
+            returning, using a single ``fsync`` for the whole batch.
+
+            Parameters
+            ----------
+            entries: :class:`list[LedgerEntry]`
+                the entries, from oldest to newest.
+        """
+
+        if not entries:
+            return
+
+        for entry in entries:
+            name = self.get_segment(entry.time)
+            if self._active is None or name > self._active:
+                self._start_segment(name)
+
+            key = self.get_key(entry.guild_id, entry.member_id)
+            line = json.dumps(entry.to_list(), separators=(",", ":")).encode() + b"\n"
+            self._offsets.setdefault(key, []).append(self._file.tell())
+            self._file.write(line)
+
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def read(self, guild_id, member_id, offset=0, count=10):
+        """
+            Return a page of the entries of the given member, from newest to oldest.
+            Only the segments up to the end of the page are read.
+
+            Parameters
+            ----------
+            guild_id: :class:`str`
+                the id of a discord guild.
+            member_id: :class:`str`
+                the id of a discord member that is part of the guild.
+            offset: :class:`int, optional`
+                the number of newer entries to skip.
+            count: :class:`int, optional`
+                the maximum number of entries to return.
+
+            Returns
+            -------
+            entries: :class:`list[LedgerEntry]`
+                the entries of the page.
+        """
+
+        key = self.get_key(guild_id, member_id)
+        entries = []
+
+        # Entries of the active segment, then of each sealed segment, newest first
+        active_offsets = self._offsets.get(key, [])
+        if offset < len(active_offsets):
+            selected = active_offsets[::-1][offset:offset + count]
+            with open(self.get_path(self._active, "log"), "rb") as log_file:
+                for position in selected:
+                    log_file.seek(position)
+                    entries.append(LedgerEntry.from_list(json.loads(log_file.readline())))
+        skip = max(0, offset - len(active_offsets))
+
+        for name in reversed(self._segments):
+            if len(entries) >= count:
+                break
+
+            block = self._get_index(name).get(key)
+            if block is None:
+                continue
+
+            block_offset, size, block_count = block
+            if skip >= block_count:
+                skip -= block_count
+                continue
+
+            with open(self.get_path(name, "seg"), "rb") as segment_file:
+                segment_file.seek(block_offset)
+                lines = zlib.decompress(segment_file.read(size)).splitlines()
+            selected = lines[::-1][skip:skip + count - len(entries)]
+            entries.extend(LedgerEntry.from_list(json.loads(line)) for line in selected)
+            skip = 0
+
+        return entries
+
+    def seal(self, name):
+        """
+            Compress the given segment into one block per member, along with the index
+            of those blocks, then delete its log. A crash in the middle leaves the log
+            in place, and the segment is sealed again on the next start.
+
+            Parameters
+            ----------
+            name: :class:`str`
+                the name of the segment.
+        """
+
+        log_path = self.get_path(name, "log")
+        blocks = OrderedDict()
+        with open(log_path, "rb") as log_file:
+            for line in log_file:
+                try:
+                    fields = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line, caused by a crash in the middle of a write
+                    break
+                blocks.setdefault(self.get_key(fields[1], fields[2]), []).append(line)
+
+        index = {}
+        segment_path = self.get_path(name, "seg")
+        with open(segment_path + ".tmp", "wb") as segment_file:
+            for key, lines in blocks.items():
+                block = zlib.compress(b"".join(lines), self.level)
+                index[key] = [segment_file.tell(), len(block), len(lines)]
+                segment_file.write(block)
+            segment_file.flush()
+            os.fsync(segment_file.fileno())
+        os.replace(segment_path + ".tmp", segment_path)
+
+        # The index is written last, since it marks the segment as sealed
+        codecs.dump(self.get_path(name, "idx"), index, "compact")
+        os.remove(log_path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open(self):
+        names = sorted({file_name.rsplit(".", 1)[0] for file_name in os.listdir(self.directory)
+                        if file_name.endswith((".log", ".idx"))})
+
+        for name in names:
+            log_path = self.get_path(name, "log")
+            if not isfile(log_path):
+                continue
+            if isfile(self.get_path(name, "idx")):
+                # The segment was sealed right before a crash
+                os.remove(log_path)
+            elif name != names[-1]:
+                self.seal(name)
+            else:
+                self._resume_segment(name)
+
+        return [name for name in names if name != self._active]
+
+    def _start_segment(self, name):
+        previous = self._active
+        self.close()
+        if previous is not None:
+            self.seal(previous)
+            self._segments.append(previous)
+
+        self._active = name
+        self._offsets = {}
+        self._file = open(self.get_path(name, "log"), "ab")
+
+    def _resume_segment(self, name):
+        log_path = self.get_path(name, "log")
+        end = 0
+        with open(log_path, "rb") as log_file:
+            for line in log_file:
+                try:
+                    fields = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                self._offsets.setdefault(self.get_key(fields[1], fields[2]), []).append(end)
+                end += len(line)
+
+        self._active = name
+        self._file = open(log_path, "ab")
+        # Drop a torn last line, if any
+        self._file.truncate(end)
+        self._file.seek(end)
+
+    def _get_index(self, name):
+        index = self._indexes.get(name)
+        if index is None:
+            index = self._indexes[name] = codecs.load(self.get_path(name, "idx"))
+            while len(self._indexes) > self.cache_size:
+                self._indexes.popitem(last=False)
+        else:
+            self._indexes.move_to_end(name)
+
+        return index
@@ -0,0 +1,183 @@
+from utils                      import dict_get_as_float, dict_get_as_int
+
+
+class MemberRecord:
+    """
+        The data of a registered guild member. Stored values are parsed and validated
+        once when the record is created, so reading a field afterwards is a plain
+        attribute access.
+    """
+
+    __slots__ = ("nort_bucks", "yash_coins", "cringe_meter", "prev_daily",
+                 "on_expedition", "nort_mon", "expedition_end", "expedition_reward",
+                 "expedition_channel")
+
+    def __init__(self, nort_bucks=0, yash_coins=0, cringe_meter=0.0, prev_daily=None,
+                 on_expedition=0, nort_mon=None, expedition_end=None,
+                 expedition_reward=0, expedition_channel=None):
+        self.nort_bucks = nort_bucks
+        self.yash_coins = yash_coins
+        self.cringe_meter = cringe_meter
+        self.prev_daily = prev_daily
+        self.on_expedition = on_expedition
+        self.nort_mon = nort_mon
+        self.expedition_end = expedition_end
+        self.expedition_reward = expedition_reward
+        self.expedition_channel = expedition_channel
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+            Return a record built from stored member data. Invalid values are replaced
+            by their defaults.
+
+            Parameters
+            ----------
+            data: :class:`dict`
+                a member's stored data.
+
+            Returns
+            -------
+            record: :class:`MemberRecord`
+                the member's record.
+        """
+
+        if isinstance(data, cls):
+            return data
+        if not isinstance(data, dict):
+            return cls()
+
+        prev_daily = data.get("prev_daily")
+        nort_mon = data.get("nort_mon")
+        expedition_end = data.get("expedition_end")
+        expedition_channel = data.get("expedition_channel")
+
+        return cls(
+            nort_bucks=dict_get_as_int(data, "nort_bucks"),
+            yash_coins=dict_get_as_int(data, "yash_coins"),
+            cringe_meter=dict_get_as_float(data, "cringe_meter"),
+            prev_daily=str(prev_daily) if prev_daily is not None else None,
+            on_expedition=dict_get_as_int(data, "on_expedition"),
+            nort_mon=str(nort_mon) if nort_mon is not None else None,
+            expedition_end=(dict_get_as_float(data, "expedition_end")
+                            if expedition_end is not None else None),
+            expedition_reward=dict_get_as_int(data, "expedition_reward"),
+            expedition_channel=(dict_get_as_int(data, "expedition_channel")
+                                if expedition_channel is not None else None)
+        )
+
+    def to_dict(self):
+        """
+            Return the record as a dictionary that can be stored. Expedition fields
+            are only included while the member is on an expedition.
+
+            Returns
+            -------
+            data: :class:`dict`
+                the member's data.
+        """
+
+        data = {
+            "nort_bucks"    : self.nort_bucks,
+            "yash_coins"    : self.yash_coins,
+            "cringe_meter"  : self.cringe_meter,
+            "prev_daily"    : self.prev_daily,
+            "on_expedition" : self.on_expedition,
+            "nort_mon"      : self.nort_mon
+        }
+        if self.expedition_end is not None:
+            data["expedition_end"] = self.expedition_end
+            data["expedition_reward"] = self.expedition_reward
+            data["expedition_channel"] = self.expedition_channel
+
+        return data
+
+    def update(self, other):
+        """
+            Copy every field of ``other`` into the record, and return ``True`` if any
+            field changed.
+
+            Parameters
+            ----------
+            other: :class:`MemberRecord`
+                the record to copy the fields from.
+
+            Returns
+            -------
+            changed: :class:`bool`
+                a value indicating whether the record was modified.
+        """
+
+        changed = False
+        for field in self.__slots__:
+            value = getattr(other, field)
+            if getattr(self, field) != value:
+                setattr(self, field, value)
+                changed = True
+
+        return changed
+
+    def copy(self):
+        """
+            Return a shallow copy of the record.
+
+            Returns
+            -------
+            record: :class:`MemberRecord`
+                the copied record.
+        """
+
+        record = MemberRecord.__new__(MemberRecord)
+        for field in self.__slots__:
+            setattr(record, field, getattr(self, field))
+
+        return record
+
+
+def parse_guild_data(guild_data):
+    """
+        Replace, in place, the stored data of every member of the guild by a
+        :class:`MemberRecord`, and return the guild data.
+
+        Parameters
+        ----------
+        guild_data: :class:`dict`
+            a guild's stored data.
+
+        Returns
+        -------
+        guild_data: :class:`dict`
+            the guild's data, holding member records.
+    """
+
+    member_list_data = guild_data.get("yc_members")
+    if isinstance(member_list_data, dict):
+        guild_data["yc_members"] = {str(member_id): MemberRecord.from_dict(member_data)
+                                    for member_id, member_data in member_list_data.items()}
+
+    return guild_data
+
+
+def dump_guild_data(guild_data):
+    """
+        Return a copy of the guild data where every member record has been converted
+        back into a dictionary that can be stored.
+
+        Parameters
+        ----------
+        guild_data: :class:`dict`
+            a guild's data, holding member records.
+
+        Returns
+        -------
+        guild_data: :class:`dict`
+            the guild's stored data.
+    """
+
+    dumped = dict(guild_data)
+    member_list_data = guild_data.get("yc_members")
+    if isinstance(member_list_data, dict):
+        dumped["yc_members"] = {member_id: member_data.to_dict()
+                                for member_id, member_data in member_list_data.items()}
+
+    return dumped
@@ -0,0 +1,376 @@
+import json
+import sqlite3
+
+from storage.backend            import Backend
+from storage.records            import MemberRecord
+
+
+class SqliteBackend(Backend):
+    """
+        Storage engine keeping every guild, member, YashCoin value, expedition, open
+        order and listed market inside a single SQLite database. The connection is
+        only ever used from the backend's worker thread. With ``read_only``, the
+        database must already exist and is only ever read.
+    """
+
+    MEMBER_FIELDS = ("nort_bucks", "yash_coins", "cringe_meter", "prev_daily",
+                     "on_expedition", "nort_mon")
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS guilds (
+            guild_id        INTEGER PRIMARY KEY,
+            archived        INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS members (
+            guild_id        INTEGER NOT NULL,
+            member_id       INTEGER NOT NULL,
+            nort_bucks      INTEGER NOT NULL DEFAULT 0,
+            yash_coins      INTEGER NOT NULL DEFAULT 0,
+            cringe_meter    REAL    NOT NULL DEFAULT 0,
+            prev_daily      TEXT,
+            on_expedition   INTEGER NOT NULL DEFAULT 0,
+            nort_mon        TEXT,
+            PRIMARY KEY (guild_id, member_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS members_by_prev_daily ON members (prev_daily);
+        CREATE INDEX IF NOT EXISTS members_on_expedition ON members (on_expedition)
+            WHERE on_expedition != 0;
+        CREATE TABLE IF NOT EXISTS expeditions (
+            guild_id        INTEGER NOT NULL,
+            member_id       INTEGER NOT NULL,
+            ends_at         REAL    NOT NULL,
+            reward          INTEGER NOT NULL,
+            channel_id      INTEGER,
+            PRIMARY KEY (guild_id, member_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS expeditions_by_ends_at ON expeditions (ends_at);
+        CREATE TABLE IF NOT EXISTS yash_coin_values (
+            day             TEXT    NOT NULL,
+            idx             INTEGER NOT NULL,
+            value           INTEGER NOT NULL,
+            PRIMARY KEY (day, idx)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS market_state (
+            key             TEXT    PRIMARY KEY,
+            value           TEXT    NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS orders (
+            order_id        INTEGER PRIMARY KEY,
+            market          TEXT    NOT NULL,
+            guild_id        INTEGER NOT NULL,
+            member_id       INTEGER NOT NULL,
+            side            TEXT    NOT NULL,
+            price           INTEGER NOT NULL,
+            amount          INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS listings (
+            market          TEXT    PRIMARY KEY,
+            idx             INTEGER NOT NULL,
+            start           INTEGER NOT NULL,
+            listed          TEXT
+        );
+        CREATE TABLE IF NOT EXISTS counters (
+            name            TEXT    PRIMARY KEY,
+            value           INTEGER NOT NULL
+        );
+    """
+
+    UPSERT_MEMBER = f"""
+        INSERT INTO members (guild_id, member_id, {", ".join(MEMBER_FIELDS)})
+        VALUES (?, ?, {", ".join("?" for _ in MEMBER_FIELDS)})
+        ON CONFLICT (guild_id, member_id) DO UPDATE SET
+        {", ".join(f"{f} = excluded.{f}" for f in MEMBER_FIELDS)}
+    """
+
+    UPSERT_EXPEDITION = """
+        INSERT INTO expeditions (guild_id, member_id, ends_at, reward, channel_id)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (guild_id, member_id) DO UPDATE SET
+        ends_at = excluded.ends_at, reward = excluded.reward,
+        channel_id = excluded.channel_id
+    """
+
+    def __init__(self, path, read_only=False):
+        super().__init__()
+        self.path = path
+        self.read_only = read_only
+        self.connection = None
+        self.run(self._connect)
+
+    def _connect(self):
+        if self.read_only:
+            # The database is neither created nor migrated, and cannot be written
+            self.connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True,
+                                              check_same_thread=False)
+            return
+
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(self.SCHEMA)
+        self.connection.commit()
+
+    def is_empty(self):
+        """
+            Return ``True`` if no guild has ever been stored inside the database.
+        """
+
+        def check():
+            try:
+                return self.connection.execute(
+                    "SELECT 1 FROM guilds LIMIT 1"
+                ).fetchone() is None
+            except sqlite3.OperationalError:
+                # A read-only connection never creates the tables
+                if not self.read_only:
+                    raise
+                return True
+
+        return self.run(check)
+
+    def import_guilds(self, guilds):
+        """
+            Insert the data of the given guilds inside the database, typically to
+            migrate from the JSON backend.
+
+            Parameters
+            ----------
+            guilds: :class:`Iterable[tuple(str, dict)]`
+                pairs of guild ids and guild data.
+        """
+
+        payloads = [self.prepare_guild(guild_id, guild_data)
+                    for guild_id, guild_data in guilds]
+        self.run(self.write, payloads)
+
+    ### Loading ###
+    def guild_ids(self):
+        return self.run(lambda: [str(guild_id) for guild_id, in self.connection.execute(
+            "SELECT guild_id FROM guilds WHERE archived = 0"
+        )])
+
+    def load_guild(self, guild_id, archived=False):
+        def load():
+            row = self.connection.execute(
+                "SELECT archived FROM guilds WHERE guild_id = ?", (int(guild_id),)
+            ).fetchone()
+            if row is None or row[0] != int(archived):
+                return None
+
+            cursor = self.connection.execute(
+                f"SELECT m.member_id, {', '.join(f'm.{f}' for f in self.MEMBER_FIELDS)}, "
+                "e.ends_at, e.reward, e.channel_id FROM members m LEFT JOIN expeditions e "
+                "ON e.guild_id = m.guild_id AND e.member_id = m.member_id "
+                "WHERE m.guild_id = ?", (int(guild_id),)
+            )
+            return {"yc_members": {str(row[0]): self._row_to_member(row[1:])
+                                   for row in cursor}}
+
+        return self.run(load)
+
+    def restore_guild(self, guild_id):
+        return self.load_guild(guild_id, archived=True)
+
+    def pending_expeditions(self):
+        return self.run(lambda: [(str(guild_id), str(member_id)) for guild_id, member_id
+                                 in self.connection.execute(
+            "SELECT m.guild_id, m.member_id FROM members m JOIN guilds g "
+            "ON g.guild_id = m.guild_id WHERE m.on_expedition != 0 AND g.archived = 0"
+        )])
+
+    def load_market(self):
+        def load():
+            # Anything but the current values (e.g. the pregenerated days) is stored
+            # as JSON
+            market_data = {key: json.loads(value) for key, value in self.connection.execute(
+                "SELECT key, value FROM market_state"
+            )}
+
+            row = self.connection.execute(
+                "SELECT MAX(day) FROM yash_coin_values"
+            ).fetchone()
+            if row[0] is None:
+                return market_data
+
+            values = [value for value, in self.connection.execute(
+                "SELECT value FROM yash_coin_values WHERE day = ? ORDER BY idx", row
+            )]
+            market_data.update(prev_check=row[0], values=values)
+            return market_data
+
+        return self.run(load)
+
+    def load_orders(self):
+        def load():
+            orders = {str(row[0]): [row[0], row[1], str(row[2]), str(row[3]), *row[4:]]
+                      for row in self.connection.execute(
+                "SELECT order_id, market, guild_id, member_id, side, price, amount "
+                "FROM orders"
+            )}
+            row = self.connection.execute(
+                "SELECT value FROM counters WHERE name = 'orders'"
+            ).fetchone()
+            return {"next_id": row[0] if row is not None else 1, "open": orders}
+
+        return self.run(load)
+
+    def load_listings(self):
+        return self.run(lambda: {row[0]: list(row[1:]) for row in self.connection.execute(
+            "SELECT market, idx, start, listed FROM listings"
+        )})
+
+    def _row_to_member(self, row):
+        # Columns are already typed, so the record is built without any coercion
+        ends_at, reward, channel_id = row[len(self.MEMBER_FIELDS):]
+        return MemberRecord(*row[:len(self.MEMBER_FIELDS)], expedition_end=ends_at,
+                            expedition_reward=reward or 0, expedition_channel=channel_id)
+
+    ### Writing ###
+    def prepare_guild(self, guild_id, guild_data, member_ids=None):
+        # When the whole guild is written, its stored members are replaced, otherwise
+        # the given members that are no longer in the guild are deleted
+        if guild_data is None:
+            return (int(guild_id), None, False)
+
+        member_list_data = guild_data.get("yc_members", {})
+        replace = member_ids is None
+        if replace:
+            member_ids = member_list_data.keys()
+
+        rows = []
+        for member_id in member_ids:
+            if member_id not in member_list_data:
+                rows.append((int(member_id), None, None))
+                continue
+
+            record = MemberRecord.from_dict(member_list_data[member_id])
+
+            expedition = None
+            if record.on_expedition and record.expedition_end is not None:
+                expedition = (record.expedition_end, record.expedition_reward,
+                              record.expedition_channel)
+
+            rows.append((int(member_id),
+                         tuple(getattr(record, f) for f in self.MEMBER_FIELDS),
+                         expedition))
+
+        return (int(guild_id), rows, replace)
+
+    def prepare_market(self, market_data):
+        state = [(key, json.dumps(value)) for key, value in market_data.items()
+                 if key not in ("prev_check", "values")]
+        return (market_data.get("prev_check"), list(market_data.get("values", [])), state)
+
+    def prepare_orders(self, order_data, order_ids=None):
+        # Only the given orders are written, each as its own row
+        orders = order_data["open"]
+        replace = order_ids is None
+        if replace:
+            order_ids = orders.keys()
+
+        rows = [(int(order_id), orders.get(order_id)) for order_id in order_ids]
+        return (rows, replace, order_data["next_id"])
+
+    def prepare_listings(self, listing_data, keys=None):
+        # Like orders, only the given markets are written, each as its own row
+        replace = keys is None
+        if replace:
+            keys = listing_data.keys()
+
+        return ([(key, listing_data.get(key)) for key in keys], replace)
+
+    def write(self, guild_payloads, market_payload=None, order_payload=None,
+              listing_payload=None):
+        with self.connection:
+            for guild_id, rows, replace in guild_payloads:
+                self.connection.execute(
+                    "INSERT INTO guilds (guild_id, archived) VALUES (?, ?) "
+                    "ON CONFLICT (guild_id) DO UPDATE SET archived = excluded.archived",
+                    (guild_id, int(rows is None))
+                )
+                if rows is None:
+                    continue
+
+                if replace:
+                    for table in ("members", "expeditions"):
+                        self.connection.execute(
+                            f"DELETE FROM {table} WHERE guild_id = ?", (guild_id,)
+                        )
+                self.connection.executemany(
+                    "DELETE FROM members WHERE guild_id = ? AND member_id = ?",
+                    ((guild_id, member_id) for member_id, f, _ in rows if f is None)
+                )
+
+                self.connection.executemany(self.UPSERT_MEMBER, (
+                    (guild_id, member_id, *fields)
+                    for member_id, fields, _ in rows if fields is not None
+                ))
+                self.connection.executemany(self.UPSERT_EXPEDITION, (
+                    (guild_id, member_id, *expedition)
+                    for member_id, _, expedition in rows if expedition is not None
+                ))
+                self.connection.executemany(
+                    "DELETE FROM expeditions WHERE guild_id = ? AND member_id = ?",
+                    ((guild_id, member_id) for member_id, _, e in rows if e is None)
+                )
+
+            if order_payload is not None:
+                self._write_orders(*order_payload)
+            if listing_payload is not None:
+                self._write_listings(*listing_payload)
+
+            if market_payload is None:
+                return
+
+            # Keys that are no longer part of the YashCoin data (e.g. the orders of
+            # older versions) are dropped
+            day, values, state = market_payload
+            if day is not None:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO yash_coin_values (day, idx, value) "
+                    "VALUES (?, ?, ?)", ((day, idx, v) for idx, v in enumerate(values))
+                )
+            self.connection.execute("DELETE FROM market_state")
+            self.connection.executemany(
+                "INSERT INTO market_state (key, value) VALUES (?, ?)", state
+            )
+
+    def _write_orders(self, rows, replace, next_id):
+        if replace:
+            self.connection.execute("DELETE FROM orders")
+        self.connection.executemany(
+            "DELETE FROM orders WHERE order_id = ?",
+            ((order_id,) for order_id, fields in rows if fields is None)
+        )
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO orders (order_id, market, guild_id, member_id, side, "
+            "price, amount) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ((order_id, fields[1], int(fields[2]), int(fields[3]), *fields[4:])
+             for order_id, fields in rows if fields is not None)
+        )
+        self.connection.execute(
+            "INSERT OR REPLACE INTO counters (name, value) VALUES ('orders', ?)",
+            (next_id,)
+        )
+
+    def _write_listings(self, rows, replace):
+        if replace:
+            self.connection.execute("DELETE FROM listings")
+        self.connection.executemany(
+            "DELETE FROM listings WHERE market = ?",
+            ((key,) for key, fields in rows if fields is None)
+        )
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO listings (market, idx, start, listed) "
+            "VALUES (?, ?, ?, ?)",
+            ((key, *fields) for key, fields in rows if fields is not None)
+        )
+
+    def sync(self):
+        # With "synchronous = NORMAL", committed transactions are only synced to disk
+        # by a checkpoint of the write-ahead log
+        self.connection.execute("PRAGMA wal_checkpoint(FULL)")
+
+    def close(self):
+        self.run(self.connection.close)
+        super().close()
@@ -0,0 +1,1414 @@
+import asyncio
+import time
+from collections                import OrderedDict
+from contextlib                 import AsyncExitStack, asynccontextmanager
+from datetime                   import date, timedelta
+from os.path                    import isfile
+
+import settings
+from storage.cold_storage       import ColdStorage
+from storage.journal            import Journal
+from storage.ledger             import Ledger, LedgerEntry
+from storage.json_backend       import JsonBackend
+from storage.records            import MemberRecord, dump_guild_data, parse_guild_data
+from storage.sqlite_backend     import SqliteBackend
+from utils                      import get_json_path, get_rel_path
+
+
+def create_backend(name=settings.STORAGE_BACKEND, read_only=False):
+    """
+        Return the storage engine selected by ``name``. When the SQLite database is
+        created for the first time, the existing JSON shards are imported into it.
+
+        Parameters
+        ----------
+        name: :class:`str, optional`
+            the name of the storage engine (``"json"`` or ``"sqlite"``).
+        read_only: :class:`bool, optional`
+            a value determining whether the stored data is only read, in which case
+            nothing is migrated or imported. Until the SQLite database is created,
+            the JSON shards it would import are read instead.
+
+        Returns
+        -------
+        backend: :class:`storage.backend.Backend`
+            the storage engine.
+
+        Raises
+        ------
+        ValueError:
+            ``name`` is not the name of a storage engine.
+    """
+
+    json_backend = JsonBackend(get_rel_path("assets", "json", "guilds"),
+                               get_json_path("yash_coin"),
+                               legacy_path=get_json_path("data"),
+                               codec=settings.DATA_CODEC, read_only=read_only)
+    if name == "json":
+        return json_backend
+    if name != "sqlite":
+        raise ValueError(f"Unknown storage backend '{name}'")
+
+    path = get_rel_path("assets", settings.SQLITE_DB_NAME)
+    if read_only:
+        if not isfile(path):
+            return json_backend
+
+        backend = SqliteBackend(path, read_only=True)
+        if backend.is_empty():
+            backend.close()
+            return json_backend
+
+        json_backend.close()
+        return backend
+
+    backend = SqliteBackend(path)
+    if backend.is_empty():
+        backend.import_guilds((guild_id, json_backend.load_guild(guild_id))
+                              for guild_id in json_backend.guild_ids())
+        backend.run(backend.write, [],
+                    backend.prepare_market(json_backend.load_market()),
+                    backend.prepare_orders(json_backend.load_orders()),
+                    backend.prepare_listings(json_backend.load_listings()))
+
+    json_backend.close()
+    return backend
+
+
+def create_journal(read_only=False):
+    """
+        Return the journal used by the data store, or ``None`` if journaling is
+        disabled by ``settings.JOURNAL_ENABLED``.
+
+        Parameters
+        ----------
+        read_only: :class:`bool, optional`
+            a value determining whether the journal is only replayed.
+
+        Returns
+        -------
+        journal: :class:`storage.journal.Journal, None`
+            the journal of changes made since the last snapshot.
+    """
+
+    if not settings.JOURNAL_ENABLED:
+        return None
+
+    return Journal(get_rel_path("assets", settings.JOURNAL_NAME), read_only)
+
+
+def create_cold_storage(read_only=False):
+    """
+        Return the cold storage used by the data store, or ``None`` if it is disabled
+        by ``settings.COLD_STORAGE_ENABLED``.
+
+        Parameters
+        ----------
+        read_only: :class:`bool, optional`
+            a value determining whether the archived members are only read.
+
+        Returns
+        -------
+        cold: :class:`storage.cold_storage.ColdStorage, None`
+            the storage of inactive members.
+    """
+
+    if not settings.COLD_STORAGE_ENABLED:
+        return None
+
+    return ColdStorage(get_rel_path("assets", settings.COLD_STORAGE_NAME),
+                       read_only=read_only)
+
+
+def create_ledger():
+    """
+        Return the ledger used by the data store, or ``None`` if it is disabled by
+        ``settings.LEDGER_ENABLED``.
+
+        Returns
+        -------
+        ledger: :class:`storage.ledger.Ledger, None`
+            the record of every change of the members' balances.
+    """
+
+    if not settings.LEDGER_ENABLED:
+        return None
+
+    return Ledger(get_rel_path("assets", settings.LEDGER_NAME), settings.LEDGER_SEGMENT_DAYS)
+
+
+class DataStore:
+    """
+        Owner of the member and YashCoin data that is shared by every cog. Changes are
+        made to the in-memory data and marked as dirty, then persisted in coalesced
+        batches by a background task instead of on every command.
+
+        Without a journal, only the dirty guilds (and members, when the backend
+        supports it) are written to the backend. With a journal, the new state of
+        each dirty member is appended to the journal instead, and the backend only
+        receives a full snapshot once the journal grows past ``compact_size`` bytes.
+        On startup, the snapshot is loaded and the journal is replayed on top of it.
+        Open limit orders and listed markets are kept apart from the YashCoin data (in
+        ``orders`` and ``listings``), and are journaled and written one order or
+        market at a time as well.
+
+        Guilds are loaded on first access, inside another thread so that the event
+        loop keeps running, and kept in a least recently used cache, bounded by
+        ``cache_size`` guilds and ``cache_members`` members. An evicted
+        guild with pending changes is written back to the backend before being
+        dropped, so only the guilds in use stay in memory.
+
+        With a cold storage, members that have not claimed their daily NortBucks for
+        ``cold_after`` days are periodically moved out of their guild into the cold
+        storage, and moved back the next time they are looked up.
+
+        With ``read_only``, the store is a throwaway view of the stored data (e.g. to
+        export it while the bot runs): the journal is replayed on top of the
+        snapshot, but nothing is ever evicted, written or flushed, and the store
+        cannot be started.
+    """
+
+    def __init__(self, backend, journal=None, cold=None, ledger=None, read_only=False,
+                 flush_interval=settings.DATA_FLUSH_INTERVAL_MS,
+                 flush_threshold=settings.DATA_FLUSH_THRESHOLD,
+                 compact_size=settings.JOURNAL_COMPACT_SIZE,
+                 lock_stripes=settings.LOCK_STRIPES,
+                 cache_size=settings.GUILD_CACHE_SIZE,
+                 cache_members=settings.GUILD_CACHE_MEMBERS,
+                 cold_after=settings.COLD_STORAGE_AFTER_DAYS,
+                 cold_interval=settings.COLD_STORAGE_INTERVAL_HOURS):
+        self.backend = backend
+        self.journal = journal
+        self.cold = cold
+        self.ledger = ledger
+        self.flush_interval = flush_interval / 1000
+        self.flush_threshold = flush_threshold
+        self.compact_size = compact_size
+        self.lock_stripes = lock_stripes
+        self.cache_size = cache_size
+        self.cache_members = cache_members
+        self.cold_after = cold_after
+        self.cold_interval = cold_interval * 3600
+        self.read_only = read_only
+
+        self.data = OrderedDict()
+        self.market = self.backend.load_market()
+        self.orders = self.backend.load_orders()
+        self.listings = self.backend.load_listings()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.archived = 0
+        self.restored = 0
+
+        self._sizes = {}
+        self._resident_members = 0
+        self._removed = set()
+        self._evicting = True
+        self._cold_ids = {}
+        self._restored = {}
+        self._loading = {}
+        self._listeners = []
+
+        self._dirty = {}
+        self._market_dirty = False
+        self._dirty_orders = set()
+        self._dirty_listings = set()
+        self._ledger_entries = []
+        self._unsnapshotted = {}
+        self._market_unsnapshotted = False
+        self._orders_unsnapshotted = set()
+        self._listings_unsnapshotted = set()
+        self._mutations = 0
+        self._compaction_deferred = 0
+        self._flush_event = None
+        self._flush_task = None
+        self._cold_task = None
+        self._write_lock = None
+        self._locks = None
+
+        if self.journal is not None:
+            self._replay_journal()
+        self._migrate_orders()
+        self._migrate_listings()
+
+        self._evict()
+
+    ### Accessors ###
+    async def get_guild(self, guild, default=False):
+        """
+            Return the data of the given guild, loading it from the backend inside
+            another thread if it is not in memory. If the guild is not stored, return
+            ``None``, or a newly stored empty entry if ``default`` is set. Concurrent
+            lookups of the same guild share a single load.
+
+            Parameters
+            ----------
+            guild: :class:`discord.Guild, int, str`
+                a discord guild, or its id.
+            default: :class:`bool, optional`
+                a value determining whether to insert a new entry if the guild is not
+                stored.
+
+            Returns
+            -------
+            guild_data: :class:`dict, None`
+                a guild's data.
+        """
+
+        guild_id = str(getattr(guild, "id", guild))
+        guild_data = self.data.get(guild_id)
+        if guild_data is not None:
+            self.hits += 1
+            self.data.move_to_end(guild_id)
+            return guild_data
+
+        self.misses += 1
+        # A loaded guild may be evicted again before this lookup resumes
+        while guild_id not in self.data and guild_id not in self._removed:
+            if not await self._load_guild(guild_id):
+                break
+
+        guild_data = self.data.get(guild_id)
+        if guild_data is None and default:
+            guild_data = {}
+            self._insert(guild_id, guild_data)
+            self.mark_dirty(guild_id)
+
+        return guild_data
+
+    async def _load_guild(self, guild_id):
+        loading = self._loading.get(guild_id)
+        if loading is None:
+            loading = self._loading[guild_id] = asyncio.ensure_future(
+                self._read_guild(guild_id)
+            )
+
+        return await asyncio.shield(loading)
+
+    async def _read_guild(self, guild_id):
+        def read():
+            guild_data = self.backend.load_guild(guild_id)
+            return None if guild_data is None else parse_guild_data(guild_data)
+
+        try:
+            guild_data = await asyncio.get_event_loop().run_in_executor(None, read)
+        finally:
+            del self._loading[guild_id]
+
+        if guild_data is None:
+            return False
+
+        # The guild may have been created or removed while loading
+        if guild_id not in self.data and guild_id not in self._removed:
+            self._insert(guild_id, guild_data)
+        return True
+
+    async def pending_expeditions(self):
+        """
+            Return the guild and member ids of every member currently marked as being
+            on an expedition, whether their guild is in memory or not.
+
+            Returns
+            -------
+            expeditions: :class:`set[tuple(str, str)]`
+                pairs of guild ids and member ids.
+        """
+
+        stored = await asyncio.get_event_loop().run_in_executor(
+            None, self.backend.pending_expeditions
+        )
+        resident = {(guild_id, member_id) for guild_id, guild_data in self.data.items()
+                    for member_id, member_data in guild_data.get("yc_members", {}).items()
+                    if member_data.on_expedition}
+
+        # Stored entries of guilds in memory may be outdated
+        return {key for key in stored if key[0] not in self.data} | resident
+
+    async def iter_members(self):
+        """
+            Iterate over the members of every stored guild, one guild at a time,
+            including the members moved to the cold storage. Guilds that are not in
+            memory are read inside another thread, and are not cached.
+
+            Returns
+            -------
+            members: :class:`AsyncIterator[tuple(str, dict)]`
+                pairs of guild ids and records of the guild's members, by member id.
+        """
+
+        loop = asyncio.get_event_loop()
+        guild_ids = set(await loop.run_in_executor(None, self.backend.guild_ids))
+        for guild_id in sorted((guild_ids | set(self.data)) - self._removed):
+            guild_data = self.data.get(guild_id)
+            if guild_data is None:
+                guild_data = parse_guild_data(
+                    await loop.run_in_executor(None, self.backend.load_guild, guild_id)
+                    or {}
+                )
+            member_list_data = dict(guild_data.get("yc_members", {}))
+
+            if self.cold is not None:
+                # Members left in the guild take precedence over their archived data
+                archived = await loop.run_in_executor(self.backend.executor,
+                                                      self.cold.read, guild_id)
+                for member_id, member_data in archived.items():
+                    if member_id not in member_list_data:
+                        member_list_data[member_id] = MemberRecord.from_dict(member_data)
+
+            yield (guild_id, member_list_data)
+
+    def stats(self):
+        """
+            Return the counters of the guild cache and of the cold storage.
+
+            Returns
+            -------
+            stats: :class:`dict`
+                the number of cache hits, misses and evictions, the number of guilds
+                and members currently in memory, and the number of members moved to
+                and from the cold storage.
+        """
+
+        return {
+            "hits"      : self.hits,
+            "misses"    : self.misses,
+            "evictions" : self.evictions,
+            "guilds"    : len(self.data),
+            "members"   : self._resident_members,
+            "archived"  : self.archived,
+            "restored"  : self.restored
+        }
+
+    async def get_member(self, guild, member, default=False):
+        """
+            Return the record of the given guild member, restoring it from the cold
+            storage if it was moved there. If the member is not registered, return
+            ``None``, or a newly stored record if ``default`` is set.
+
+            Parameters
+            ----------
+            guild: :class:`discord.Guild, int, str`
+                a discord guild, or its id.
+            member: :class:`discord.Member, int, str`
+                a discord member that is part of the guild, or its id.
+            default: :class:`bool, optional`
+                a value determining whether to insert a new record if the member is
+                not registered.
+
+            Returns
+            -------
+            member_data: :class:`storage.records.MemberRecord, None`
+                the guild member's record.
+        """
+
+        guild_id = str(getattr(guild, "id", guild))
+        member_id = str(getattr(member, "id", member))
+        return (await self.get_members(guild_id, [member_id], default)).get(member_id)
+
+    @asynccontextmanager
+    async def transaction(self, guild, member, reason=None, price=None):
+        """
+            Return a context manager holding the lock of the given guild member and
+            yielding a copy of its record, which is registered if needed. When the
+            block exits without raising, the changes made to the copy are applied to
+            the stored record at once, and the record is marked as dirty if anything
+            changed. If the block raises, the changes are discarded. With a ledger,
+            a change of the member's balance is recorded along with ``reason``.
+
+            Locks are striped: each member maps to one of ``lock_stripes`` locks, so
+            commands of different members rarely wait on each other, while commands
+            of the same member never interleave their read-modify-write.
+
+            Parameters
+            ----------
+            guild: :class:`discord.Guild, int, str`
+                a discord guild, or its id.
+            member: :class:`discord.Member, int, str`
+                a discord member that is part of the guild, or its id.
+            reason: :class:`str, optional`
+                what the balance changes for (e.g. ``"daily"``), as recorded in the
+                ledger.
+            price: :class:`int, optional`
+                the YashCoin price the balance changes at, as recorded in the ledger.
+
+            Returns
+            -------
+            transaction: :class:`AsyncContextManager[storage.records.MemberRecord]`
+                the context manager yielding the copy of the member's record.
+        """
+
+        guild_id = str(getattr(guild, "id", guild))
+        member_id = str(getattr(member, "id", member))
+
+        async with self._get_lock(guild_id, member_id):
+            staged = (await self.get_member(guild_id, member_id, default=True)).copy()
+            yield staged
+
+            # The record is looked up again, in case it was replaced while waiting
+            record = await self.get_member(guild_id, member_id, default=True)
+            nort_bucks, yash_coins = record.nort_bucks, record.yash_coins
+            if record.update(staged):
+                self.record_change(guild_id, member_id, reason,
+                                   record.nort_bucks - nort_bucks,
+                                   record.yash_coins - yash_coins, price)
+                self.mark_dirty(guild_id, member_id)
+
+    @asynccontextmanager
+    async def batch(self, guild, members, reason=None, price=None):
+        """
+            Return a context manager holding the locks of the given guild members and
+            yielding a copy of each of their records, including a new record for each
+            member that is not registered. When the block exits without raising, the
+            changes made to the copies are applied at once: unregistered members are
+            only registered if their copy was modified, and every modified record is
+            marked as dirty in a single call. If the block raises, the changes are
+            discarded. With a ledger, balance changes are recorded along with
+            ``reason``.
+
+            Each lock stripe is acquired once, in increasing order, so that batches
+            and transactions never wait on each other in a cycle.
+
+            Parameters
+            ----------
+            guild: :class:`discord.Guild, int, str`
+                a discord guild, or its id.
+            members: :class:`Iterable[discord.Member, int, str]`
+                discord members that are part of the guild, or their ids.
+            reason: :class:`str, optional`
+                what the balances change for (e.g. ``"pay"``), as recorded in the
+                ledger.
+            price: :class:`int, optional`
+                the YashCoin price the balances change at, as recorded in the ledger.
+
+            Returns
+            -------
+            batch: :class:`AsyncContextManager[dict]`
+                the context manager yielding the copy of each member's record, by
+                member id.
+        """
+
+        guild_id = str(getattr(guild, "id", guild))
+        member_ids = sorted({str(getattr(member, "id", member)) for member in members})
+        stripes = sorted({self._get_stripe(guild_id, member_id) for member_id in member_ids})
+
+        async with AsyncExitStack() as stack:
+            for stripe in stripes:
+                await stack.enter_async_context(self._get_locks()[stripe])
+
+            records = await self.get_members(guild_id, member_ids)
+            staged = {member_id: records.get(member_id, MemberRecord()).copy()
+                      for member_id in member_ids}
+            yield staged
+
+            # The records are looked up again, in case they were replaced while waiting
+            records = await self.get_members(guild_id, member_ids)
+            registered = {}
+            modified = []
+            for member_id, staged_record in staged.items():
+                record = records.get(member_id)
+                if record is None:
+                    record = registered[member_id] = MemberRecord()
+
+                nort_bucks, yash_coins = record.nort_bucks, record.yash_coins
+                if record.update(staged_record):
+                    modified.append((member_id, record.nort_bucks - nort_bucks,
+                                     record.yash_coins - yash_coins))
+                elif member_id in registered:
+                    del registered[member_id]
+
+            if registered:
+                guild_data = await self.get_guild(guild_id, default=True)
+                guild_data.setdefault("yc_members", {}).update(registered)
+                self._count_members(guild_id, len(registered))
+
+            for member_id, nort_bucks_delta, yash_coins_delta in modified:
+                self.record_change(guild_id, member_id, reason, nort_bucks_delta,
+                                   yash_coins_delta, price)
+            self.mark_members_dirty(guild_id, [member_id for member_id, _, _ in modified])
+
+    async def get_members(self, guild, members, default=False, restore=True):
+        """
+            Return the records of the given guild members, restoring the ones that
+            were moved to the cold storage (which is read once, inside the backend's
+            worker thread, for all of them). Without ``restore``, the records of
+            archived members are read without being restored: they are detached
+            copies, which are left out of the guild and never persisted.
+
+            Parameters
+            ----------
+            guild: :class:`discord.Guild, int, str`
+                a discord guild, or its id.
+            members: :class:`Iterable[discord.Member, int, str]`
+                discord members that are part of the guild, or their ids.
+            default: :class:`bool, optional`
+                a value determining whether to insert a new record for each member
+                that is not registered.
+            restore: :class:`bool, optional`
+                a value determining whether archived members are restored.
+
+            Returns
+            -------
+            member_list_data: :class:`dict`
+                the record of each registered member, by member id.
+        """
+
+        guild_id = str(getattr(guild, "id", guild))
+        member_ids = [str(getattr(member, "id", member)) for member in members]
+        guild_data = await self.get_guild(guild_id, default=default)
+        if guild_data is None:
+            return {}
+
+        missing = [member_id for member_id in member_ids
+                   if member_id not in guild_data.get("yc_members", {})]
+        archived = {}
+        if missing and self.cold is not None and not restore:
+            stored = await self._read_cold(guild_id, missing)
+            archived = {member_id: MemberRecord.from_dict(member_data)
+                        for member_id, member_data in stored.items()}
+        elif missing and self.cold is not None:
+            await self._restore_members(guild_id, missing)
+
+            # The guild is looked up again, since it may have been evicted meanwhile
+            guild_data = await self.get_guild(guild_id, default=default)
+            if guild_data is None:
+                return {}
+
+        records = {}
+        created = []
+        for member_id in member_ids:
+            record = (guild_data.get("yc_members", {}).get(member_id)
+                      or archived.get(member_id))
+            if record is None and default:
+                record = guild_data.setdefault("yc_members", {})[member_id] = MemberRecord()
+                created.append(member_id)
+            if record is not None:
+                records[member_id] = record
+
+        if created:
+            self._count_members(guild_id, len(created))
+            self.mark_members_dirty(guild_id, created)
+
+        return records
+
+    def _get_locks(self):
+        if self._locks is None:
+            self._locks = [asyncio.Lock() for _ in range(self.lock_stripes)]
+
+        return self._locks
+
+    def _get_stripe(self, guild_id, member_id):
+        return hash((guild_id, member_id)) % self.lock_stripes
+
+    def _get_lock(self, guild_id, member_id):
+        return self._get_locks()[self._get_stripe(guild_id, member_id)]
+
+    ### Mutations ###
+    def mark_dirty(self, guild, member=None):
+        """
+            Mark the data of the given guild member as modified, so that it gets
+            written on the next flush. If ``member`` is not given, the whole guild is
+            marked as modified.
+
+            Parameters
+            ----------
+            guild: :class:`discord.Guild, int, str`
+                a discord guild, or its id.
+            member: :class:`discord.Member, int, str, optional`
+                a discord member that is part of the guild, or its id.
+        """
+
+        self.mark_members_dirty(guild, None if member is None else [member])
+
+    def mark_members_dirty(self, guild, members):
+        """
+            Mark the data of the given guild members as modified at once, so that it
+            gets written on the next flush. If ``members`` is ``None``, the whole guild
+            is marked as modified.
+
+            Parameters
+            ----------
+            guild: :class:`discord.Guild, int, str`
+                a discord guild, or its id.
+            members: :class:`Iterable[discord.Member, int, str], None`
+                discord members that are part of the guild, or their ids.
+        """
+
+        guild_id = str(getattr(guild, "id", guild))
+        member_ids = (None if members is None
+                      else {str(getattr(member, "id", member)) for member in members})
+        if member_ids is not None and not member_ids:
+            return
+
+        self._merge_dirty(self._dirty, guild_id, member_ids)
+        self._count_mutation(1 if member_ids is None else len(member_ids))
+
+        for listener in self._listeners:
+            listener(guild_id, self.data.get(guild_id), member_ids)
+
+    def add_listener(self, listener):
+        """
+            Add a function called whenever data is marked as modified, with the id of
+            the guild, its data (or ``None`` if it is not loaded) and the ids of the
+            modified members (or ``None`` if the whole guild was modified).
+
+            Parameters
+            ----------
+            listener: :class:`Callable[[str, dict, set[str]], None]`
+                the function.
+        """
+
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def record_change(self, guild, member, reason, nort_bucks_delta, yash_coins_delta,
+                      price=None):
+        """
+            Record a change of the balance of the given guild member in the ledger,
+            on the next flush. Nothing is recorded without a ledger, or if the balance
+            did not change. The record must already hold the new balance.
+
+            Parameters
+            ----------
+            guild: :class:`discord.Guild, int, str`
+                a discord guild, or its id.
+            member: :class:`discord.Member, int, str`
+                a discord member that is part of the guild, or its id.
+            reason: :class:`str, None`
+                what the balance changed for.
+            nort_bucks_delta: :class:`int`
+                the change of the member's NortBucks.
+            yash_coins_delta: :class:`int`
+                the change of the member's YashCoins.
+            price: :class:`int, optional`
+                the YashCoin price the balance changed at.
+        """
+
+        if self.ledger is None or (nort_bucks_delta == 0 and yash_coins_delta == 0):
+            return
+
+        guild_id = str(getattr(guild, "id", guild))
+        member_id = str(getattr(member, "id", member))
+        record = self.data[guild_id]["yc_members"][member_id]
+        self._ledger_entries.append(LedgerEntry(
+            round(time.time(), 3), guild_id, member_id, reason, nort_bucks_delta,
+            yash_coins_delta, record.nort_bucks, record.yash_coins, price
+        ))
+
+    async def get_history(self, guild, member, offset=0, count=10):
+        """
+            Return a page of the balance changes of the given guild member, from
+            newest to oldest, including the changes that are not written yet. The
+            ledger is read inside the backend's worker thread.
+
+            Parameters
+            ----------
+            guild: :class:`discord.Guild, int, str`
+                a discord guild, or its id.
+            member: :class:`discord.Member, int, str`
+                a discord member that is part of the guild, or its id.
+            offset: :class:`int, optional`
+                the number of newer changes to skip.
+            count: :class:`int, optional`
+                the maximum number of changes to return.
+
+            Returns
+            -------
+            entries: :class:`list[storage.ledger.LedgerEntry]`
+                the changes of the page.
+        """
+
+        if self.ledger is None:
+            return []
+
+        loop = asyncio.get_event_loop()
+        self._write_ledger()
+        return await loop.run_in_executor(self.backend.executor, self.ledger.read,
+                                          str(getattr(guild, "id", guild)),
+                                          str(getattr(member, "id", member)), offset, count)
+
+    def mark_market_dirty(self):
+        """
+            Mark the YashCoin data as modified, so that it gets written on the next
+            flush.
+        """
+
+        self._market_dirty = True
+        self._count_mutation()
+
+    def mark_orders_dirty(self, order_ids):
+        """
+            Mark the given open orders (see ``orders``) as placed or removed, so that
+            they get written on the next flush. Only these orders are journaled or
+            written, rather than the whole YashCoin data.
+
+            Parameters
+            ----------
+            order_ids: :class:`Iterable[int, str]`
+                the ids of the orders.
+        """
+
+        count = len(self._dirty_orders)
+        self._dirty_orders.update(str(order_id) for order_id in order_ids)
+        self._count_mutation(len(self._dirty_orders) - count)
+
+    def mark_listings_dirty(self, keys):
+        """
+            Mark the given listed markets (see ``listings``) as modified, so that they
+            get written on the next flush. Only these markets are journaled or
+            written, rather than the whole YashCoin data.
+
+            Parameters
+            ----------
+            keys: :class:`Iterable[str]`
+                the keys of the markets.
+        """
+
+        count = len(self._dirty_listings)
+        self._dirty_listings.update(keys)
+        self._count_mutation(len(self._dirty_listings) - count)
+
+    async def update_guilds(self, joined=(), left=()):
+        """
+            Create an entry for each joined guild that does not exist yet, restoring
+            its archived data if it was previously archived, and archive the entry of
+            each left guild. Guilds are not evicted in the meantime, so that every
+            change is persisted by a single flush. This must only be called once the
+            store has been started.
+
+            Parameters
+            ----------
+            joined: :class:`Iterable[discord.Guild, int, str], optional`
+                the discord guilds (or their ids) that were joined.
+            left: :class:`Iterable[discord.Guild, int, str], optional`
+                the discord guilds (or their ids) that were left.
+        """
+
+        loop = asyncio.get_event_loop()
+        self._evicting = False
+        try:
+            for guild in joined:
+                guild_id = str(getattr(guild, "id", guild))
+
+                # A guild left since the last snapshot is still stored as is
+                rejoined = guild_id in self._removed
+                self._removed.discard(guild_id)
+                if await self.get_guild(guild_id) is None:
+                    restored = await loop.run_in_executor(None, self.backend.restore_guild,
+                                                          guild_id)
+                    # The guild may have been created while restoring
+                    if guild_id not in self.data:
+                        self._insert(guild_id, parse_guild_data(restored or {}))
+                elif not rejoined:
+                    continue
+
+                self.mark_dirty(guild_id)
+
+            for guild in left:
+                guild_id = str(getattr(guild, "id", guild))
+                if guild_id in self._removed:
+                    continue
+
+                # Guilds that are not in memory are archived without being loaded
+                if guild_id in self.data:
+                    self.data.pop(guild_id)
+                    self._resident_members -= self._sizes.pop(guild_id, 0)
+                self._cold_ids.pop(guild_id, None)
+                self._removed.add(guild_id)
+                self.mark_dirty(guild_id)
+
+            await self.flush()
+        finally:
+            self._evicting = True
+            self._evict()
+
+    async def sync_guilds(self, guild_ids):
+        """
+            Make the stored guilds match the given guilds in one sweep, typically the
+            guilds the bot is part of when it connects: missing guilds are created (or
+            restored) and the others are archived, as done by ``update_guilds``.
+
+            Parameters
+            ----------
+            guild_ids: :class:`Iterable[int, str]`
+                the ids of every guild the bot is part of.
+
+            Returns
+            -------
+            changes: :class:`tuple(list[str], list[str])`
+                the ids of the created and archived guilds.
+        """
+
+        stored = set(await asyncio.get_event_loop().run_in_executor(
+            None, self.backend.guild_ids
+        ))
+        stored = (stored | set(self.data)) - self._removed
+        guild_ids = {str(guild_id) for guild_id in guild_ids}
+
+        joined = sorted(guild_ids - stored)
+        left = sorted(stored - guild_ids)
+        if joined or left:
+            await self.update_guilds(joined, left)
+
+        return (joined, left)
+
+    @staticmethod
+    def _merge_dirty(dirty, guild_id, member_ids):
+        # A value of None means that the whole guild is dirty
+        if member_ids is None:
+            dirty[guild_id] = None
+        elif dirty.get(guild_id, ()) is not None:
+            dirty.setdefault(guild_id, set()).update(member_ids)
+
+    ### Guild Cache ###
+    def _insert(self, guild_id, guild_data):
+        size = len(guild_data.get("yc_members", {}))
+        self.data[guild_id] = guild_data
+        self._removed.discard(guild_id)
+        self._sizes[guild_id] = size
+        self._resident_members += size
+        self._evict()
+
+    def _count_members(self, guild_id, count):
+        if guild_id in self._sizes:
+            self._sizes[guild_id] += count
+            self._resident_members += count
+
+    def _evict(self):
+        # Evicted changes of a read-only store could not be written back
+        if not self._evicting or self.read_only:
+            return
+
+        while len(self.data) > 1 and (len(self.data) > self.cache_size or
+                                      self._resident_members > self.cache_members):
+            guild_id, guild_data = self.data.popitem(last=False)
+            self._resident_members -= self._sizes.pop(guild_id, 0)
+            self._cold_ids.pop(guild_id, None)
+            self.evictions += 1
+            self._write_back(guild_id, guild_data)
+
+    def _write_back(self, guild_id, guild_data):
+        # The pending changes of the evicted guild are queued on the backend's worker
+        # thread, so that any later load of the guild (which goes through the same
+        # thread) sees them
+        dirty = self._dirty.pop(guild_id, False)
+        unsnapshotted = self._unsnapshotted.pop(guild_id, False)
+        if dirty is False and unsnapshotted is False:
+            return
+
+        if self.journal is not None and dirty is not False:
+            records = self.journal.encode(self._get_records(guild_id, guild_data, dirty))
+            self._submit(self.journal.append, records)
+
+        member_ids = (None if dirty is None or unsnapshotted is None
+                      else (dirty or set()) | (unsnapshotted or set()))
+        payload = self.backend.prepare_guild(guild_id, guild_data, member_ids)
+        self._submit(self.backend.write, [payload])
+
+    def _submit(self, func, *args):
+        def report(future):
+            if future.exception() is not None:
+                print(f"Failed to write data: {future.exception()}", flush=True)
+
+        self.backend.executor.submit(func, *args).add_done_callback(report)
+
+    def _count_mutation(self, count=1):
+        self._mutations += count
+        if self._mutations >= self.flush_threshold and self._flush_event is not None:
+            self._flush_event.set()
+
+    ### Flushing ###
+    def start(self):
+        """
+            Start the background tasks that periodically flush dirty data and move
+            inactive members to the cold storage. Calling this method more than once
+            has no effect.
+        """
+
+        if self.read_only:
+            raise RuntimeError("A read-only data store cannot be started")
+        if self._flush_task is not None:
+            return
+
+        self._flush_event = asyncio.Event()
+        self._write_lock = asyncio.Lock()
+        self._flush_task = asyncio.get_event_loop().create_task(self._flush_loop())
+        if self.cold is not None:
+            self._cold_task = asyncio.get_event_loop().create_task(self._cold_loop())
+
+    async def flush(self):
+        """
+            Write all pending changes. A snapshot of the dirty data is taken on the
+            event loop, while the actual writing is done inside the backend's worker
+            thread. A read-only store writes nothing.
+        """
+
+        if self.read_only:
+            return
+
+        ledger_written = self._write_ledger()
+        if ledger_written is not None:
+            await ledger_written
+
+        if (not self._dirty and not self._market_dirty and not self._dirty_orders
+                and not self._dirty_listings and not self._needs_compaction()):
+            return
+
+        loop = asyncio.get_event_loop()
+        async with self._write_lock:
+            # Restored members are only discarded from the cold storage once they are
+            # written back, which happens as part of this flush
+            restored, self._restored = self._restored, {}
+
+            if self.journal is None:
+                payload = self._collect_payload()
+                await loop.run_in_executor(self.backend.executor, self.backend.write,
+                                           *payload)
+            else:
+                records = self._collect_records()
+                await loop.run_in_executor(self.backend.executor, self.journal.append,
+                                           records)
+
+                if self._needs_compaction():
+                    payload = self._collect_snapshot()
+                    await loop.run_in_executor(self.backend.executor,
+                                               self._write_snapshot, payload)
+
+            for guild_id, member_ids in restored.items():
+                await loop.run_in_executor(self.backend.executor, self.cold.remove,
+                                           guild_id, member_ids)
+
+    @asynccontextmanager
+    async def defer_compaction(self):
+        """
+            Return a context manager during which the journal is never folded into a
+            snapshot, however large it grows. This is meant for bulk changes written
+            by many flushes (e.g. bulk grants), which would otherwise write a full
+            snapshot every few flushes. Once the block exits, the journal is folded
+            if needed.
+
+            Returns
+            -------
+            deferral: :class:`AsyncContextManager[None]`
+                the context manager.
+        """
+
+        self._compaction_deferred += 1
+        try:
+            yield
+        finally:
+            self._compaction_deferred -= 1
+
+        await self.flush()
+
+    def close(self):
+        """
+            Stop the background flush task, synchronously write any pending changes
+            and close the backend. This is meant to be called once the event loop has
+            stopped. A read-only store only closes its backend and journal.
+        """
+
+        if self.read_only:
+            if self.journal is not None:
+                self.journal.close()
+            self.backend.close()
+            return
+
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if self._cold_task is not None:
+            self._cold_task.cancel()
+            self._cold_task = None
+
+        if self.journal is None:
+            if (self._dirty or self._market_dirty or self._dirty_orders
+                    or self._dirty_listings):
+                self.backend.run(self.backend.write, *self._collect_payload())
+        else:
+            self.backend.run(self.journal.append, self._collect_records())
+            self.backend.run(self._write_snapshot, self._collect_snapshot())
+            self.journal.close()
+
+        for guild_id, member_ids in self._restored.items():
+            self.backend.run(self.cold.remove, guild_id, member_ids)
+
+        if self.ledger is not None:
+            entries, self._ledger_entries = self._ledger_entries, []
+            self.backend.run(self.ledger.append, entries)
+            self.backend.run(self.ledger.close)
+
+        self.backend.close()
+
+    def _write_ledger(self):
+        # Entries are collected and queued on the backend's worker thread at once, so
+        # that they are appended in the order they were recorded
+        entries, self._ledger_entries = self._ledger_entries, []
+        if self.ledger is None or not entries:
+            return None
+
+        return asyncio.get_event_loop().run_in_executor(self.backend.executor,
+                                                        self.ledger.append, entries)
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+            self._flush_event.clear()
+            try:
+                await self.flush()
+            except Exception as error:
+                print(f"Failed to write data: {error}", flush=True)
+
+    def _needs_compaction(self):
+        return (self.journal is not None and not self._compaction_deferred
+                and self.journal.size >= self.compact_size)
+
+    def _collect_payload(self):
+        payload = self._prepare_payload(self._dirty, self._market_dirty,
+                                        self._dirty_orders, self._dirty_listings)
+
+        self._dirty = {}
+        self._market_dirty = False
+        self._dirty_orders = set()
+        self._dirty_listings = set()
+        self._mutations = 0
+        return payload
+
+    def _prepare_payload(self, dirty, market_dirty, order_ids, keys):
+        # A dirty guild that is not in memory has been removed, and is archived (dirty
+        # guilds are never evicted without being written back)
+        guild_payloads = [self.backend.prepare_guild(guild_id, self.data.get(guild_id),
+                                                     member_ids)
+                          for guild_id, member_ids in dirty.items()]
+        self._removed.difference_update(guild_id for guild_id in dirty
+                                        if guild_id not in self.data)
+        market_payload = self.backend.prepare_market(self.market) if market_dirty else None
+        order_payload = (self.backend.prepare_orders(self.orders, order_ids)
+                         if order_ids else None)
+        listing_payload = (self.backend.prepare_listings(self.listings, keys)
+                           if keys else None)
+        return (guild_payloads, market_payload, order_payload, listing_payload)
+
+    ### Journaling ###
+    def _collect_records(self):
+        records = []
+        for guild_id, member_ids in self._dirty.items():
+            self._merge_dirty(self._unsnapshotted, guild_id, member_ids)
+            records.extend(self._get_records(guild_id, self.data.get(guild_id), member_ids))
+
+        if self._market_dirty:
+            records.append({"market": self.market})
+            self._market_unsnapshotted = True
+
+        # Removed orders are recorded without any data
+        records.extend({"o": order_id, "d": self.orders["open"].get(order_id)}
+                       for order_id in self._dirty_orders)
+        self._orders_unsnapshotted |= self._dirty_orders
+
+        records.extend({"l": key, "d": self.listings.get(key)}
+                       for key in self._dirty_listings)
+        self._listings_unsnapshotted |= self._dirty_listings
+
+        self._dirty = {}
+        self._market_dirty = False
+        self._dirty_orders = set()
+        self._dirty_listings = set()
+        self._mutations = 0
+        return self.journal.encode(records)
+
+    @staticmethod
+    def _get_records(guild_id, guild_data, member_ids):
+        if member_ids is None or guild_data is None:
+            dumped = dump_guild_data(guild_data) if guild_data is not None else None
+            return [{"g": guild_id, "d": dumped}]
+
+        # Members that are no longer in the guild (i.e. moved to the cold storage) are
+        # recorded without any data
+        member_list_data = guild_data.get("yc_members", {})
+        return [{"g": guild_id, "m": member_id,
+                 "d": (member_list_data[member_id].to_dict()
+                       if member_id in member_list_data else None)}
+                for member_id in member_ids]
+
+    def _collect_snapshot(self):
+        payload = self._prepare_payload(self._unsnapshotted, self._market_unsnapshotted,
+                                        self._orders_unsnapshotted,
+                                        self._listings_unsnapshotted)
+
+        self._unsnapshotted = {}
+        self._market_unsnapshotted = False
+        self._orders_unsnapshotted = set()
+        self._listings_unsnapshotted = set()
+        return payload
+
+    def _write_snapshot(self, payload):
+        # Only discard the journal once its records are part of a snapshot that has
+        # reached the disk
+        self.backend.write(*payload)
+        self.backend.sync()
+        self.journal.truncate()
+
+    def _replay_journal(self):
+        # Guilds are not evicted while replaying, since evicting may append to the
+        # journal being read
+        self._evicting = False
+        count = 0
+        for record in self.journal.replay():
+            count += 1
+            if "market" in record:
+                self.market.clear()
+                self.market.update(record["market"])
+                self._market_unsnapshotted = True
+                continue
+
+            if "o" in record:
+                self._replay_order(record["o"], record["d"])
+                continue
+
+            if "l" in record:
+                self._replay_listing(record["l"], record["d"])
+                continue
+
+            guild_id = record["g"]
+            if "m" not in record:
+                if guild_id in self.data:
+                    self.data.pop(guild_id)
+                    self._resident_members -= self._sizes.pop(guild_id, 0)
+
+                if record["d"] is None:
+                    self._removed.add(guild_id)
+                else:
+                    self._insert(guild_id, parse_guild_data(record["d"]))
+
+                self._merge_dirty(self._unsnapshotted, guild_id, None)
+                continue
+
+            guild_data = self._replay_guild(guild_id)
+            member_list_data = guild_data.setdefault("yc_members", {})
+            if record["d"] is None:
+                member_list_data.pop(record["m"], None)
+            else:
+                member_list_data[record["m"]] = MemberRecord.from_dict(record["d"])
+            self._merge_dirty(self._unsnapshotted, guild_id, {record["m"]})
+
+        # Replayed changes are only part of the journal, and are marked as such
+        self._dirty = {}
+        self._mutations = 0
+        self._evicting = True
+
+        if count:
+            print(f"Replayed {count} journal records", flush=True)
+
+    def _replay_order(self, order_id, fields):
+        # Order ids are never reused, even once the orders are removed
+        if fields is None:
+            self.orders["open"].pop(order_id, None)
+        else:
+            self.orders["open"][order_id] = fields
+        self.orders["next_id"] = max(self.orders["next_id"], int(order_id) + 1)
+        self._orders_unsnapshotted.add(order_id)
+
+    def _replay_listing(self, key, fields):
+        if fields is None:
+            self.listings.pop(key, None)
+        else:
+            self.listings[key] = fields
+        self._listings_unsnapshotted.add(key)
+
+    def _migrate_orders(self):
+        # Older versions kept the open orders inside the YashCoin data, which they are
+        # moved out of (unless orders have been stored since)
+        legacy = self.market.pop("orders", None)
+        if legacy is None:
+            return
+
+        if not self.orders["open"] and self.orders["next_id"] == 1:
+            self.orders.update(next_id=legacy["next_id"], open=legacy["open"])
+            self.mark_orders_dirty(self.orders["open"])
+        self.mark_market_dirty()
+
+    def _migrate_listings(self):
+        # Older versions kept the listed markets and their starting values inside the
+        # YashCoin data, in the order of their columns, which they are moved out of
+        state = self.market.get("markets", {})
+        keys, starts = state.pop("listings", None), state.pop("starts", None)
+        if keys is None:
+            return
+
+        if not self.listings:
+            self.listings.update((key, [column, start, None]) for column, (key, start)
+                                 in enumerate(zip(keys, starts), start=1))
+            self.mark_listings_dirty(self.listings)
+        self.mark_market_dirty()
+
+    def _replay_guild(self, guild_id):
+        # The journal is replayed before the event loop runs, so the guild is loaded
+        # synchronously
+        guild_data = self.data.get(guild_id)
+        if guild_data is None:
+            stored = (None if guild_id in self._removed
+                      else self.backend.load_guild(guild_id))
+            guild_data = parse_guild_data(stored or {})
+            self._insert(guild_id, guild_data)
+
+        return guild_data
+
+    ### Cold Storage ###
+    async def archive_inactive(self):
+        """
+            Move every member that has not claimed their daily NortBucks for
+            ``cold_after`` days, and is not on an expedition, to the cold storage.
+            Guilds are processed one at a time, between flushes. This must only be
+            called once the store has been started.
+
+            Returns
+            -------
+            moved: :class:`int`
+                the number of members moved to the cold storage.
+        """
+
+        loop = asyncio.get_event_loop()
+        cutoff = str(date.today() - timedelta(days=self.cold_after))
+        guild_ids = await loop.run_in_executor(None, self.backend.guild_ids)
+
+        moved = 0
+        for guild_id in set(guild_ids) | set(self.data):
+            async with self._write_lock:
+                moved += await self._archive_guild(guild_id, cutoff)
+
+        self.archived += moved
+        return moved
+
+    async def _archive_guild(self, guild_id, cutoff):
+        resident = guild_id in self.data
+        guild_data = await self.get_guild(guild_id)
+        if guild_data is None:
+            return 0
+        if not resident:
+            # Guilds only loaded to be archived are the first to be evicted
+            self.data.move_to_end(guild_id, last=False)
+
+        member_list_data = guild_data.get("yc_members", {})
+        inactive = {member_id: record.to_dict()
+                    for member_id, record in member_list_data.items()
+                    if record.prev_daily is not None and record.prev_daily < cutoff
+                    and not record.on_expedition
+                    and not self._get_lock(guild_id, member_id).locked()}
+        if not inactive:
+            return 0
+
+        # The archived data must reach the cold storage before the members are removed
+        # from their guild, and must not be discarded by a pending restoration
+        self._restored.get(guild_id, set()).difference_update(inactive)
+        await asyncio.get_event_loop().run_in_executor(self.backend.executor,
+                                                       self.cold.add, guild_id, inactive)
+
+        # The guild may have been evicted, or its members modified, while waiting. The
+        # members left in the guild take precedence over their archived data
+        if self.data.get(guild_id) is not guild_data:
+            return 0
+
+        moved = 0
+        for member_id, member_data in inactive.items():
+            record = member_list_data.get(member_id)
+            if record is None or record.to_dict() != member_data:
+                continue
+
+            del member_list_data[member_id]
+            self.mark_dirty(guild_id, member_id)
+            moved += 1
+
+        self._count_members(guild_id, -moved)
+        if guild_id in self._cold_ids:
+            self._cold_ids[guild_id].update(inactive)
+
+        return moved
+
+    async def get_archived(self, guild):
+        """
+            Return the data of every member of the given guild that was moved to the
+            cold storage, read inside the backend's worker thread. The members are not
+            restored, and members left in the guild are not included.
+
+            Parameters
+            ----------
+            guild: :class:`discord.Guild, int, str`
+                a discord guild, or its id.
+
+            Returns
+            -------
+            archived: :class:`dict`
+                the data of each archived member, by member id.
+        """
+
+        guild_id = str(getattr(guild, "id", guild))
+        if self.cold is None:
+            return {}
+
+        archived = await asyncio.get_event_loop().run_in_executor(
+            self.backend.executor, self.cold.read, guild_id
+        )
+        member_list_data = (self.data.get(guild_id) or {}).get("yc_members", {})
+        return {member_id: member_data for member_id, member_data in archived.items()
+                if member_id not in member_list_data}
+
+    async def _read_cold(self, guild_id, member_ids):
+        loop = asyncio.get_event_loop()
+        cold_ids = self._cold_ids.get(guild_id)
+        if cold_ids is None:
+            cold_ids = set(await loop.run_in_executor(self.backend.executor,
+                                                      self.cold.member_ids, guild_id))
+            # The ids are only kept while the guild is in memory
+            if guild_id in self.data:
+                cold_ids = self._cold_ids.setdefault(guild_id, cold_ids)
+
+        member_ids = [member_id for member_id in member_ids if member_id in cold_ids]
+        if not member_ids:
+            return {}
+
+        return await loop.run_in_executor(self.backend.executor, self.cold.read,
+                                          guild_id, member_ids)
+
+    async def _restore_members(self, guild_id, member_ids):
+        archived = await self._read_cold(guild_id, member_ids)
+        if not archived:
+            return
+
+        guild_data = await self.get_guild(guild_id)
+        if guild_data is None:
+            return
+
+        member_list_data = guild_data.setdefault("yc_members", {})
+        cold_ids = self._cold_ids.get(guild_id, set())
+        restored = []
+        for member_id, member_data in archived.items():
+            cold_ids.discard(member_id)
+            # The member may have been restored by another lookup in the meantime
+            if member_id in member_list_data:
+                continue
+
+            member_list_data[member_id] = MemberRecord.from_dict(member_data)
+            restored.append(member_id)
+
+        self._count_members(guild_id, len(restored))
+        self._restored.setdefault(guild_id, set()).update(restored)
+        self.restored += len(restored)
+        self.mark_members_dirty(guild_id, restored)
+
+    async def _cold_loop(self):
+        while True:
+            try:
+                moved = await self.archive_inactive()
+                if moved:
+                    print(f"Moved {moved} inactive members to cold storage", flush=True)
+            except Exception as error:
+                print(f"Failed to move inactive members: {error}", flush=True)
+
+            await asyncio.sleep(self.cold_interval)
@@ -1,14 +1,15 @@
 import io
-import json
 import math
 from os                         import remove
 from os.path                    import join
 
-import discord
 from emoji                      import emojize
-from matplotlib                 import pyplot as plt
 
 import settings
+from storage                    import codecs
+
+# discord and matplotlib are only imported by the helpers that use them, since the
+# storage modules (and their command line tools) depend on this module as well
 
 # Returns a path relative to the bot directory
 def get_rel_path(*rel_path):
@@ -54,6 +55,8 @@ async def send_in_channel(bot, channel_name, *args):
 # delete_after_send can be set to True to delete the file afterwards
 async def try_upload_file(bot, channel, file_path, content=None,
                           delete_after_send=False, retries=3):
+    import discord
+
     used_retries = 0
     sent_msg = None
 
@@ -79,30 +82,27 @@ def get_json_path(fname):
     return get_rel_path("assets", "json", f"{fname}.json")
 
 # Retrieve json contents based on path URL
-# If file is not a valid JSON document, return an empty dictionary
+# The format of the file (see storage/codecs.py) is detected from its content
+# If file is not a valid document, return an empty dictionary
 # If file cannot be opened, throws an error
 def get_json_data(path):
     try:
-        json_file = open(path, "r")
-        json_data = json.load(json_file)
-    except json.JSONDecodeError:
-        json_data = {}
-
-    json_file.close()
-    return json_data
+        return codecs.load(path)
+    except (ValueError, EOFError):
+        return {}
 
-# Modify json contents stored at path URL
+# Modify json contents stored at path URL, encoded with the given codec
 # If file cannot be opened, throws an error
-def set_json_data(path, json_data):
-    json_file = open(path, "w")
-    json.dump(json_data, json_file, indent=4)
-    json_file.close()
+def set_json_data(path, json_data, codec="json"):
+    codecs.dump(path, json_data, codec)
 
 
 
 ### Graph Helpers ###
 def create_simple_graph(title, values=[], xlim=(), ylim=(), 
                         graph_color="#777", gradient=True, **kwargs):
+    from matplotlib import pyplot as plt
+
     plt.clf()
     plt.title(title)
     axes = plt.gca()
@@ -131,6 +131,8 @@ def create_simple_graph(title, values=[], xlim=(), ylim=(),
     return buf
 
 def update_simple_graph(title, values, xlim=(), ylim=(), gradient=True, **kwargs):
+    from matplotlib import pyplot as plt
+
     steps = len(values)
 
     lines = plt.gca().get_lines()
@@ -164,6 +166,8 @@ def update_simple_graph(title, values, xlim=(), ylim=(), gradient=True, **kwargs
     return buf
 
 def get_simple_graph_length():
+    from matplotlib import pyplot as plt
+
     count = 0
     for line in plt.gca().get_lines():
         count += len(line.get_xdata())